@@ -0,0 +1,17 @@
+"""NHL expected goals (xG) model.
+
+Importing the package or any of its modules has no side effects. The pipeline stages are run
+with the command line interface (python -m nhlxg) and heavy dependencies such as lightgbm,
+optuna, matplotlib and seaborn are only imported by the functions that use them.
+"""
+import importlib
+
+#the modules of the package, loaded the first time they are accessed
+MODULES = ['shotDataCreation','venueAdjustedShotDataCreation','xGModelCreation','benchmarkModel','scrapeInfo',
+           'kernels','kernelCheck','windowFeatures','priorFeatures','onIce','rollupCube','shotStore','contributionExport','outOfCoreTraining','memoryBudget','sharedFeatures','ablation','walkForward','metricsStore','fakeApi','syntheticData','benchmarkPipeline','replayHarness','pipelineRunner','workQueue','profiling','reports','cli']
+
+def __getattr__(name):
+    """Import a module of the package when it is first accessed."""
+    if name in MODULES:
+        return importlib.import_module("." + name,__name__)
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
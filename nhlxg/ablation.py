@@ -0,0 +1,360 @@
+import argparse
+import os
+import re
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .xGModelCreation import PARAMS, prepareFrame, cvPredict, readPriors
+from .reports import writeJson
+
+#the venue adjusted shots and the last season cross-validated
+VENUE_PATH = "Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv"
+TRAIN_SEASON = 2020
+
+#the feature matrix every variant is trained from and the report of the sweep
+ABLATION_DIR = "xG Data/ablation"
+REPORT_PATH = "xG Data/ablation.json"
+
+#the folds and boosting rounds of every variant (as in xGModelCreation.cvPredict)
+FOLDS = 10
+ROUNDS = 100
+
+#the largest difference from xGModelCreation.cvPredict allowed in the baseline's log loss and auc
+BASELINE_TOLERANCE = 1e-9
+
+#columns of the drop list that are tried as additions to the model
+ADD_COLUMNS = ['rebound','fastbreak','isHome']
+
+#the features removed together by a group variant
+FEATURE_GROUPS = {
+    'location':['x','y','Distance','Angle'],
+    'venueAdjusted':['AdjX','AdjY','AdjDist','adj','Xadj','Yadj'],
+    'lastEvent':['LastEvent','LastEventDistance','LastEventZone','LastEventAngle','LastEventSpeed','TimeSinceLastEvent'],
+    'rebound':['reboundAngDiff','reboundDistDiff','reboundSpeed'],
+    'fastbreak':['fastbreakDistance','fastbreakSpeed'],
+    'gameState':['Strength','specialStrength','GoalDiff','GameTime','PeriodTime'],
+    'priors':['shooterPriorShots','shooterPriorGoals','shooterPriorXG','goaliePriorShots','goaliePriorGoals','goaliePriorXG','goaliePriorGSAx'],
+}
+
+#the lookback window features of windowFeatures.py, grouped when present
+WINDOW_PATTERN = re.compile(r"Last\d+(Events|Seconds)$")
+
+def prepareAblationFrame(df):
+    """Prepare the model features with the columns tried as additions.
+
+    Parameters:
+        df - the dataframe of venue adjusted shots.
+
+    Returns:
+        trainingFrame - the model features, the added columns and the outcome.
+        features - the features of the current model.
+        candidates - the columns tried as additions.
+    """
+    trainingFrame, writingFrame = prepareFrame(df)
+    features = [c for c in trainingFrame.columns if c != 'Outcome']
+
+    candidates = [c for c in ADD_COLUMNS if c in writingFrame.columns]
+    for c in candidates:
+        trainingFrame[c] = writingFrame[c].to_numpy()
+
+    return trainingFrame, features, candidates
+
+def getGroups(features):
+    """Find the groups of features present in the model.
+
+    Parameters:
+        features - the features of the current model.
+
+    Returns:
+        groups - a dictionary of group name to its features in the model.
+    """
+    groups = {name: [f for f in members if f in features] for name, members in FEATURE_GROUPS.items()}
+    groups['window'] = [f for f in features if WINDOW_PATTERN.search(f)]
+
+    return {name: members for name, members in groups.items() if members}
+
+def getVariants(features,candidates,singles=True):
+    """List the feature sets evaluated by the sweep.
+
+    Parameters:
+        features - the features of the current model.
+        candidates - the columns tried as additions.
+        singles - include a variant leaving out each single feature.
+
+    Returns:
+        variants - a list of dictionaries with the name, kind and features of each variant.
+    """
+    variants = [{'name':'baseline','kind':'baseline','features':list(features)}]
+    if singles:
+        variants = variants + [{'name':'-' + f,'kind':'feature','features':[g for g in features if g != f]} for f in features]
+    for name, members in getGroups(features).items():
+        variants.append({'name':'-' + name + ' group','kind':'group','features':[f for f in features if f not in members]})
+    variants = variants + [{'name':'+' + c,'kind':'add','features':list(features) + [c]} for c in candidates]
+
+    return variants
+
+def writeFeatures(trainingFrame,directory):
+    """Write the features, added columns and outcome once for every variant to map.
+
+    The features are kept as float64, the values LightGBM converts the model's frames to, so
+    a variant bins exactly what the model would.
+
+    Parameters:
+        trainingFrame - the features, added columns and outcome.
+        directory - the directory of the matrix.
+
+    Returns:
+        paths - a dictionary with the paths of the feature matrix, the outcome and the binned folds.
+        columns - the columns of the matrix in order.
+    """
+    os.makedirs(directory,exist_ok=True)
+    columns = [c for c in trainingFrame.columns if c != 'Outcome']
+    paths = {'X':os.path.join(directory,"features.npy"),'y':os.path.join(directory,"outcome.npy"),'bins':os.path.join(directory,"bins")}
+    np.save(paths['X'],trainingFrame[columns].to_numpy(dtype=np.float64))
+    np.save(paths['y'],trainingFrame['Outcome'].to_numpy().astype('int32'))
+
+    return paths, columns
+
+def getFolds(labels):
+    """Split the rows into the stratified folds of xGModelCreation.cvPredict.
+
+    Parameters:
+        labels - the outcome of every row.
+
+    Returns:
+        folds - a list of (training rows, testing rows).
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    return list(StratifiedKFold(n_splits=FOLDS).split(np.zeros(len(labels)),labels))
+
+def getBinPath(paths,fold,index):
+    """Get the path of one column of a fold's binned training rows.
+
+    Parameters:
+        paths - the paths of the feature matrix, the outcome and the binned folds.
+        fold - the number of the fold.
+        index - the column of the matrix.
+
+    Returns:
+        path - the path of the column's lightgbm binary dataset.
+    """
+    return os.path.join(paths['bins'],"fold" + str(fold),str(index) + ".bin")
+
+def binFold(paths,columns,fold,params):
+    """Bin each column of one fold's training rows once for every variant, run in a worker process.
+
+    LightGBM bins every feature from its own values (and the same sampled rows), so a column binned
+    on its own has the bins it would have in any variant's dataset.
+
+    Parameters:
+        paths - the paths of the feature matrix, the outcome and the binned folds.
+        columns - the columns of the matrix in order.
+        fold - the number of the fold.
+        params - the LGBM parameters.
+
+    Returns:
+        result - the fold and the seconds it took to bin.
+    """
+    import lightgbm as lgb
+
+    start = perf_counter()
+    y = np.load(paths['y'])
+    X = np.load(paths['X'],mmap_mode='r')
+    trainIdx = getFolds(y)[fold][0]
+
+    os.makedirs(os.path.dirname(getBinPath(paths,fold,0)),exist_ok=True)
+    for index, column in enumerate(columns):
+        values = X[:,index][trainIdx].reshape(-1,1)
+        dataset = lgb.Dataset(values,label=y[trainIdx],params=params,feature_name=[column]).construct()
+        dataset.save_binary(getBinPath(paths,fold,index))
+
+    return {'fold':fold,'seconds':perf_counter() - start}
+
+def loadFoldDataset(paths,fold,indices,params):
+    """Join the binned columns of a variant into one fold's training dataset.
+
+    Parameters:
+        paths - the paths of the feature matrix, the outcome and the binned folds.
+        fold - the number of the fold.
+        indices - the variant's columns of the matrix, in the model's order.
+        params - the LGBM parameters.
+
+    Returns:
+        dataset - the constructed lightgbm dataset of the fold's training rows.
+    """
+    import lightgbm as lgb
+
+    #the binned columns keep no raw data or categorical features, which lightgbm warns about on every join
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        dataset = lgb.Dataset(getBinPath(paths,fold,indices[0]),params=params).construct()
+        for index in indices[1:]:
+            dataset.add_features_from(lgb.Dataset(getBinPath(paths,fold,index),params=params).construct())
+
+    return dataset
+
+def runVariant(paths,columns,variant,params,rounds=ROUNDS):
+    """Cross-validate one variant on only its columns of the binned folds, run in a worker process.
+
+    Each fold's model is trained like xGModelCreation.cvPredict trains it, and the predictions of
+    every fold are scored together.
+
+    Parameters:
+        paths - the paths of the feature matrix, the outcome and the binned folds.
+        columns - the columns of the matrix in order.
+        variant - the variant evaluated.
+        params - the LGBM parameters.
+        rounds - the boosting rounds.
+
+    Returns:
+        result - the log loss and auc of the variant's out-of-fold predictions.
+    """
+    import lightgbm as lgb
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    start = perf_counter()
+    y = np.load(paths['y'])
+    X = np.load(paths['X'],mmap_mode='r')
+    indices = [columns.index(f) for f in variant['features']]
+
+    preds = np.empty(len(y))
+    for fold, (trainIdx, testIdx) in enumerate(getFolds(y)):
+        booster = lgb.train(params,loadFoldDataset(paths,fold,indices,params),num_boost_round=rounds)
+        #only the testing rows of the variant's columns are copied out of the mapped matrix
+        preds[testIdx] = booster.predict(X[np.ix_(testIdx,indices)])
+
+    return dict(variant,logLoss=log_loss(y,preds),auc=roc_auc_score(y,preds),seconds=perf_counter() - start)
+
+def checkBaseline(trainingFrame,features,baseline,params=PARAMS):
+    """Check the baseline variant against the cross-validated xG of xGModelCreation.
+
+    Parameters:
+        trainingFrame - the features, added columns and outcome.
+        features - the features of the current model.
+        baseline - the result of the baseline variant.
+        params - the LGBM parameters.
+
+    Returns:
+        check - the log loss and auc of xGModelCreation.cvPredict and whether the baseline matches them.
+    """
+    from lightgbm import LGBMClassifier
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    preds = cvPredict(LGBMClassifier(**params),trainingFrame[features + ['Outcome']])[:,1]
+    check = {'logLoss':log_loss(trainingFrame['Outcome'],preds),'auc':roc_auc_score(trainingFrame['Outcome'],preds)}
+    check['matches'] = bool((abs(check['logLoss'] - baseline['logLoss']) <= BASELINE_TOLERANCE) and
+                            (abs(check['auc'] - baseline['auc']) <= BASELINE_TOLERANCE))
+
+    return check
+
+def runAblation(trainingFrame,features,candidates,workers=4,singles=True,directory=ABLATION_DIR,params=PARAMS,rounds=ROUNDS,check=True):
+    """Evaluate the variants of the model features concurrently and compare them to the baseline.
+
+    Parameters:
+        trainingFrame - the features, added columns and outcome.
+        features - the features of the current model.
+        candidates - the columns tried as additions.
+        workers - the variants evaluated at once.
+        singles - include a variant leaving out each single feature.
+        directory - the directory of the feature matrix and the binned folds.
+        params - the lightgbm parameters.
+        rounds - the boosting rounds.
+        check - check the baseline against xGModelCreation.cvPredict (only with the model's rounds).
+
+    Returns:
+        report - the log loss and auc of every variant and their change from the baseline.
+    """
+    start = perf_counter()
+    paths, columns = writeFeatures(trainingFrame,directory)
+
+    #the workers share the machine, so each variant gets its share of the threads
+    variantParams = dict(params,num_threads=max(1,(os.cpu_count() or 1)//workers))
+
+    variants = getVariants(features,candidates,singles)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        #every fold is binned once, before any variant trains on it
+        binStart = perf_counter()
+        binned = [executor.submit(binFold,paths,columns,fold,variantParams) for fold in range(FOLDS)]
+        for future in as_completed(binned):
+            result = future.result()
+            print("Binned fold {} ({:.1f}s)".format(result['fold'],result['seconds']))
+        binSeconds = perf_counter() - binStart
+
+        futures = [executor.submit(runVariant,paths,columns,variant,variantParams,rounds) for variant in variants]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['name']] = result
+            print("{:<24} log loss {:.5f} auc {:.4f} ({:.1f}s)".format(result['name'],result['logLoss'],result['auc'],result['seconds']))
+
+    baseline = results['baseline']
+    for result in results.values():
+        result['logLossDelta'] = result['logLoss'] - baseline['logLoss']
+        result['aucDelta'] = result['auc'] - baseline['auc']
+
+    report = {'rows':len(trainingFrame),'folds':FOLDS,'rounds':rounds,'workers':workers,'binSeconds':binSeconds,
+              'seconds':perf_counter() - start,'created':datetime.now().isoformat(timespec='seconds'),
+              'variants':[results[variant['name']] for variant in variants]}
+    if check and (rounds == ROUNDS):
+        report['baselineCheck'] = checkBaseline(trainingFrame,features,baseline,params)
+
+    return report
+
+def printReport(report):
+    """Print the variants of an ablation sweep, the most harmful change to the model first.
+
+    A positive log loss change means the model got worse without the feature (or with the addition).
+
+    Parameters:
+        report - the report returned by runAblation.
+    """
+    print("{:<24}{:>10}{:>11}{:>10}{:>10}{:>9}".format("Variant","Log Loss","Change","AUC","Change","Secs"))
+    for r in sorted(report['variants'],key=lambda r: -r['logLossDelta']):
+        print("{:<24}{:>10.5f}{:>+11.5f}{:>10.4f}{:>+10.4f}{:>9.1f}".format(r['name'],r['logLoss'],r['logLossDelta'],r['auc'],r['aucDelta'],r['seconds']))
+    print("Evaluated " + str(len(report['variants'])) + " variants of " + str(report['rows']) + " shots with " + str(report['workers']) +
+          " workers in {:.1f}s ({:.1f}s binning the folds)".format(report['seconds'],report['binSeconds']))
+
+    check = report.get('baselineCheck')
+    if check is not None:
+        state = "matches" if check['matches'] else "DOES NOT MATCH"
+        print("Baseline " + state + " xGModelCreation.cvPredict (log loss {:.5f}, auc {:.4f})".format(check['logLoss'],check['auc']))
+
+def main(argv=None):
+    """Run the ablation sweep from the command line."""
+    parser = argparse.ArgumentParser(description="Cross-validate the model without each feature and group of features.")
+    parser.add_argument('--workers',type=int,default=4,help="variants evaluated at once")
+    parser.add_argument('--rounds',type=int,default=ROUNDS,help="boosting rounds of every variant")
+    parser.add_argument('--groups-only',action='store_true',help="skip leaving out single features")
+    parser.add_argument('--skip-check',action='store_true',help="do not check the baseline against xGModelCreation.cvPredict")
+    parser.add_argument('--priors',action='store_true',help="add the prior features written by `priors`, as `train --priors` does")
+    parser.add_argument('--output',default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    shotFrame = pd.read_csv(VENUE_PATH)
+    if args.priors:
+        from .priorFeatures import PRIOR_PATH
+        shotFrame = pd.concat([shotFrame,readPriors(PRIOR_PATH,shotFrame)],axis=1)
+    trainingFrame, features, candidates = prepareAblationFrame(shotFrame[shotFrame['Season'] <= TRAIN_SEASON])
+    del shotFrame
+
+    with profiling.stage("ablation.runAblation",trainingFrame):
+        report = runAblation(trainingFrame,features,candidates,args.workers,not args.groups_only,rounds=args.rounds,check=not args.skip_check)
+
+    printReport(report)
+    writeJson(report,args.output)
+    print("Report written to " + args.output)
+
+    #a baseline that differs from the model's cross validation makes every change meaningless
+    return 1 if not report.get('baselineCheck',{'matches':True})['matches'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+from . import profiling
+from .metricsStore import STRENGTHS
+
+#the labels of each strength in the performance plot
+PLOT_LABELS = {'Total':'Total','EV':'Even Strength','PP':'Power Play','SH':'Penalty Kill'}
+
+def benchmarkPersonalModel(refresh=False):
+    """Benchmark xG data and output the results to the terminal.
+
+    Parameters:
+        refresh - recompute the metrics even if the stored ones are current.
+    """
+    from .metricsStore import getMetrics
+
+    metrics = getMetrics(refresh=refresh)
+
+    #benchmark training and testing data
+    for split, label in [('train','Train'),('test','Test')]:
+        for name in STRENGTHS:
+            logLoss, auc = metrics[split][name]
+            print(name + " " + label + " Log Loss: " + str(logLoss))
+            print(name + " " + label + " AUC: " + str(auc))
+            print("")
+
+def plotModel(refresh=False):
+    """Plots model performance season-over-season using log loss and auc.
+
+    Parameters:
+        refresh - recompute the metrics even if the stored ones are current.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import to_hex
+    from .metricsStore import getMetrics
+
+    metrics = getMetrics(refresh=refresh)
+
+    #get seasons and sort them
+    seasons = sorted(int(i) for i in metrics['seasons'])
+
+    #where log loss and auc performance will be stored
+    llSeason = {name:[metrics['seasons'][str(i)][name][0] for i in seasons] for name in STRENGTHS}
+    aucSeason = {name:[metrics['seasons'][str(i)][name][1] for i in seasons] for name in STRENGTHS}
+
+    #create figure and subplots
+    fig, (ax1, ax2) = plt.subplots(1,2)
+    fig.suptitle('xG Performance over Time',fontsize = 20)
+    fig.set_size_inches(16,8)
+
+    #color palette (the tab10 colors seaborn used, without importing seaborn and scipy)
+    colors = [to_hex(c) for c in plt.get_cmap("tab10").colors[:4]]
+
+    #plot AUC
+    for color, (name, label) in zip(colors,PLOT_LABELS.items()):
+        ax1.plot(seasons,aucSeason[name],label=label,color=color)
+    ax1.set_title("AUC Performance",fontsize = 15)
+    ax1.set_xlabel("Season")
+    ax1.set_ylabel("AUC (Higher is better)")
+    ax1.grid(color = 'grey', linestyle = '--', axis = 'y')
+
+    #plot log loss
+    for color, (name, label) in zip(colors,PLOT_LABELS.items()):
+        ax2.plot(seasons,llSeason[name],label=label,color=color)
+    ax2.set_title("Log Loss Performance",fontsize = 15)
+    ax2.set_xlabel("Season")
+    ax2.set_ylabel("Log Loss (Lower is better)")
+    ax2.grid(color = 'grey', linestyle = '--', axis = 'y')
+
+    #plot legend
+    handles, labels = ax1.get_legend_handles_labels()
+    fig.legend(handles, labels, loc='upper right')
+
+    #save and show the figure
+    with profiling.stage("benchmarkModel.savePlot"):
+        plt.savefig("Plots/performance.png")
+    plt.show()
+   
+
+if __name__ == "__main__":
+    benchmarkPersonalModel()
+    plotModel()
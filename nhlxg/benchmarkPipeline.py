@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from time import perf_counter
+
+import pandas as pd
+
+from . import syntheticData
+from . import shotDataCreation
+from . import venueAdjustedShotDataCreation
+from . import xGModelCreation
+from .metricsStore import computeMetrics
+from .reports import writeJson
+
+#the stages timed for every data size, in pipeline order
+STAGES = ['extraction','venueAdjustment','encoding','cvTraining','scoring','metrics']
+
+#the modules timed by the cold start benchmark and the dependencies they should not load
+COLD_START_MODULES = ['nhlxg','nhlxg.shotDataCreation','nhlxg.venueAdjustedShotDataCreation','nhlxg.xGModelCreation',
+                      'nhlxg.benchmarkModel','nhlxg.cli']
+HEAVY_MODULES = ['lightgbm','optuna','sklearn','matplotlib','seaborn','NHLArenaAdjuster','requests']
+
+#the directory the package is imported from
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#the code run in a fresh interpreter to time an import
+COLD_START_CODE = """import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds':seconds,'loaded':[m for m in {heavy} if m in sys.modules]}}))
+"""
+
+#the synthetic seasons, the last one is used as the test season
+TRAIN_SEASON = 2020
+TEST_SEASON = 2021
+
+def timeStage(timings,name,func,*args):
+    """Run a stage with its output silenced and record how long it took.
+
+    Parameters:
+        timings - the dictionary the stage time is stored in.
+        name - the name of the stage.
+        func - the function which runs the stage.
+        args - the arguments passed to func.
+
+    Returns:
+        result - the value returned by func.
+    """
+    with open(os.devnull,'w') as devnull, redirect_stdout(devnull):
+        start = perf_counter()
+        result = func(*args)
+        timings[name] = perf_counter() - start
+
+    return result
+
+def createWorkspace(directory,nGames,seed):
+    """Write synthetic pbp and player info in the layout the scripts expect.
+
+    Parameters:
+        directory - the directory used as the working directory of the pipeline.
+        nGames - the number of games in the training season.
+        seed - the seed of the synthetic data.
+
+    Returns:
+        files - the paths of the pbp files relative to directory.
+        pbpRows - the number of pbp rows written.
+    """
+    for folder in ["Raw Data/pbp","Raw Data/info","Raw Data/shotData","xG Data","Plots"]:
+        os.makedirs(os.path.join(directory,folder),exist_ok=True)
+
+    #the test season is a quarter of the size of the training season
+    files = []
+    pbpRows = 0
+    for season, games in [(TRAIN_SEASON,nGames),(TEST_SEASON,max(nGames//4,10))]:
+        pbp = syntheticData.generatePbp(games,season=season,seed=seed+season)
+        path = syntheticData.writePbp(pbp,os.path.join(directory,"Raw Data/pbp"),season)
+        files.append(os.path.relpath(path,directory))
+        pbpRows = pbpRows + len(pbp)
+
+    syntheticData.generatePlayers(seed).to_csv(os.path.join(directory,"Raw Data/info/NHLInfo.csv"),index=False)
+
+    return files, pbpRows
+
+def extractAll(files):
+    """Create the season shot files and join them like shotDataCreation does.
+
+    Parameters:
+        files - the pbp files to extract shots from.
+    """
+    for i in files:
+        shotDataCreation.main(i)
+
+    shotDataCreation.mergeSeasons(["NHLShotData" + shotDataCreation.getSeasonString(i) + ".csv" for i in files])
+
+def encodeAll():
+    """Read the venue adjusted shots and encode the train and test seasons.
+
+    Returns:
+        train - the training features and writing frame.
+        test - the testing features and writing frame.
+    """
+    shotFrame = pd.read_csv("Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv")
+    train = xGModelCreation.prepareFrame(shotFrame[shotFrame['Season'] <= TRAIN_SEASON])
+    test = xGModelCreation.prepareFrame(shotFrame[shotFrame['Season'] == TEST_SEASON])
+
+    return train, test
+
+def runPipeline(nGames,seed):
+    """Run every stage of the pipeline on synthetic data and time each one.
+
+    Parameters:
+        nGames - the number of games in the training season.
+        seed - the seed of the synthetic data.
+
+    Returns:
+        timings - the seconds taken by each stage.
+        rows - the number of rows seen at each point of the pipeline.
+    """
+    from lightgbm import LGBMClassifier
+
+    timings = {}
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files, pbpRows = createWorkspace(directory,nGames,seed)
+
+        #the scripts read and write relative to the repo root
+        os.chdir(directory)
+        try:
+            timeStage(timings,'extraction',extractAll,files)
+            timeStage(timings,'venueAdjustment',venueAdjustedShotDataCreation.main)
+            (trainingFrame, writingFrame), (testingFrame, testWritingFrame) = timeStage(timings,'encoding',encodeAll)
+
+            params = xGModelCreation.PARAMS
+            proba = timeStage(timings,'cvTraining',xGModelCreation.cvPredict,LGBMClassifier(**params),trainingFrame)
+            preds = timeStage(timings,'scoring',xGModelCreation.fitPredict,params,trainingFrame,testingFrame)
+
+            xGFrame = pd.concat([writingFrame.assign(xG = proba[:, 1]),testWritingFrame.assign(xG = preds[:, 1])])
+            timeStage(timings,'metrics',computeMetrics,xGFrame)
+        finally:
+            os.chdir(cwd)
+
+    rows = {'pbp':pbpRows,'train':len(trainingFrame),'test':len(testingFrame)}
+
+    return timings, rows
+
+def runBenchmark(sizes,seed=0,repeat=1):
+    """Benchmark the pipeline at several data sizes.
+
+    Parameters:
+        sizes - the numbers of games in the training season to benchmark.
+        seed - the seed of the synthetic data.
+        repeat - the number of runs per size, the fastest time of each stage is kept.
+
+    Returns:
+        report - a dictionary with the environment and the stage times of each size.
+    """
+    report = {'created':datetime.now().isoformat(timespec='seconds'),
+              'python':platform.python_version(),
+              'platform':platform.platform(),
+              'seed':seed,
+              'repeat':repeat,
+              'sizes':{}}
+
+    for nGames in sizes:
+        best = {}
+        for r in range(repeat):
+            timings, rows = runPipeline(nGames,seed)
+            for stage in STAGES:
+                best[stage] = min(best.get(stage,timings[stage]),timings[stage])
+
+        best['total'] = sum(best[stage] for stage in STAGES)
+        report['sizes'][str(nGames)] = {'rows':rows,'seconds':best}
+        print(str(nGames) + " games: " + ", ".join(stage + " " + "{:.3f}s".format(best[stage]) for stage in STAGES + ['total']))
+
+    return report
+
+def compareToBaseline(report,baseline,threshold=0.25,minSeconds=0.05):
+    """Find the stages that got slower than the baseline.
+
+    Parameters:
+        report - the current benchmark report.
+        baseline - a previously stored benchmark report.
+        threshold - the allowed relative slowdown before a stage counts as a regression.
+        minSeconds - slowdowns smaller than this many seconds are treated as noise.
+
+    Returns:
+        regressions - a list of (size, stage, baseline seconds, current seconds) tuples.
+    """
+    regressions = []
+    for size, result in report['sizes'].items():
+        if size not in baseline['sizes']:
+            continue
+
+        baseSeconds = baseline['sizes'][size]['seconds']
+        for stage, seconds in result['seconds'].items():
+            if stage not in baseSeconds:
+                continue
+
+            base = baseSeconds[stage]
+            if (seconds > base*(1 + threshold)) and ((seconds - base) > minSeconds):
+                regressions.append((size,stage,base,seconds))
+
+    return regressions
+
+def measureColdStart(modules=COLD_START_MODULES,repeat=5):
+    """Time importing each module in a fresh interpreter.
+
+    Parameters:
+        modules - the modules to import.
+        repeat - the number of interpreters started per module, the fastest import is kept.
+
+    Returns:
+        coldStart - a dictionary of module to its import seconds, process seconds and the heavy modules it loaded.
+    """
+    coldStart = {}
+    for module in modules:
+        code = COLD_START_CODE.format(module=module,heavy=repr(HEAVY_MODULES))
+        best = None
+        for r in range(repeat):
+            start = perf_counter()
+            output = subprocess.run([sys.executable,'-c',code],capture_output=True,text=True,check=True,cwd=ROOT_DIR).stdout
+            processSeconds = perf_counter() - start
+            result = json.loads(output.strip().splitlines()[-1])
+            if (best is None) or (result['seconds'] < best['importSeconds']):
+                best = {'importSeconds':result['seconds'],'processSeconds':processSeconds,'heavyModules':result['loaded']}
+
+        coldStart[module] = best
+        print(module + ": import " + "{:.3f}s".format(best['importSeconds']) + ", process " +
+              "{:.3f}s".format(best['processSeconds']) + ", heavy modules loaded: " + (", ".join(best['heavyModules']) or "none"))
+
+    return coldStart
+
+def main(argv=None):
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(description="Time each pipeline stage on synthetic pbp data.")
+    parser.add_argument('--sizes',type=int,nargs='+',default=[25,100,400],help="numbers of games in the training season")
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--repeat',type=int,default=1,help="runs per size, the fastest is kept")
+    parser.add_argument('--output',default="Benchmarks/report.json")
+    parser.add_argument('--baseline',default="Benchmarks/baseline.json")
+    parser.add_argument('--threshold',type=float,default=0.25,help="allowed relative slowdown per stage")
+    parser.add_argument('--save-baseline',action='store_true',help="store this run as the new baseline")
+    parser.add_argument('--cold-start',action='store_true',help="also time importing the package in a fresh interpreter")
+    args = parser.parse_args(argv)
+
+    report = runBenchmark(args.sizes,args.seed,args.repeat)
+    if args.cold_start:
+        report['coldStart'] = measureColdStart()
+    writeJson(report,args.output)
+    print("Report written to " + args.output)
+
+    if args.save_baseline:
+        writeJson(report,args.baseline)
+        print("Baseline written to " + args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found at " + args.baseline + ", run with --save-baseline to store one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compareToBaseline(report,baseline,args.threshold)
+    for size, stage, base, seconds in regressions:
+        print("Regression at " + size + " games in " + stage + ": " + "{:.3f}s -> {:.3f}s".format(base,seconds))
+
+    if regressions:
+        return 1
+
+    print("No regressions against " + args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import argparse
+import sys
+
+def runShots(args):
+    """Create the season shot files from pbp data and join them."""
+    from . import shotDataCreation
+
+    files = args.files or shotDataCreation.PBP_FILES
+    window = (args.window_events,args.window_seconds) if args.window else None
+    for i in files:
+        shotDataCreation.main(i,window)
+
+    shotDataCreation.mergeSeasons(["NHLShotData" + shotDataCreation.getSeasonString(i) + ".csv" for i in files])
+
+def runVenue(args):
+    """Venue adjust the joined shot data."""
+    if args.track_memory or (args.max_rss is not None):
+        from . import memoryBudget
+        try:
+            memoryBudget.printSteps(memoryBudget.adjustVenue(ceilingMB=args.max_rss))
+        except memoryBudget.MemoryBudgetError as e:
+            print("venue stopped: " + str(e))
+            return 1
+    else:
+        from . import venueAdjustedShotDataCreation
+        venueAdjustedShotDataCreation.main()
+
+def runTrain(args):
+    """Train the model and write xG for every shot."""
+    if args.compare_memory:
+        from . import outOfCoreTraining
+        outOfCoreTraining.compareMemory(args.chunk_size)
+    elif args.out_of_core:
+        from . import outOfCoreTraining
+        outOfCoreTraining.main(args.chunk_size)
+    elif args.track_memory or (args.max_rss is not None):
+        from . import memoryBudget
+        from .priorFeatures import PRIOR_PATH
+        try:
+            memoryBudget.printSteps(memoryBudget.trainModel(ceilingMB=args.max_rss,priorPath=PRIOR_PATH if args.priors else None))
+        except memoryBudget.MemoryBudgetError as e:
+            print("train stopped: " + str(e))
+            return 1
+    else:
+        from . import xGModelCreation
+        from .priorFeatures import PRIOR_PATH
+        xGModelCreation.main(PRIOR_PATH if args.priors else None)
+
+def runBenchmark(args):
+    """Print the log loss and auc of the xG data."""
+    from . import benchmarkModel
+
+    benchmarkModel.benchmarkPersonalModel(args.refresh)
+
+def runPlot(args):
+    """Plot season-over-season performance."""
+    from . import benchmarkModel
+
+    benchmarkModel.plotModel(args.refresh)
+
+def runScrape(args):
+    """Retrieve player info from the NHL API."""
+    from . import scrapeInfo
+
+    scrapeInfo.main(args.workers,args.rate,args.base_url,args.timeout,args.retries,args.ttl_days)
+
+def runAll(args):
+    """Run every stage of the pipeline in order."""
+    args.files = None
+    args.window = False
+    args.refresh = False
+    args.out_of_core = False
+    args.compare_memory = False
+    args.track_memory = False
+    args.max_rss = None
+    args.priors = False
+    for func in [runShots,runVenue,runTrain,runBenchmark,runPlot]:
+        func(args)
+
+def runOnIce(args):
+    """Write on-ice, individual and goalie totals of every player."""
+    from . import onIce
+
+    onIce.main(output=args.output,season=args.season,strength=args.strength,playoffs=args.playoffs)
+
+def runPriors(args):
+    """Write shooter and goalie prior features of the venue adjusted shots."""
+    from . import priorFeatures
+
+    try:
+        priorFeatures.main(halfLife=args.half_life)
+    except FileNotFoundError as e:
+        print(e)
+        return 1
+
+def runCube(args):
+    """Add new games of the xG data to the rollup cube."""
+    from . import rollupCube
+
+    rollupCube.main(refresh=args.refresh)
+
+def runStore(args):
+    """Build the memory-mapped shot store from the xG data."""
+    from . import shotStore
+
+    shotStore.main()
+
+def runPipeline(args):
+    """Run the pipeline stages whose inputs or code changed."""
+    from . import pipelineRunner
+
+    return pipelineRunner.main(args.rest)
+
+def runContributions(args):
+    """Export per-feature contributions to the xG of every shot."""
+    from . import contributionExport
+
+    return contributionExport.main(args.rest)
+
+def runBacktest(args):
+    """Score every season with a model trained on the seasons before it."""
+    from . import walkForward
+
+    return walkForward.main(args.rest)
+
+def runQueue(args):
+    """Extract shots through a work queue on a shared directory."""
+    from . import workQueue
+
+    return workQueue.main(args.rest)
+
+def runSharedCV(args):
+    """Cross-validate the model with folds in worker processes sharing one feature matrix."""
+    from . import sharedFeatures
+
+    return sharedFeatures.main(args.rest)
+
+def runAblation(args):
+    """Cross-validate the model without each feature and group of features."""
+    from . import ablation
+
+    return ablation.main(args.rest)
+
+def runBench(args):
+    """Run the synthetic pipeline benchmark suite."""
+    from . import benchmarkPipeline
+
+    return benchmarkPipeline.main(args.rest)
+
+def runReplay(args):
+    """Replay a season game by game and report per-game latency."""
+    from . import replayHarness
+
+    return replayHarness.main(args.rest)
+
+def runColdStart(args):
+    """Time importing the package in fresh interpreters."""
+    from . import benchmarkPipeline
+
+    benchmarkPipeline.measureColdStart(repeat=args.repeat)
+
+def runCheckKernels(args):
+    """Check the array kernels against the scalar functions."""
+    from . import kernels, kernelCheck
+
+    failures = kernelCheck.checkKernels(args.n,args.seed)
+    backend = "numba" if kernels.getJitKernels() else "numpy"
+    if failures:
+        print("Kernels differing from the scalar functions (" + backend + "): " + ", ".join(failures))
+        return 1
+
+    print("All kernels match the scalar functions (" + backend + ")")
+
+def runProfileSummary(args):
+    """Print the stages of a profiling report."""
+    from . import profiling
+
+    profiling.summarize(args.report)
+
+def buildParser():
+    """Build the command line parser.
+
+    Returns:
+        parser - the argparse parser with a sub command per stage.
+    """
+    parser = argparse.ArgumentParser(prog="python -m nhlxg",description="Run the stages of the NHL xG pipeline.")
+    commands = parser.add_subparsers(dest='command',required=True)
+
+    shots = commands.add_parser('shots',help="create shot data from pbp data")
+    shots.add_argument('files',nargs='*',help="pbp files (all seasons by default)")
+    shots.add_argument('--window',action='store_true',help="add counts of the events leading up to each shot")
+    shots.add_argument('--window-events',type=int,default=10,help="events looked back over by the window features")
+    shots.add_argument('--window-seconds',type=int,default=10,help="seconds looked back over by the window features")
+    shots.set_defaults(func=runShots)
+
+    venue = commands.add_parser('venue',help="venue adjust the shot data")
+    venue.add_argument('--track-memory',action='store_true',help="report the peak memory of each step")
+    venue.add_argument('--max-rss',type=float,help="stop with an error if the peak memory goes over this many MB (implies --track-memory)")
+    venue.set_defaults(func=runVenue)
+    train = commands.add_parser('train',help="train the model and write xG data")
+    train.add_argument('--out-of-core',action='store_true',help="train from binned features on disk instead of in memory")
+    train.add_argument('--chunk-size',type=int,default=100000,help="shots read at a time out of core")
+    train.add_argument('--track-memory',action='store_true',help="report the peak memory of each step")
+    train.add_argument('--max-rss',type=float,help="stop with an error if the peak memory goes over this many MB (implies --track-memory)")
+    train.add_argument('--compare-memory',action='store_true',help="run every mode in fresh interpreters and report their peak memory")
+    train.add_argument('--priors',action='store_true',help="use the prior features written by `priors` as model features")
+    train.set_defaults(func=runTrain)
+    for name, func, text in [('benchmark',runBenchmark,"print log loss and auc of the xG data"),
+                             ('plot',runPlot,"plot season-over-season performance")]:
+        command = commands.add_parser(name,help=text)
+        command.add_argument('--refresh',action='store_true',help="recompute the stored metrics")
+        command.set_defaults(func=func)
+    scrape = commands.add_parser('scrape',help="retrieve player info from the NHL API")
+    scrape.add_argument('--workers',type=int,default=8,help="most requests in flight at once")
+    scrape.add_argument('--rate',type=float,default=10,help="most requests started per second")
+    scrape.add_argument('--timeout',type=float,default=10,help="seconds to wait for a response")
+    scrape.add_argument('--retries',type=int,default=5,help="retries of a failed request")
+    scrape.add_argument('--base-url',default='https://api-web.nhle.com',help="the API to use, e.g. a local nhlxg.fakeApi server")
+    scrape.add_argument('--ttl-days',type=float,default=30,help="days a cached player stays current (0 refreshes all)")
+    scrape.set_defaults(func=runScrape)
+    players = commands.add_parser('onice',help="aggregate on-ice, individual and goalie xG per player")
+    players.add_argument('--season',type=int,nargs='*',help="seasons to include (all by default)")
+    players.add_argument('--strength',choices=['EV','PP','SH'],help="strength to include (all by default)")
+    players.add_argument('--playoffs',type=int,choices=[0,1],help="0 for the regular season, 1 for the playoffs")
+    players.add_argument('--output',default="xG Data/playerTotals.csv")
+    players.set_defaults(func=runOnIce)
+    priors = commands.add_parser('priors',help="write shooter and goalie totals from earlier games of the venue adjusted shots, xG from the backtest")
+    priors.add_argument('--half-life',type=float,help="days after which a game counts half (no decay by default)")
+    priors.set_defaults(func=runPriors)
+    cube = commands.add_parser('cube',help="add new games of the xG data to the rollup cube")
+    cube.add_argument('--refresh',action='store_true',help="rebuild the cube from every game")
+    cube.set_defaults(func=runCube)
+    commands.add_parser('store',help="build the memory-mapped shot store").set_defaults(func=runStore)
+    commands.add_parser('all',help="run shots, venue, train, benchmark and plot").set_defaults(func=runAll)
+    commands.add_parser('contrib',help="export per-feature contributions to the xG of every shot",add_help=False).set_defaults(func=runContributions)
+    commands.add_parser('backtest',help="score every season with a model trained on the seasons before it",add_help=False).set_defaults(func=runBacktest)
+    commands.add_parser('queue',help="extract shots on several hosts through a shared work queue",add_help=False).set_defaults(func=runQueue)
+    commands.add_parser('sharedcv',help="cross-validate with fold workers attached to one shared feature matrix",add_help=False).set_defaults(func=runSharedCV)
+    commands.add_parser('ablation',help="cross-validate the model without each feature and group of features",add_help=False).set_defaults(func=runAblation)
+    commands.add_parser('run',help="run only the stages whose inputs or code changed",add_help=False).set_defaults(func=runPipeline)
+
+    #these commands parse their own options
+    commands.add_parser('bench',help="benchmark the pipeline on synthetic data",add_help=False).set_defaults(func=runBench)
+
+    commands.add_parser('replay',help="replay pbp game by game and report per-game latency",add_help=False).set_defaults(func=runReplay)
+
+    coldStart = commands.add_parser('coldstart',help="time importing the package")
+    coldStart.add_argument('--repeat',type=int,default=5)
+    coldStart.set_defaults(func=runColdStart)
+
+    check = commands.add_parser('check-kernels',help="check the array kernels against the scalar functions")
+    check.add_argument('-n',type=int,default=10000,help="number of random inputs")
+    check.add_argument('--seed',type=int,default=0)
+    check.set_defaults(func=runCheckKernels)
+
+    profile = commands.add_parser('profile-summary',help="print a profiling report")
+    profile.add_argument('report')
+    profile.set_defaults(func=runProfileSummary)
+
+    return parser
+
+def main(argv=None):
+    """Run a pipeline stage from the command line.
+
+    Parameters:
+        argv - the command line arguments (sys.argv by default).
+
+    Returns:
+        status - the exit status.
+    """
+    parser = buildParser()
+    args, rest = parser.parse_known_args(argv)
+    if args.command in ['bench','replay','run','contrib','backtest','queue','sharedcv','ablation']:
+        args.rest = rest
+    elif rest:
+        parser.error("unrecognized arguments: " + " ".join(rest))
+
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .xGModelCreation import MODEL_PATH
+from .metricsStore import hashFile
+
+#the xG data explained and the directory the contributions are written to
+XG_PATH = "xG Data/xGData2010-2021.csv"
+CONTRIBUTION_DIR = "xG Data/contributions"
+
+#the columns copied from the xG data so the contributions can be used on their own
+ID_COLUMNS = {'GameID':np.int64,'xG':np.float32}
+
+def countRows(path):
+    """Count the data rows of a csv without parsing it.
+
+    Parameters:
+        path - the path of the csv.
+
+    Returns:
+        rows - the number of lines after the header.
+    """
+    lines = 0
+    with open(path,'rb') as f:
+        for block in iter(lambda: f.read(2**24),b''):
+            lines = lines + block.count(b'\n')
+
+    return lines - 1
+
+def getColumnNames(features):
+    """Name the columns written for each shot.
+
+    Parameters:
+        features - the feature names of the booster.
+
+    Returns:
+        columns - the column names, one contribution per feature and one for the bias.
+    """
+    return list(ID_COLUMNS) + ['modelXG'] + ['contrib_' + f for f in features] + ['contrib_bias']
+
+def createColumns(directory,columns,rows):
+    """Create the .npy file of every column, sized for all rows.
+
+    Parameters:
+        directory - the directory of the files.
+        columns - the column names.
+        rows - the number of rows.
+
+    Returns:
+        files - a dictionary of column name to (path, byte offset of the data, dtype).
+    """
+    files = {}
+    for name in columns:
+        path = os.path.join(directory,name + ".npy")
+        dtype = np.dtype(ID_COLUMNS.get(name,np.float32))
+        array = np.lib.format.open_memmap(path,mode='w+',dtype=dtype,shape=(rows,))
+        files[name] = (path,array.offset,dtype)
+        del array
+
+    return files
+
+def writeRows(files,start,values):
+    """Write rows of each column in place.
+
+    The rows are written with positioned writes rather than through a memory map so the written
+    pages are not counted in the memory of the process.
+
+    Parameters:
+        files - the files returned by createColumns.
+        start - the position of the first row.
+        values - a dictionary of column name to the array of rows.
+    """
+    for name, array in values.items():
+        path, offset, dtype = files[name]
+        data = np.ascontiguousarray(array,dtype=dtype).tobytes()
+        fd = os.open(path,os.O_WRONLY)
+        try:
+            os.pwrite(fd,data,offset + start*dtype.itemsize)
+        finally:
+            os.close(fd)
+
+def explainChunk(booster,chunk,features):
+    """Calculate the contributions of every feature to the score of each shot in a chunk.
+
+    Parameters:
+        booster - the lightgbm booster.
+        chunk - the dataframe of shots.
+        features - the feature names of the booster.
+
+    Returns:
+        values - a dictionary of column name to the array of rows.
+    """
+    X = chunk[features].to_numpy(dtype=np.float64)
+
+    #each chunk is run on one thread, the chunks themselves run in parallel
+    contributions = booster.predict(X,pred_contrib=True,num_threads=1)
+
+    #contributions are in log-odds and sum to the raw score of the shot
+    values = {name: chunk[name].to_numpy() for name in ID_COLUMNS}
+    values['modelXG'] = 1/(1 + np.exp(-contributions.sum(axis=1)))
+    for i, name in enumerate(features):
+        values['contrib_' + name] = contributions[:,i]
+    values['contrib_bias'] = contributions[:,-1]
+
+    return values
+
+def exportContributions(path=XG_PATH,directory=CONTRIBUTION_DIR,modelPath=MODEL_PATH,chunkSize=50000,workers=4):
+    """Write the contribution of every feature to the score of every shot of the xG data.
+
+    The xG data is read in chunks and at most two chunks per worker are held at once, so memory
+    does not grow with the number of shots. Row i of every column is row i of the xG data.
+
+    Parameters:
+        path - the path of the xG data.
+        directory - the directory the columns are written to.
+        modelPath - the path of the booster saved by xGModelCreation.
+        chunkSize - the shots explained at a time.
+        workers - the chunks explained at once.
+
+    Returns:
+        report - the rows, throughput and memory of the export.
+    """
+    import lightgbm as lgb
+
+    booster = lgb.Booster(model_file=modelPath)
+    features = booster.feature_name()
+    rows = countRows(path)
+
+    #the columns are built next to the old ones and swapped in when complete
+    tmpDir = directory + "." + str(os.getpid()) + ".tmp"
+    shutil.rmtree(tmpDir,ignore_errors=True)
+    os.makedirs(tmpDir)
+    files = createColumns(tmpDir,getColumnNames(features),rows)
+
+    def explain(start,chunk):
+        writeRows(files,start,explainChunk(booster,chunk,features))
+        return len(chunk)
+
+    memory = [profiling.getRssMB()]
+    start = perf_counter()
+    written = 0
+    position = 0
+    running = set()
+    reader = pd.read_csv(path,usecols=features + list(ID_COLUMNS),chunksize=chunkSize)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in reader:
+            #wait for a worker before reading further so chunks do not pile up
+            while len(running) >= 2*workers:
+                done, running = wait(running,return_when=FIRST_COMPLETED)
+                written = written + sum(f.result() for f in done)
+                memory.append(profiling.getRssMB())
+
+            running.add(executor.submit(explain,position,chunk))
+            position = position + len(chunk)
+            del chunk
+
+        done, running = wait(running)
+        written = written + sum(f.result() for f in done)
+        memory.append(profiling.getRssMB())
+
+    seconds = perf_counter() - start
+
+    meta = {'rows':written,'source':path,'model':hashFile(modelPath),'features':features,
+            'columns':getColumnNames(features),'created':datetime.now().isoformat(timespec='seconds')}
+    with open(os.path.join(tmpDir,"meta.json"),'w') as f:
+        json.dump(meta,f,indent=2)
+
+    oldDir = directory + "." + str(os.getpid()) + ".old"
+    if os.path.exists(directory):
+        os.rename(directory,oldDir)
+    os.rename(tmpDir,directory)
+    shutil.rmtree(oldDir,ignore_errors=True)
+
+    report = {
+        'rows':written,
+        'features':len(features),
+        'chunkSize':chunkSize,
+        'workers':workers,
+        'seconds':seconds,
+        'rowsPerSecond':written/seconds,
+        'memory':{'startMB':memory[0],'endMB':memory[-1],'maxSampledMB':max(memory),'peakMB':profiling.getPeakRssMB()},
+    }
+
+    return report
+
+def loadContributions(directory=CONTRIBUTION_DIR,columns=None):
+    """Open exported contributions as read-only memory-mapped columns.
+
+    Parameters:
+        directory - the directory of the columns.
+        columns - the columns to open (all columns if None).
+
+    Returns:
+        contributions - a dictionary of column name to memory-mapped array.
+    """
+    with open(os.path.join(directory,"meta.json")) as f:
+        meta = json.load(f)
+
+    return {name: np.load(os.path.join(directory,name + ".npy"),mmap_mode='r')[:meta['rows']] for name in columns or meta['columns']}
+
+def main(argv=None):
+    """Export feature contributions from the command line."""
+    parser = argparse.ArgumentParser(description="Write per-feature contributions to the xG of every shot.")
+    parser.add_argument('--chunk-size',type=int,default=50000,help="shots explained at a time")
+    parser.add_argument('--workers',type=int,default=4,help="chunks explained at once")
+    parser.add_argument('--output',default=CONTRIBUTION_DIR)
+    args = parser.parse_args(argv)
+
+    with profiling.stage("contributionExport.exportContributions") as record:
+        report = exportContributions(directory=args.output,chunkSize=args.chunk_size,workers=args.workers)
+        record['rowsOut'] = report['rows']
+
+    memory = report['memory']
+    print("Explained " + str(report['rows']) + " shots with " + str(report['features']) + " features in " +
+          "{:.1f}s ({:.0f} shots/s)".format(report['seconds'],report['rowsPerSecond']))
+    print("Memory: {:.0f}MB at the start, {:.0f}MB at the end, {:.0f}MB peak".format(memory['startMB'],memory['endMB'],memory['peakMB']))
+    print("Contributions written to " + args.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import argparse
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+
+#the landing page path served, matching scrapeInfo.PLAYER_PATH
+PLAYER_PATTERN = re.compile(r'^/v1/player/(\d+)/landing$')
+
+#a 200 response cut off partway through its json
+BAD_JSON = b'{"playerId": '
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Serve player landing pages with simulated latency, rate limiting and server errors."""
+
+    def do_GET(self):
+        """Answer a player request."""
+        config = self.server.config
+        match = PLAYER_PATTERN.match(self.path)
+        playerId = int(match.group(1)) if match is not None else None
+
+        #scripted responses are served first, in order, then the simulation takes over
+        with self.server.lock:
+            self.server.requests = self.server.requests + 1
+            self.server.log.append((monotonic(),playerId))
+            scripted = self.server.script.get(playerId)
+            response = scripted.pop(0) if scripted else None
+
+        sleep(random.uniform(config['minLatency'],config['maxLatency']))
+
+        if match is None:
+            self.sendJson(404,{'message':'Not found'})
+            return
+
+        #simulate the API rejecting or failing requests
+        if response is None:
+            roll = random.random()
+            if roll < config['rate429']:
+                response = 429
+            elif roll < config['rate429'] + config['rate500']:
+                response = 500
+            elif roll < config['rate429'] + config['rate500'] + config['rateBadJson']:
+                response = 'badJson'
+            else:
+                response = 200
+
+        if response == 'timeout':
+            #hang without answering until the client has given up
+            sleep(config['hangSeconds'])
+        elif response == 'badJson':
+            self.sendBody(200,BAD_JSON)
+        elif response == 429:
+            self.sendJson(429,{'message':'Too many requests'},{'Retry-After':str(config['retryAfter'])})
+        elif response != 200:
+            self.sendJson(response,{'message':'Error ' + str(response)})
+        else:
+            #handedness is fixed per player so repeated runs agree
+            self.sendJson(200,{'playerId':playerId,
+                               'shootsCatches':'L' if playerId % 3 else 'R',
+                               'position':['C','L','R','D','D'][playerId % 5]})
+
+    def sendJson(self,status,body,headers={}):
+        """Send a json response.
+
+        Parameters:
+            status - the HTTP status code.
+            body - the dictionary sent as json.
+            headers - extra response headers.
+        """
+        self.sendBody(status,json.dumps(body).encode(),headers)
+
+    def sendBody(self,status,data,headers={}):
+        """Send a response with a json content type.
+
+        Parameters:
+            status - the HTTP status code.
+            data - the bytes of the body.
+            headers - extra response headers.
+        """
+        self.send_response(status)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key,value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self,format,*args):
+        """Do not log every request."""
+        pass
+
+def startServer(port=0,minLatency=0.02,maxLatency=0.2,rate429=0.05,rate500=0.05,retryAfter=0,rateBadJson=0,script=None,hangSeconds=5):
+    """Start a stand-in for the NHL API in a background thread.
+
+    Parameters:
+        port - the port to listen on (0 picks a free port).
+        minLatency - the shortest response delay in seconds.
+        maxLatency - the longest response delay in seconds.
+        rate429 - the share of requests answered with 429.
+        rate500 - the share of requests answered with 500.
+        retryAfter - the Retry-After seconds sent with 429 responses.
+        rateBadJson - the share of requests answered with a 200 whose json is cut off.
+        script - a dictionary of player ID to the responses of its first requests, in order. Each
+                 is an HTTP status, 'timeout' (no answer for hangSeconds) or 'badJson'.
+        hangSeconds - the seconds a 'timeout' response hangs.
+
+    Returns:
+        server - the running server, stop it with server.shutdown(). server.log holds the time
+                 and player ID of every request.
+        url - the base URL to pass to scrapeInfo.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1',port),FakeApiHandler)
+    server.daemon_threads = True
+    server.config = {'minLatency':minLatency,'maxLatency':maxLatency,'rate429':rate429,'rate500':rate500,'retryAfter':retryAfter,
+                     'rateBadJson':rateBadJson,'hangSeconds':hangSeconds}
+    server.script = {int(playerId): list(responses) for playerId, responses in (script or {}).items()}
+    server.requests = 0
+    server.log = []
+    server.lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever,daemon=True)
+    thread.start()
+
+    return server, "http://127.0.0.1:" + str(server.server_address[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stand-in for the NHL player API.")
+    parser.add_argument('--port',type=int,default=8000)
+    parser.add_argument('--min-latency',type=float,default=0.02)
+    parser.add_argument('--max-latency',type=float,default=0.2)
+    parser.add_argument('--rate-429',type=float,default=0.05)
+    parser.add_argument('--rate-500',type=float,default=0.05)
+    parser.add_argument('--rate-bad-json',type=float,default=0)
+    args = parser.parse_args()
+
+    server, url = startServer(args.port,args.min_latency,args.max_latency,args.rate_429,args.rate_500,rateBadJson=args.rate_bad_json)
+    print("Serving on " + url)
+    threading.Event().wait()
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from .kernels import (calculateDistArray, calculateAngleArray, encodeStrengthArray, getRelativeZoneArray,
+                      encodeStrengthIntArray, encodeSpecialStrengthsArray)
+from .shotDataCreation import calculateDist, calculateAngle, encodeStrength, getRelativeZone
+from .xGModelCreation import encodeStrength as encodeStrengthInt, encodeSpecialStrengths
+
+#the check is kept out of kernels.py so the stages using the kernels do not import the scalar stages
+
+def checkKernels(n=10000,seed=0):
+    """Check the array kernels against the scalar functions on random and edge case inputs.
+
+    Parameters:
+        n - the number of random inputs.
+        seed - the seed of the random generator.
+
+    Returns:
+        failures - the names of the kernels that did not match.
+    """
+    rng = np.random.default_rng(seed)
+
+    #integer rink coordinates make equal x values (zero dx) common, with some missing values
+    x1 = rng.integers(-99,100,n).astype(float)
+    y1 = rng.integers(-42,43,n).astype(float)
+    x2 = np.where(rng.random(n) < 0.2,x1,rng.integers(-99,100,n)).astype(float)
+    y2 = rng.integers(-42,43,n).astype(float)
+    x1[rng.random(n) < 0.01] = np.nan
+    y2[rng.random(n) < 0.01] = np.nan
+
+    teams = np.array(['BOS','TOR',np.nan],dtype=object)
+    team = teams[rng.integers(0,3,n)]
+    homeTeam = teams[rng.integers(0,2,n)]
+    lastTeam = teams[rng.integers(0,3,n)]
+    lastZone = np.array(['Off','Def','Neu',np.nan],dtype=object)[rng.integers(0,4,n)]
+    st = np.array(['5x5','5x4','4x5','4x4','3x3','6x5','5x6','4x3','3x4','6x4'])[rng.integers(0,10,n)]
+    rel = np.array(['5v5','5v4','4v5','4v4','3v3','6v5','5v6','4v3','3v4','6v4'])[rng.integers(0,10,n)]
+
+    def same(a,b):
+        a = np.asarray(a,dtype=object)
+        b = np.asarray(b,dtype=object)
+        if all(isinstance(v,float) for v in a) and all(isinstance(v,float) for v in b):
+            return np.allclose(a.astype(float),b.astype(float),equal_nan=True)
+        return all((u == v) or (pd.isna(u) and pd.isna(v)) for u, v in zip(a,b))
+
+    checks = {
+        'calculateDistArray':(calculateDistArray(x1,y1,x2,y2),[calculateDist(*v) for v in zip(x1,y1,x2,y2)]),
+        'calculateAngleArray':(calculateAngleArray(x1,y1,x2,y2),[float(calculateAngle(*v)) for v in zip(x1,y1,x2,y2)]),
+        'encodeStrengthArray':(encodeStrengthArray(st,team,homeTeam),[encodeStrength(*v) for v in zip(st,team,homeTeam)]),
+        'getRelativeZoneArray':(getRelativeZoneArray(team,lastTeam,lastZone),[getRelativeZone(*v) for v in zip(team,lastTeam,lastZone)]),
+        'encodeStrengthIntArray':(encodeStrengthIntArray(rel),[encodeStrengthInt(v) for v in rel]),
+        'encodeSpecialStrengthsArray':(encodeSpecialStrengthsArray(rel),[encodeSpecialStrengths(v) for v in rel]),
+    }
+
+    failures = [name for name, (array, scalar) in checks.items() if not same(array,scalar)]
+
+    return failures
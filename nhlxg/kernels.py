@@ -0,0 +1,210 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+#the integer codes of the less common strengths (see xGModelCreation.encodeSpecialStrengths)
+SPECIAL_STRENGTHS = {'3v3':1,'4v4':2,'6v5':3,'4v3':4,'3v4':5,'6v4':6}
+
+#the zone of a previous event seen from the other team (see shotDataCreation.getRelativeZone)
+FLIPPED_ZONES = {'Neu':'Neu','Off':'Def','Def':'Off'}
+
+#the numba compiled kernels, built on first use when numba is installed and XG_NUMBA is not 0
+_jit = None
+
+def getJitKernels():
+    """Compile the numeric kernels with numba if it is available.
+
+    Returns:
+        kernels - a dictionary of compiled kernels, empty when numba is not used.
+    """
+    global _jit
+    if _jit is not None:
+        return _jit
+
+    _jit = {}
+    if os.environ.get('XG_NUMBA','1') == '0':
+        return _jit
+
+    try:
+        from numba import njit
+    except ImportError:
+        return _jit
+
+    @njit(cache=True)
+    def distLoop(x1,y1,x2,y2):
+        out = np.empty(x1.shape[0])
+        for i in range(x1.shape[0]):
+            out[i] = (((x2[i]-x1[i])**2) + ((y2[i]-y1[i])**2))**(1/2)
+        return out
+
+    @njit(cache=True)
+    def angleLoop(x1,y1,x2,y2):
+        out = np.empty(x1.shape[0])
+        for i in range(x1.shape[0]):
+            dx = x2[i]-x1[i]
+            if dx != 0:
+                out[i] = math.degrees(math.atan((y2[i]-y1[i])/dx))
+            else:
+                out[i] = 0.0
+        return out
+
+    _jit['dist'] = distLoop
+    _jit['angle'] = angleLoop
+
+    return _jit
+
+def toFloatArrays(*cols):
+    """Broadcast columns or scalars to float arrays of the same length.
+
+    Parameters:
+        cols - numpy arrays, pandas series or scalars.
+
+    Returns:
+        arrays - a list of contiguous float64 arrays.
+    """
+    arrays = [np.asarray(c,dtype=np.float64) for c in cols]
+    shape = np.broadcast_shapes(*[a.shape for a in arrays])
+
+    #broadcast views are read-only (numba compiles them separately), so scalars are copied out
+    return [np.ascontiguousarray(a) if a.shape == shape else np.array(np.broadcast_to(a,shape)) for a in arrays]
+
+def wrapLike(values,*cols):
+    """Return a series with the index of the first series input, or the array otherwise.
+
+    Parameters:
+        values - the computed array.
+        cols - the inputs of the kernel.
+
+    Returns:
+        values - a pandas series or numpy array.
+    """
+    for c in cols:
+        if isinstance(c,pd.Series):
+            return pd.Series(values,index=c.index)
+
+    return values
+
+def calculateDistArray(x1,y1,x2,y2):
+    """Calculate the distance from one location to another for whole columns.
+
+    Array version of shotDataCreation.calculateDist, any argument may be a scalar.
+
+    Parameters:
+        x1 - the x coordinates of the first locations.
+        y1 - the y coordinates of the first locations.
+        x2 - the x coordinates of the second locations.
+        y2 - the y coordinates of the second locations.
+
+    Returns:
+        d - the distances between the locations.
+    """
+    a, b, c, d = toFloatArrays(x1,y1,x2,y2)
+    jit = getJitKernels()
+    if 'dist' in jit:
+        dist = jit['dist'](a,b,c,d)
+    else:
+        dist = (((c-a)**2) + ((d-b)**2))**(1/2)
+
+    return wrapLike(dist,x1,y1,x2,y2)
+
+def calculateAngleArray(x1,y1,x2,y2):
+    """Calculate the angle between locations for whole columns.
+
+    Array version of shotDataCreation.calculateAngle, locations with the same x have an angle of
+    zero and missing coordinates give NaN.
+
+    Parameters:
+        x1 - the x coordinates of the first locations.
+        y1 - the y coordinates of the first locations.
+        x2 - the x coordinates of the second locations.
+        y2 - the y coordinates of the second locations.
+
+    Returns:
+        a - the angles between the locations in degrees.
+    """
+    a, b, c, d = toFloatArrays(x1,y1,x2,y2)
+    jit = getJitKernels()
+    if 'angle' in jit:
+        angle = jit['angle'](a,b,c,d)
+    else:
+        dx = c - a
+        with np.errstate(divide='ignore',invalid='ignore'):
+            angle = np.where(dx != 0,np.degrees(np.arctan((d-b)/dx)),0.0)
+
+    return wrapLike(angle,x1,y1,x2,y2)
+
+def encodeStrengthArray(st,team,homeTeam):
+    """Encode the strength relative to the event team for whole columns.
+
+    Array version of shotDataCreation.encodeStrength.
+
+    Parameters:
+        st - the strength strings (home x away).
+        team - the event teams.
+        homeTeam - the home teams.
+
+    Returns:
+        strength - the strengths as for v against strings.
+    """
+    st = pd.Series(st)
+    first = st.str[0]
+    third = st.str[2]
+    isHome = np.asarray(team) == np.asarray(homeTeam)
+    strength = np.where(isHome,first + "v" + third,third + "v" + first)
+
+    return pd.Series(strength,index=st.index)
+
+def getRelativeZoneArray(currentTeam,lastTeam,lastZone):
+    """Calculate the zone of previous events relative to the current team for whole columns.
+
+    Array version of shotDataCreation.getRelativeZone.
+
+    Parameters:
+        currentTeam - the teams of the current events.
+        lastTeam - the teams of the previous events.
+        lastZone - the recorded zones of the previous events.
+
+    Returns:
+        lastZone - the zones of the previous events relative to the current teams.
+    """
+    lastZone = pd.Series(lastZone)
+    flipped = lastZone.map(FLIPPED_ZONES).fillna("None")
+    sameTeam = np.asarray(currentTeam,dtype=object) == np.asarray(lastTeam,dtype=object)
+
+    return lastZone.where(sameTeam,flipped)
+
+def encodeStrengthIntArray(strength):
+    """Encode team strengths as integers for whole columns.
+
+    Array version of xGModelCreation.encodeStrength.
+
+    Parameters:
+        strength - the strength strings of the teams shooting.
+
+    Returns:
+        st - the players for minus players against.
+    """
+    strength = pd.Series(strength)
+
+    #split gives no columns for an empty column
+    if len(strength) == 0:
+        return pd.Series(np.zeros(0,dtype=int),index=strength.index)
+
+    numbers = strength.str.split("v",expand=True).astype(int)
+
+    return numbers[0] - numbers[1]
+
+def encodeSpecialStrengthsArray(strength):
+    """Encode less common team strengths for whole columns.
+
+    Array version of xGModelCreation.encodeSpecialStrengths.
+
+    Parameters:
+        strength - the strength strings of the teams shooting.
+
+    Returns:
+        code - the integer codes of the special strengths (0 for common strengths).
+    """
+    return pd.Series(strength).map(SPECIAL_STRENGTHS).fillna(0).astype(int)
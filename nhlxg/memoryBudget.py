@@ -0,0 +1,173 @@
+import os
+import signal
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from . import profiling
+from . import venueAdjustedShotDataCreation
+from . import xGModelCreation
+
+#the seconds between checks of the resident memory against the budget
+POLL_SECONDS = 0.05
+
+#the signal the watchdog interrupts the main thread with when the ceiling is crossed
+INTERRUPT_SIGNAL = getattr(signal,'SIGUSR1',None)
+
+class MemoryBudgetError(MemoryError):
+    """Raised when a budgeted stage goes over its peak memory ceiling."""
+
+def resetPeakRss():
+    """Reset the peak resident memory of this process so the next step's peak can be read.
+
+    Returns:
+        reset - True if the peak was reset (Linux only).
+    """
+    try:
+        with open('/proc/self/clear_refs','w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+@contextmanager
+def budget(ceilingMB=None,steps=None):
+    """Enforce a peak resident memory ceiling on a block run in steps.
+
+    A watchdog thread checks the resident memory every POLL_SECONDS. When it first goes over the
+    ceiling, the watchdog signals the main thread, which raises a MemoryBudgetError in the step
+    running, so the step stops instead of allocating on until the machine runs out of memory.
+    Python runs the signal handler once a call into C code returns, so one very large allocation
+    can still go past the ceiling. Where the block does not run on the main thread (signals can
+    only be handled there), track raises the error at the end of the step instead. The peak is
+    checked again when the block ends in case a spike fell between checks.
+
+    Parameters:
+        ceilingMB - the ceiling in MB (only tracked if None).
+        steps - the list the step peaks are added to by track.
+
+    Returns:
+        state - a dictionary with the ceiling, the step peaks and the overall peak.
+    """
+    state = {'ceilingMB':ceilingMB,'steps':steps if steps is not None else [],'peakRssMB':0.0,'exceeded':None,'step':None}
+    stop = threading.Event()
+    interrupt = (ceilingMB is not None) and (INTERRUPT_SIGNAL is not None) and (threading.current_thread() is threading.main_thread())
+
+    def onExceeded(signum,frame):
+        raise getExceededError(state)
+
+    def watch():
+        while not stop.wait(POLL_SECONDS):
+            rss = profiling.getRssMB()
+            state['peakRssMB'] = max(state['peakRssMB'],rss)
+            if (ceilingMB is not None) and (rss > ceilingMB) and (state['exceeded'] is None):
+                state['exceeded'] = (state['step'],rss)
+                if interrupt:
+                    os.kill(os.getpid(),INTERRUPT_SIGNAL)
+
+    previous = signal.signal(INTERRUPT_SIGNAL,onExceeded) if interrupt else None
+    watchdog = threading.Thread(target=watch,daemon=True)
+    watchdog.start()
+    try:
+        yield state
+    finally:
+        stop.set()
+        watchdog.join()
+        if interrupt:
+            signal.signal(INTERRUPT_SIGNAL,previous)
+
+    state['peakRssMB'] = max([state['peakRssMB']] + [step['peakRssMB'] for step in state['steps']])
+    if (ceilingMB is not None) and (state['peakRssMB'] > ceilingMB):
+        raise MemoryBudgetError("peak resident memory of {:.0f}MB is over the budget of {:.0f}MB".format(state['peakRssMB'],ceilingMB))
+
+def getExceededError(state):
+    """Describe the step that went over the ceiling of a budgeted stage.
+
+    Parameters:
+        state - the state yielded by budget, after the watchdog found the ceiling exceeded.
+
+    Returns:
+        error - the MemoryBudgetError to raise.
+    """
+    step, rss = state['exceeded']
+
+    return MemoryBudgetError(str(step) + " reached {:.0f}MB, over the budget of {:.0f}MB".format(rss,state['ceilingMB']))
+
+@contextmanager
+def track(state,name,rowsIn=None):
+    """Record the peak resident memory of a step of a budgeted stage, in place of profiling.stage.
+
+    The watchdog stops the step as soon as it sees the ceiling crossed. The ceiling is checked
+    again when the step ends, against the step's own peak.
+
+    Parameters:
+        state - the state yielded by budget.
+        name - the name of the step.
+        rowsIn - the rows going into the step.
+
+    Returns:
+        record - the profiling record of the step.
+    """
+    state['step'] = name
+    resetPeakRss()
+    start = perf_counter()
+    with profiling.stage(name,rowsIn) as record:
+        yield record
+    step = {'step':name,'peakRssMB':profiling.getPeakRssMB(),'rssMB':profiling.getRssMB(),'seconds':perf_counter() - start}
+    state['steps'].append(step)
+
+    ceilingMB = state['ceilingMB']
+    if (ceilingMB is not None) and (step['peakRssMB'] > ceilingMB):
+        raise MemoryBudgetError(name + " peaked at {:.0f}MB, over the budget of {:.0f}MB".format(step['peakRssMB'],ceilingMB))
+    if state['exceeded'] is not None:
+        raise getExceededError(state)
+
+def runBudgeted(func,ceilingMB=None,**kwargs):
+    """Run a stage with every step tracked within a peak memory budget.
+
+    Parameters:
+        func - the stage, taking the context manager its steps run in as stage.
+        ceilingMB - the peak resident memory allowed in MB (only tracked if None).
+        kwargs - the other arguments of the stage.
+
+    Returns:
+        state - the peak memory of every step and of the stage.
+    """
+    with budget(ceilingMB) as state:
+        func(stage=lambda name, rowsIn=None: track(state,name,rowsIn),**kwargs)
+
+    return state
+
+def adjustVenue(ceilingMB=None):
+    """Venue adjust the shot data, as venueAdjustedShotDataCreation.main, within a peak memory budget.
+
+    Parameters:
+        ceilingMB - the peak resident memory allowed in MB (only tracked if None).
+
+    Returns:
+        state - the peak memory of every step and of the stage.
+    """
+    return runBudgeted(venueAdjustedShotDataCreation.main,ceilingMB)
+
+def trainModel(ceilingMB=None,priorPath=None):
+    """Train the model and write xG, as xGModelCreation.main, within a peak memory budget.
+
+    Parameters:
+        ceilingMB - the peak resident memory allowed in MB (only tracked if None).
+        priorPath - the path of prior features used as model features (not used if None).
+
+    Returns:
+        state - the peak memory of every step and of the stage.
+    """
+    return runBudgeted(xGModelCreation.main,ceilingMB,priorPath=priorPath)
+
+def printSteps(state):
+    """Print the peak memory of every step of a budgeted stage.
+
+    Parameters:
+        state - the state returned by adjustVenue or trainModel.
+    """
+    for step in state['steps']:
+        print("{:<52}{:>8.0f}MB peak{:>8.1f}s".format(step['step'],step['peakRssMB'],step['seconds']))
+    ceiling = "" if state['ceilingMB'] is None else " (budget {:.0f}MB)".format(state['ceilingMB'])
+    print("Stage peak {:.0f}MB".format(state['peakRssMB']) + ceiling)
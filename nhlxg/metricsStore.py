@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from . import profiling
+
+#the xG data the metrics are calculated from and the store they are kept in
+XG_PATH = "xG Data/xGData2010-2021.csv"
+STORE_PATH = "xG Data/metrics.json"
+
+#the columns needed to calculate metrics
+METRIC_COLUMNS = ['Season','Strength','Outcome','xG']
+
+#the number of model version and data combinations kept in the store
+MAX_ENTRIES = 20
+
+#the strengths metrics are calculated for (see calculateLLAUC)
+STRENGTHS = {'Total':None,'EV':0,'PP':1,'SH':-1}
+
+def calculateLLAUC(df,strength):
+    """Calculate the log loss and auc given a dataframe and strength.
+
+    Parameters:
+        df - the dataframe containing the data.
+        strength - the strength to calculate (0 == even strength, 1 == power play, -1 == shot handed, None == all strengths)
+
+    Returns:
+        logLoss - the log loss achieved.
+        auc - the auc achieved.
+    """
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    #control for strengths
+    if strength == 0:
+        df = df[df['Strength'] == 0]
+    elif strength == 1:
+        df = df[df['Strength'] > 0]
+    elif strength == -1:
+        df = df[df['Strength'] < 0]
+
+    #get the predicted and actual outcomes
+    xG = df['xG']
+    goals = df['Outcome']
+
+    #calculate log loss and auc
+    logLoss = log_loss(goals,xG)
+    auc = roc_auc_score(goals,xG)
+
+    return logLoss, auc
+
+def computeMetrics(df):
+    """Calculate the log loss and auc of the train set, test set and every season at every strength.
+
+    Parameters:
+        df - the dataframe of shots with xG values.
+
+    Returns:
+        metrics - a dictionary with the train, test and per season [log loss, auc] of each strength.
+    """
+    #set train and test sets
+    dfTrain = df[df['Season'] <= 2020]
+    dfTest = df[df['Season'] == 2021]
+
+    metrics = {'train':{},'test':{},'seasons':{}}
+    for name, strength in STRENGTHS.items():
+        metrics['train'][name] = list(calculateLLAUC(dfTrain,strength))
+        metrics['test'][name] = list(calculateLLAUC(dfTest,strength))
+
+    #iterate over each season
+    for i in sorted(df['Season'].unique()):
+        #get shot estimates for the given season
+        seasonDf = df[df['Season'] == i]
+        metrics['seasons'][str(int(i))] = {name:list(calculateLLAUC(seasonDf,strength)) for name, strength in STRENGTHS.items()}
+
+    return metrics
+
+def getModelVersion():
+    """Get a version string of the model from its parameters and features.
+
+    Returns:
+        version - a short hash of the parameters and dropped columns in xGModelCreation.
+    """
+    from .xGModelCreation import PARAMS, DROP_COLUMNS
+
+    model = json.dumps({'params':PARAMS,'drop':DROP_COLUMNS},sort_keys=True)
+
+    return hashlib.sha256(model.encode()).hexdigest()[:12]
+
+def hashFile(path):
+    """Hash the contents of a file.
+
+    Parameters:
+        path - the path of the file.
+
+    Returns:
+        digest - the sha256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path,'rb') as f:
+        for block in iter(lambda: f.read(2**20),b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def loadStore(storePath=STORE_PATH):
+    """Read the metrics store.
+
+    Parameters:
+        storePath - the path of the store.
+
+    Returns:
+        store - the store with its files and entries, empty if it does not exist yet.
+    """
+    if not os.path.exists(storePath):
+        return {'files':{},'entries':{}}
+
+    with open(storePath) as f:
+        return json.load(f)
+
+def saveStore(store,storePath=STORE_PATH):
+    """Write the metrics store atomically.
+
+    Parameters:
+        store - the store to write.
+        storePath - the path of the store.
+    """
+    #keep only the newest entries
+    entries = sorted(store['entries'].items(),key=lambda item: item[1]['created'])
+    store['entries'] = dict(entries[-MAX_ENTRIES:])
+
+    directory = os.path.dirname(storePath)
+    if directory:
+        os.makedirs(directory,exist_ok=True)
+
+    tmpPath = storePath + "." + str(os.getpid()) + ".tmp"
+    with open(tmpPath,'w') as f:
+        json.dump(store,f,indent=2)
+    os.replace(tmpPath,storePath)
+
+def getDataHash(store,path=XG_PATH):
+    """Get the hash of the xG data, only rehashing the file if its size or modified time changed.
+
+    Parameters:
+        store - the metrics store, its file hashes are updated.
+        path - the path of the xG data.
+
+    Returns:
+        dataHash - the sha256 hex digest of the xG data.
+    """
+    stat = os.stat(path)
+    known = store['files'].get(path)
+    if (known is not None) and (known['size'] == stat.st_size) and (known['mtime'] == stat.st_mtime_ns):
+        return known['sha256']
+
+    dataHash = hashFile(path)
+    store['files'][path] = {'size':stat.st_size,'mtime':stat.st_mtime_ns,'sha256':dataHash}
+
+    return dataHash
+
+def storeMetrics(store,key,df,path,storePath):
+    """Calculate metrics and save them in the store.
+
+    Parameters:
+        store - the metrics store.
+        key - the model version and data hash the metrics belong to.
+        df - the dataframe of shots with xG values.
+        path - the path of the xG data.
+        storePath - the path of the store.
+
+    Returns:
+        metrics - the calculated metrics.
+    """
+    with profiling.stage("metricsStore.computeMetrics",df):
+        metrics = computeMetrics(df)
+
+    store['entries'][key] = {'created':datetime.now().isoformat(),'data':path,'metrics':metrics}
+    saveStore(store,storePath)
+
+    return metrics
+
+def updateMetrics(df,path=XG_PATH,storePath=STORE_PATH):
+    """Calculate metrics from xG data already in memory and store them.
+
+    Parameters:
+        df - the dataframe written to path.
+        path - the path the xG data was written to.
+        storePath - the path of the store.
+
+    Returns:
+        metrics - the calculated metrics.
+    """
+    store = loadStore(storePath)
+    key = getModelVersion() + ":" + getDataHash(store,path)
+
+    return storeMetrics(store,key,df,path,storePath)
+
+def getMetrics(path=XG_PATH,storePath=STORE_PATH,refresh=False):
+    """Get the metrics of the xG data, calculating them only if the model or data changed.
+
+    Parameters:
+        path - the path of the xG data.
+        storePath - the path of the store.
+        refresh - recalculate the metrics even if they are stored.
+
+    Returns:
+        metrics - a dictionary with the train, test and per season [log loss, auc] of each strength.
+    """
+    store = loadStore(storePath)
+    known = store['files'].get(path)
+    key = getModelVersion() + ":" + getDataHash(store,path)
+
+    if (not refresh) and (key in store['entries']):
+        #keep the new file hash so the data is not hashed again
+        if store['files'][path] != known:
+            saveStore(store,storePath)
+        return store['entries'][key]['metrics']
+
+    import pandas as pd
+
+    #only the columns used by the metrics are read
+    with profiling.stage("metricsStore.readXG") as record:
+        df = pd.read_csv(path,usecols=METRIC_COLUMNS)
+        record['rowsOut'] = len(df)
+
+    return storeMetrics(store,key,df,path,storePath)
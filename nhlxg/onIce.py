@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+from . import profiling
+
+#the player columns of the shot data, grouped by the role of the player in the shot
+FOR_COLUMNS = ['P1For','P2For','P3For','P4For','P5For','P6For']
+AGAINST_COLUMNS = ['P1Against','P2Against','P3Against','P4Against','P5Against','P6Against']
+ROLES = {'for':FOR_COLUMNS,'against':AGAINST_COLUMNS,'shooter':['shooter'],'goalie':['goalie']}
+
+#the columns read from the xG data to aggregate
+AGGREGATE_COLUMNS = FOR_COLUMNS + AGAINST_COLUMNS + ['shooter','goalie','Season','Strength','isPlayoffs','xG','Outcome']
+
+class OnIceMatrix:
+    """A sparse shots x players incidence matrix for each role a player can have in a shot."""
+
+    def __init__(self,players,matrix):
+        """Create the matrix.
+
+        Parameters:
+            players - the sorted player IDs, one per column of each role.
+            matrix - a CSR matrix of shots x (roles x players) with a one where a player had the role.
+        """
+        self.players = players
+        self.matrix = matrix
+
+    def save(self,path):
+        """Write the matrix to a compressed npz file.
+
+        Parameters:
+            path - the path of the file.
+        """
+        np.savez_compressed(path,players=self.players,data=self.matrix.data,indices=self.matrix.indices,
+                            indptr=self.matrix.indptr,shape=np.array(self.matrix.shape))
+
+    @classmethod
+    def load(cls,path):
+        """Read a matrix written by save.
+
+        Parameters:
+            path - the path of the file.
+
+        Returns:
+            onIce - the loaded matrix.
+        """
+        from scipy.sparse import csr_matrix
+
+        with np.load(path) as f:
+            matrix = csr_matrix((f['data'],f['indices'],f['indptr']),shape=tuple(f['shape']))
+            return cls(f['players'],matrix)
+
+def buildOnIceMatrix(df):
+    """Build the sparse incidence matrix from the wide player columns of the shot data.
+
+    The columns of the matrix are the players of each role in ROLES order, so role r of player j
+    is column r*len(players) + j. Players listed twice in a shot (P6 repeats P5) count once.
+
+    Parameters:
+        df - the dataframe of shots.
+
+    Returns:
+        onIce - the incidence matrix.
+    """
+    from scipy.sparse import csr_matrix
+
+    #every player appearing in any role
+    ids = np.concatenate([df[c].to_numpy(dtype=np.float64) for cols in ROLES.values() for c in cols])
+    players = np.unique(ids[~np.isnan(ids)]).astype(np.int64)
+    nPlayers = len(players)
+
+    rows = []
+    cols = []
+    for r, roleColumns in enumerate(ROLES.values()):
+        for c in roleColumns:
+            values = df[c].to_numpy(dtype=np.float64)
+            present = np.flatnonzero(~np.isnan(values))
+            rows.append(present)
+            cols.append(r*nPlayers + np.searchsorted(players,values[present].astype(np.int64)))
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    data = np.ones(len(rows),dtype=np.float32)
+    matrix = csr_matrix((data,(rows,cols)),shape=(len(df),len(ROLES)*nPlayers))
+
+    #duplicate entries are summed when the matrix is built, count each player once per shot
+    matrix.data[:] = 1
+
+    return OnIceMatrix(players,matrix)
+
+def getShotMask(df,season=None,strength=None,playoffs=None):
+    """Select shots by season, strength and game type.
+
+    Parameters:
+        df - the dataframe of shots.
+        season - a season or list of seasons (all seasons if None).
+        strength - 'EV', 'PP', 'SH' or None for all strengths (see benchmarkModel.calculateLLAUC).
+        playoffs - 0 for the regular season, 1 for the playoffs or None for both.
+
+    Returns:
+        mask - a boolean array of the selected shots.
+    """
+    mask = np.ones(len(df),dtype=bool)
+    if season is not None:
+        mask &= df['Season'].isin(np.atleast_1d(season)).to_numpy()
+    if strength == 'EV':
+        mask &= (df['Strength'] == 0).to_numpy()
+    elif strength == 'PP':
+        mask &= (df['Strength'] > 0).to_numpy()
+    elif strength == 'SH':
+        mask &= (df['Strength'] < 0).to_numpy()
+    if playoffs is not None:
+        mask &= (df['isPlayoffs'] == playoffs).to_numpy()
+
+    return mask
+
+def aggregatePlayers(onIce,df,mask=None):
+    """Calculate on-ice, individual and goalie totals for every player in one sparse product.
+
+    Parameters:
+        onIce - the incidence matrix built from df.
+        df - the dataframe of shots with xG and Outcome.
+        mask - a boolean array of the shots to include (all shots if None).
+
+    Returns:
+        players - a dataframe indexed by player ID with on-ice xGF/xGA, individual xG and goalie GSAx.
+    """
+    #shots, xG and goals of the selected shots, zero for the rest
+    weight = np.ones(len(df)) if mask is None else mask.astype(np.float64)
+    values = np.column_stack([weight,
+                              df['xG'].to_numpy(dtype=np.float64)*weight,
+                              df['Outcome'].to_numpy(dtype=np.float64)*weight])
+
+    with profiling.stage("onIce.aggregatePlayers",df):
+        totals = onIce.matrix.T @ values
+
+    #split the totals back into the roles
+    n = len(onIce.players)
+    forTotals, againstTotals, shooterTotals, goalieTotals = [totals[r*n:(r+1)*n] for r in range(len(ROLES))]
+
+    players = pd.DataFrame({'onIceFF':forTotals[:,0],'onIceXGF':forTotals[:,1],'onIceGF':forTotals[:,2],
+                            'onIceFA':againstTotals[:,0],'onIceXGA':againstTotals[:,1],'onIceGA':againstTotals[:,2],
+                            'iFenwick':shooterTotals[:,0],'ixG':shooterTotals[:,1],'iGoals':shooterTotals[:,2],
+                            'goalieFA':goalieTotals[:,0],'goalieXGA':goalieTotals[:,1],'goalieGA':goalieTotals[:,2]},
+                           index=pd.Index(onIce.players,name='player'))
+    players['GSAx'] = players['goalieXGA'] - players['goalieGA']
+
+    #only keep players who were on the ice for a selected shot
+    active = (players[['onIceFF','onIceFA','iFenwick','goalieFA']] > 0).any(axis=1)
+
+    return players[active]
+
+def main(path="xG Data/xGData2010-2021.csv",output="xG Data/playerTotals.csv",season=None,strength=None,playoffs=None):
+    """Write on-ice, individual and goalie totals of every player.
+
+    Parameters:
+        path - the path of the xG data.
+        output - the path the totals are written to.
+        season - a season or list of seasons (all seasons if None).
+        strength - 'EV', 'PP', 'SH' or None for all strengths.
+        playoffs - 0 for the regular season, 1 for the playoffs or None for both.
+    """
+    with profiling.stage("onIce.readXG") as record:
+        df = pd.read_csv(path,usecols=AGGREGATE_COLUMNS)
+        record['rowsOut'] = len(df)
+
+    with profiling.stage("onIce.buildOnIceMatrix",df):
+        onIce = buildOnIceMatrix(df)
+
+    players = aggregatePlayers(onIce,df,getShotMask(df,season,strength,playoffs))
+    players.to_csv(output)
+    print("Wrote totals of " + str(len(players)) + " players to " + output)
@@ -0,0 +1,259 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from . import rollupCube
+from .xGModelCreation import PARAMS, MODEL_PATH, prepareFrame
+from .metricsStore import METRIC_COLUMNS, updateMetrics
+
+#the venue adjusted shots trained on and the xG data written
+VENUE_PATH = "Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv"
+XG_PATH = "xG Data/xGData2010-2021.csv"
+
+#the numeric feature files and the binary dataset built from them
+FEATURE_DIR = "xG Data/features"
+
+#the last season trained on, later seasons are scored by the final model
+TRAIN_SEASON = 2020
+
+#the folds of the cross-validated xG of the training seasons (as in xGModelCreation.cvPredict)
+FOLDS = 10
+
+#the directory the package is imported from by the fresh interpreters
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#the code run in a fresh interpreter to measure the peak memory of a training mode
+MEMORY_CODE = """import json, time
+from nhlxg import profiling
+start = time.perf_counter()
+{call}
+print(json.dumps({{'seconds':time.perf_counter() - start,'peakRssMB':profiling.getPeakRssMB()}}))
+"""
+
+def getFeaturePaths(directory=FEATURE_DIR):
+    """Get the paths of the files built from the venue adjusted shots.
+
+    Parameters:
+        directory - the directory of the feature files.
+
+    Returns:
+        paths - a dictionary with the train csv and its binary dataset.
+    """
+    return {'train':os.path.join(directory,"train.csv"),
+            'binary':os.path.join(directory,"train.bin")}
+
+def readChunks(path,chunkSize,lastSeason=TRAIN_SEASON + 1):
+    """Read the venue adjusted shots in chunks prepared for the model.
+
+    Parameters:
+        path - the path of the venue adjusted shots.
+        chunkSize - the shots read at a time.
+        lastSeason - the last season read (every season if None).
+
+    Yields:
+        features - the model features and outcome of the chunk.
+        writingFrame - all columns of the shots kept.
+    """
+    for chunk in pd.read_csv(path,chunksize=chunkSize):
+        if lastSeason is not None:
+            chunk = chunk[chunk['Season'] <= lastSeason]
+        if len(chunk) == 0:
+            continue
+
+        features, writingFrame = prepareFrame(chunk)
+        if len(features) > 0:
+            yield features, writingFrame
+
+def writeFeatureFiles(path=VENUE_PATH,directory=FEATURE_DIR,chunkSize=100000):
+    """Write the numeric model features and outcome of the training shots to a csv file.
+
+    Parameters:
+        path - the path of the venue adjusted shots.
+        directory - the directory of the feature files.
+        chunkSize - the shots read at a time.
+
+    Returns:
+        rows - the rows written.
+    """
+    os.makedirs(directory,exist_ok=True)
+    trainPath = getFeaturePaths(directory)['train']
+    rows = 0
+
+    for features, writingFrame in readChunks(path,chunkSize):
+        part = features[(writingFrame['Season'] <= TRAIN_SEASON).to_numpy()].astype(float)
+        part.to_csv(trainPath,mode='w' if rows == 0 else 'a',header=rows == 0,index=False,na_rep='nan')
+        rows = rows + len(part)
+
+    return rows
+
+def loadDataset(paths,params=PARAMS):
+    """Build the binned lightgbm dataset of the training features from disk.
+
+    With two round loading lightgbm samples the file to find the bins and then reads it again to
+    bin every row, so the raw features are never held in memory.
+
+    Parameters:
+        paths - the feature file paths.
+        params - the lightgbm parameters (the dataset is binned with them).
+
+    Returns:
+        dataset - the constructed dataset, also saved as a binary file.
+    """
+    import lightgbm as lgb
+
+    datasetParams = dict(params,two_round=True,header=True,label_column='name:Outcome')
+    dataset = lgb.Dataset(paths['train'],params=datasetParams,free_raw_data=True)
+    dataset.construct()
+    dataset.save_binary(paths['binary'])
+
+    return dataset
+
+def trainModels(dataset,params=PARAMS):
+    """Train the cross-validation models and the final model on the binned dataset.
+
+    Parameters:
+        dataset - the constructed dataset.
+        params - the lightgbm parameters.
+
+    Returns:
+        folds - the fold of every training row.
+        cvBoosters - the booster trained without each fold.
+        booster - the booster trained on every row.
+    """
+    import lightgbm as lgb
+    from sklearn.model_selection import StratifiedKFold
+
+    #the same folds cross_val_predict uses, but kept so each row is scored by the right model
+    labels = dataset.get_label()
+    splits = list(StratifiedKFold(n_splits=FOLDS).split(np.zeros(len(labels)),labels))
+    folds = np.empty(len(labels),dtype=np.int8)
+    for k, (_, testIdx) in enumerate(splits):
+        folds[testIdx] = k
+
+    #train the folds one at a time and free each fold's data, lgb.cv would hold every fold at once
+    cvBoosters = []
+    for trainIdx, _ in splits:
+        cvBooster = lgb.train(params,dataset.subset(trainIdx),num_boost_round=100)
+        cvBoosters.append(cvBooster.free_dataset())
+
+    booster = lgb.train(params,dataset,num_boost_round=100).free_dataset()
+
+    return folds, cvBoosters, booster
+
+def writeXG(path,folds,cvBoosters,booster,outPath=XG_PATH,chunkSize=100000):
+    """Score the venue adjusted shots in chunks and write the xG data.
+
+    Training shots are scored by the model that did not see their fold and later shots by the
+    final model, written in the same order as xGModelCreation.main. The shots are written to
+    temporary files that replace the xG data once every chunk is scored, so readers never see a
+    partly written file.
+
+    Parameters:
+        path - the path of the venue adjusted shots.
+        folds - the fold of every training row.
+        cvBoosters - the booster trained without each fold.
+        booster - the booster trained on every row.
+        outPath - the path of the xG data.
+        chunkSize - the shots read at a time.
+
+    Returns:
+        rows - the shots written.
+    """
+    features = booster.feature_name()
+    tmpPath = outPath + "." + str(os.getpid()) + ".tmp"
+    testPath = outPath + "." + str(os.getpid()) + ".test.tmp"
+    written = {'train':0,'test':0}
+
+    position = 0
+    for frame, writingFrame in readChunks(path,chunkSize):
+        X = frame[features].to_numpy(dtype=np.float64)
+        isTrain = (writingFrame['Season'] <= TRAIN_SEASON).to_numpy()
+        xG = np.empty(len(frame))
+
+        trainFolds = folds[position:position + isTrain.sum()]
+        trainX = X[isTrain]
+        trainXG = np.empty(len(trainX))
+        for k in np.unique(trainFolds):
+            trainXG[trainFolds == k] = cvBoosters[k].predict(trainX[trainFolds == k])
+        xG[isTrain] = trainXG
+        xG[~isTrain] = booster.predict(X[~isTrain])
+        position = position + isTrain.sum()
+
+        writingFrame = writingFrame.assign(xG = xG)
+        for split, mask, target in [('train',isTrain,tmpPath),('test',~isTrain,testPath)]:
+            writingFrame[mask].to_csv(target,mode='w' if written[split] == 0 else 'a',header=written[split] == 0,index=False)
+            written[split] = written[split] + mask.sum()
+
+    #the testing season follows the training seasons
+    with open(tmpPath,'a') as out, open(testPath) as test:
+        next(test)
+        for line in test:
+            out.write(line)
+    os.remove(testPath)
+    os.replace(tmpPath,outPath)
+
+    return int(written['train'] + written['test'])
+
+def main(chunkSize=100000):
+    """Train the model and write xG for every shot without loading the shots into memory.
+
+    Parameters:
+        chunkSize - the shots read at a time.
+    """
+    paths = getFeaturePaths()
+
+    with profiling.stage("outOfCoreTraining.writeFeatureFiles") as record:
+        rows = writeFeatureFiles(chunkSize=chunkSize)
+        record['rowsOut'] = rows
+
+    with profiling.stage("outOfCoreTraining.loadDataset") as record:
+        dataset = loadDataset(paths)
+        record['rowsOut'] = dataset.num_data()
+
+    with profiling.stage("outOfCoreTraining.trainModels",dataset.num_data()):
+        folds, cvBoosters, booster = trainModels(dataset)
+        booster.save_model(MODEL_PATH)
+
+    with profiling.stage("outOfCoreTraining.writeXG") as record:
+        record['rowsOut'] = writeXG(VENUE_PATH,folds,cvBoosters,booster,chunkSize=chunkSize)
+
+    #the metrics and the rollup cube only need a few columns of the xG data
+    with profiling.stage("outOfCoreTraining.summaries"):
+        updateMetrics(pd.read_csv(XG_PATH,usecols=METRIC_COLUMNS))
+        rollupCube.main(XG_PATH,refresh=True)
+
+def measureMemory(call):
+    """Run a training mode in a fresh interpreter and measure its peak memory.
+
+    Parameters:
+        call - the python statement running the training.
+
+    Returns:
+        result - the seconds and peak resident memory in MB.
+    """
+    env = dict(os.environ,PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get('PYTHONPATH',''))
+    out = subprocess.run([sys.executable,'-c',MEMORY_CODE.format(call=call)],capture_output=True,text=True,env=env,check=True)
+
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def compareMemory(chunkSize=100000):
+    """Measure the peak memory of the in-memory and out-of-core training modes.
+
+    Parameters:
+        chunkSize - the shots read at a time out of core.
+
+    Returns:
+        report - the seconds and peak resident memory of each mode.
+    """
+    report = {}
+    report['inMemory'] = measureMemory("from nhlxg import xGModelCreation; xGModelCreation.main()")
+    report['outOfCore'] = measureMemory("from nhlxg import outOfCoreTraining; outOfCoreTraining.main(" + str(chunkSize) + ")")
+    for mode, result in report.items():
+        print("{:<10} peak RSS {:>8.0f}MB in {:.1f}s".format(mode,result['peakRssMB'],result['seconds']))
+
+    return report
@@ -0,0 +1,424 @@
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+from time import perf_counter
+
+from . import shotDataCreation
+from .metricsStore import getDataHash
+
+#where the fingerprints of built stages and the hashes of files are kept
+STATE_PATH = "pipelineState.json"
+
+#where the output of each stage run is written
+LOG_DIR = "Logs"
+
+#the directory of the package source, used to fingerprint the code of a stage
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#the files written by the stages
+INFO_PATH = "Raw Data/info/NHLInfo.csv"
+SHOT_PATH = "Raw Data/shotData/NHLShotData2010-2021.csv"
+VENUE_PATH = "Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv"
+XG_PATH = "xG Data/xGData2010-2021.csv"
+MODEL_PATH = "xG Data/xGModel.txt"
+CUBE_PATH = "xG Data/rollupCube.npz"
+METRICS_PATH = "xG Data/metrics.json"
+BENCHMARK_PATH = "xG Data/benchmark.txt"
+BACKTEST_XG_PATH = "xG Data/features/walkForward/xG.npy"
+BACKTEST_PATH = "xG Data/walkForward.json"
+PRIOR_PATH = "Raw Data/shotData/NHLShotData2010-2021Priors.csv"
+PLOT_PATH = "Plots/performance.png"
+
+def createStage(name,inputs,outputs,code,func,args=(),external=False,stores=()):
+    """Describe a stage of the pipeline.
+
+    Parameters:
+        name - the name of the stage.
+        inputs - the files the stage reads.
+        outputs - the files the stage writes.
+        code - the modules of the package running the stage, the outputs depend on the source of
+               these and of every module of the package they import.
+        func - the module and function name running the stage.
+        args - the arguments passed to the function.
+        external - the stage reads a source that cannot be fingerprinted (the NHL API), so it only
+                   runs when forced or when its outputs are missing.
+        stores - files the stage adds entries to that other stages also write (the metrics store),
+                 they must exist after the stage but are not checked for changes.
+
+    Returns:
+        stage - a dictionary describing the stage.
+    """
+    return {'name':name,'inputs':list(inputs),'outputs':list(outputs),'code':list(code),'func':func,'args':list(args),
+            'external':external,'stores':list(stores)}
+
+def buildStages(pbpFiles=shotDataCreation.PBP_FILES):
+    """Describe every stage of the pipeline, from player info to plots.
+
+    Parameters:
+        pbpFiles - the pbp files, one extraction stage is created per season.
+
+    Returns:
+        stages - a list of stages in an order where every stage follows the stages it reads from.
+    """
+    #player info is written by scraping and read by every extraction stage
+    stages = [createStage('scrape',[],[INFO_PATH],['scrapeInfo'],('scrapeInfo','main'),external=True)]
+
+    shotFiles = []
+    for pbpFile in pbpFiles:
+        season = shotDataCreation.getSeasonString(pbpFile)
+        shotFiles.append("NHLShotData" + season + ".csv")
+        stages.append(createStage('shots-' + season,[pbpFile,INFO_PATH],["Raw Data/shotData/" + shotFiles[-1]],
+                                  ['shotDataCreation'],('shotDataCreation','main'),[pbpFile]))
+
+    stages = stages + [
+        createStage('merge',["Raw Data/shotData/" + f for f in shotFiles],[SHOT_PATH],
+                    ['shotDataCreation'],('shotDataCreation','mergeSeasons'),[shotFiles]),
+        createStage('venue',[SHOT_PATH],[VENUE_PATH],
+                    ['venueAdjustedShotDataCreation'],('venueAdjustedShotDataCreation','main')),
+        createStage('train',[VENUE_PATH],[XG_PATH,MODEL_PATH,CUBE_PATH],
+                    ['xGModelCreation'],('xGModelCreation','main'),stores=[METRICS_PATH]),
+        createStage('benchmark',[XG_PATH],[BENCHMARK_PATH],
+                    ['benchmarkModel','metricsStore'],('pipelineRunner','writeBenchmark'),[BENCHMARK_PATH],stores=[METRICS_PATH]),
+        #the plot reads the metrics the benchmark stored
+        createStage('plot',[XG_PATH,BENCHMARK_PATH],[PLOT_PATH],
+                    ['benchmarkModel','metricsStore'],('benchmarkModel','plotModel'),stores=[METRICS_PATH]),
+        #the priors sum the xG of season models trained on earlier seasons only
+        createStage('backtest',[VENUE_PATH],[BACKTEST_XG_PATH,BACKTEST_PATH],
+                    ['walkForward'],('walkForward','main'),[[]]),
+        createStage('priors',[VENUE_PATH,BACKTEST_XG_PATH],[PRIOR_PATH],
+                    ['priorFeatures'],('priorFeatures','main')),
+    ]
+
+    return stages
+
+def writeBenchmark(path):
+    """Recompute the metrics of the xG data and write the benchmark report to a file.
+
+    Parameters:
+        path - the path of the report.
+    """
+    from .benchmarkModel import benchmarkPersonalModel
+
+    #the stage only runs when the xG data or the metrics code changed, so the stored metrics are refreshed
+    with open(path + ".tmp",'w') as f, redirect_stdout(f):
+        benchmarkPersonalModel(refresh=True)
+    os.replace(path + ".tmp",path)
+
+def getDependencies(stages):
+    """Find the stages each stage reads the outputs of.
+
+    Parameters:
+        stages - the list of stages.
+
+    Returns:
+        dependencies - a dictionary of stage name to the set of stage names it depends on.
+    """
+    producers = {output: stage['name'] for stage in stages for output in stage['outputs']}
+
+    return {stage['name']: {producers[i] for i in stage['inputs'] if i in producers} for stage in stages}
+
+def selectStages(stages,targets):
+    """Keep the target stages and every stage they depend on.
+
+    Parameters:
+        stages - the list of stages.
+        targets - the names of the stages wanted.
+
+    Returns:
+        stages - the selected stages in pipeline order.
+    """
+    dependencies = getDependencies(stages)
+    unknown = set(targets).difference(dependencies)
+    if unknown:
+        raise ValueError("Unknown stages: " + ", ".join(sorted(unknown)))
+
+    selected = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo = todo + list(dependencies[name])
+
+    return [stage for stage in stages if stage['name'] in selected]
+
+def loadState(path=STATE_PATH):
+    """Read the runner state.
+
+    Parameters:
+        path - the path of the state.
+
+    Returns:
+        state - the file hashes and built stages, empty if the pipeline has not been run.
+    """
+    if not os.path.exists(path):
+        return {'files':{},'stages':{}}
+
+    with open(path) as f:
+        return json.load(f)
+
+def saveState(state,path=STATE_PATH):
+    """Write the runner state atomically.
+
+    Parameters:
+        state - the state to write.
+        path - the path of the state.
+    """
+    tmpPath = path + "." + str(os.getpid()) + ".tmp"
+    with open(tmpPath,'w') as f:
+        json.dump(state,f,indent=2)
+    os.replace(tmpPath,path)
+
+def getImports(module):
+    """Find the modules of the package a module imports, including imports inside functions.
+
+    Parameters:
+        module - the module name.
+
+    Returns:
+        imports - the set of module names.
+    """
+    with open(os.path.join(PACKAGE_DIR,module + ".py")) as f:
+        tree = ast.parse(f.read())
+
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node,ast.ImportFrom) and (node.level == 1):
+            #from .module import name, or from . import module
+            imports.update([node.module.split('.')[0]] if node.module else [alias.name for alias in node.names])
+        elif isinstance(node,ast.ImportFrom) and (node.level == 0) and (node.module or '').startswith(__package__ + '.'):
+            imports.add(node.module.split('.')[1])
+        elif isinstance(node,ast.Import):
+            imports.update(alias.name.split('.')[1] for alias in node.names if alias.name.startswith(__package__ + '.'))
+
+    return {m for m in imports if os.path.exists(os.path.join(PACKAGE_DIR,m + ".py"))}
+
+def getCodeModules(modules):
+    """Find the modules of the package whose source a stage depends on.
+
+    Parameters:
+        modules - the modules running the stage.
+
+    Returns:
+        modules - the sorted names of the modules and every module of the package they import.
+    """
+    found = set()
+    todo = list(modules)
+    while todo:
+        module = todo.pop()
+        if module not in found:
+            found.add(module)
+            todo = todo + list(getImports(module))
+
+    return sorted(found)
+
+def hashCode(modules):
+    """Hash the source of modules of the package and of the modules they import.
+
+    Parameters:
+        modules - the module names.
+
+    Returns:
+        hashes - a dictionary of module name to the sha256 of its source.
+    """
+    hashes = {}
+    for module in getCodeModules(modules):
+        with open(os.path.join(PACKAGE_DIR,module + ".py"),'rb') as f:
+            hashes[module] = hashlib.sha256(f.read()).hexdigest()
+
+    return hashes
+
+def getFingerprint(stage,state):
+    """Fingerprint the code, inputs and arguments of a stage.
+
+    Parameters:
+        stage - the stage.
+        state - the runner state, its file hashes are updated.
+
+    Returns:
+        fingerprint - the sha256 hex digest, None if an input is missing.
+    """
+    if not all(os.path.exists(i) for i in stage['inputs']):
+        return None
+
+    content = {'code':hashCode(stage['code']),
+               'inputs':{i: getDataHash(state,i) for i in stage['inputs']},
+               'func':stage['func'],
+               'args':stage['args']}
+
+    return hashlib.sha256(json.dumps(content,sort_keys=True).encode()).hexdigest()
+
+def isCurrent(stage,fingerprint,state):
+    """Check if the outputs of a stage were built from its current fingerprint and are unchanged.
+
+    Parameters:
+        stage - the stage.
+        fingerprint - the current fingerprint of the stage.
+        state - the runner state.
+
+    Returns:
+        current - True if the stage can be skipped.
+    """
+    if not all(os.path.exists(o) for o in stage['outputs'] + stage['stores']):
+        return False
+
+    if stage['external']:
+        return True
+
+    built = state['stages'].get(stage['name'])
+    if (built is None) or (built['fingerprint'] != fingerprint):
+        return False
+
+    #outputs edited or rebuilt by hand since the stage ran make it stale
+    return all(getDataHash(state,o) == h for o, h in built['outputs'].items())
+
+def executeStage(name,func,args):
+    """Run a stage in a worker process with its output written to a log.
+
+    Parameters:
+        name - the name of the stage.
+        func - the module and function name running the stage.
+        args - the arguments passed to the function.
+
+    Returns:
+        seconds - the time the stage took.
+    """
+    #plots are saved, never shown
+    os.environ.setdefault('MPLBACKEND','Agg')
+    os.makedirs(LOG_DIR,exist_ok=True)
+
+    module = importlib.import_module("." + func[0],__package__)
+    with open(os.path.join(LOG_DIR,name + ".log"),'w') as log, redirect_stdout(log), redirect_stderr(log):
+        start = perf_counter()
+        getattr(module,func[1])(*args)
+
+    return perf_counter() - start
+
+def runStages(stages,workers=4,force=(),dryRun=False,statePath=STATE_PATH):
+    """Run the stages that are not current, running independent stages at the same time.
+
+    Parameters:
+        stages - the stages to consider, in pipeline order.
+        workers - the most stages run at once.
+        force - the names of stages run even if they are current.
+        dryRun - only print what would run.
+        statePath - the path of the runner state.
+
+    Returns:
+        results - a dictionary of stage name to 'skipped', 'ran', 'failed' or 'blocked'.
+    """
+    state = loadState(statePath)
+    dependencies = getDependencies(stages)
+    names = [stage['name'] for stage in stages]
+    dependencies = {name: dependencies[name].intersection(names) for name in names}
+    byName = {stage['name']: stage for stage in stages}
+
+    results = {}
+    running = {}
+    pending = list(names)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            #start or skip every stage whose dependencies are finished
+            for name in list(pending):
+                if not dependencies[name].issubset(results):
+                    continue
+                pending.remove(name)
+                stage = byName[name]
+
+                if any(results[d] in ['failed','blocked'] for d in dependencies[name]):
+                    results[name] = 'blocked'
+                    print(name + ": blocked by a failed stage")
+                    continue
+
+                if dryRun and any(results[d] == 'ran' for d in dependencies[name]):
+                    results[name] = 'ran'
+                    print(name + ": would run (an input will be rebuilt)")
+                    continue
+
+                fingerprint = getFingerprint(stage,state)
+                if fingerprint is None:
+                    results[name] = 'failed'
+                    print(name + ": missing inputs " + ", ".join(i for i in stage['inputs'] if not os.path.exists(i)))
+                    continue
+
+                if (name not in force) and isCurrent(stage,fingerprint,state):
+                    results[name] = 'skipped'
+                    print(name + ": current")
+                    continue
+
+                if dryRun:
+                    results[name] = 'ran'
+                    print(name + ": would run")
+                    continue
+
+                print(name + ": running")
+                running[executor.submit(executeStage,name,stage['func'],stage['args'])] = (name,fingerprint)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running,return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    results[name] = 'failed'
+                    print(name + ": failed (" + repr(e) + "), see " + os.path.join(LOG_DIR,name + ".log"))
+                    continue
+
+                results[name] = 'ran'
+                state['stages'][name] = {'fingerprint':fingerprint,
+                                         'outputs':{o: getDataHash(state,o) for o in byName[name]['outputs']},
+                                         'seconds':seconds,
+                                         'finished':datetime.now().isoformat(timespec='seconds')}
+
+                #save after every stage so an interrupted run keeps its finished stages
+                saveState(state,statePath)
+                print(name + ": done in {:.1f}s".format(seconds))
+
+    if not dryRun:
+        saveState(state,statePath)
+
+    return results
+
+def main(argv=None):
+    """Run the pipeline from the command line."""
+    parser = argparse.ArgumentParser(description="Run the pipeline stages whose inputs or code changed.")
+    parser.add_argument('targets',nargs='*',help="stages to bring up to date with their dependencies (all but scrape by default)")
+    parser.add_argument('--pbp',nargs='+',default=shotDataCreation.PBP_FILES,help="pbp files (all seasons by default)")
+    parser.add_argument('--workers',type=int,default=4,help="most stages run at once")
+    parser.add_argument('--force',nargs='+',default=[],metavar='STAGE',help="stages to run even if current")
+    parser.add_argument('--scrape',action='store_true',help="retrieve player info from the NHL API first")
+    parser.add_argument('--dry-run',action='store_true',help="print the stages that would run")
+    args = parser.parse_args(argv)
+
+    stages = buildStages(args.pbp)
+    names = [stage['name'] for stage in stages]
+    targets = args.targets or [name for name in names if name != 'scrape']
+    unknown = sorted(set(targets + args.force).difference(names))
+    if unknown:
+        parser.error("unknown stages: " + ", ".join(unknown) + " (stages are " + ", ".join(names) + ")")
+    force = list(args.force)
+    if args.scrape:
+        force.append('scrape')
+        targets.append('scrape')
+
+    start = perf_counter()
+    results = runStages(selectStages(stages,targets),args.workers,force,args.dry_run)
+    counts = {r: list(results.values()).count(r) for r in ['ran','skipped','failed','blocked']}
+    labels = {'ran':"to run" if args.dry_run else "ran",'skipped':"current",'failed':"failed",'blocked':"blocked"}
+    print(", ".join(str(n) + " " + labels[r] for r, n in counts.items()) + " in {:.1f}s".format(perf_counter() - start))
+
+    return 1 if (counts['failed'] or counts['blocked']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
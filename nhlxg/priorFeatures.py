@@ -0,0 +1,187 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from . import walkForward
+
+#the venue adjusted shots the priors are computed for and the file they are written to, a row per shot
+VENUE_PATH = "Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv"
+PRIOR_PATH = "Raw Data/shotData/NHLShotData2010-2021Priors.csv"
+
+#the players the priors are computed for and the name prefix of their columns
+ROLES = {'shooter':'shooterPrior','goalie':'goaliePrior'}
+
+#the per-game totals summed over earlier games. xG is only known for shots a walk-forward season
+#model scored, ScoredGoals are the goals of those shots and only used for GSAx
+TOTALS = ['Shots','Goals','XG','ScoredGoals']
+
+#decay weights are rebased once they reach e**EXPONENT_LIMIT, well below the float64 limit of e**709
+EXPONENT_LIMIT = 500
+
+def getGameTotals(df,role):
+    """Total the shots, goals and xG of every player in every game, in the order they were played.
+
+    Parameters:
+        df - the dataframe of shots with a Date, Outcome, xG and scoredGoal.
+        role - the column of the player (shooter or goalie).
+
+    Returns:
+        games - a dataframe with one row per player and game, sorted by player then date.
+    """
+    games = df.groupby([role,'GameID'],sort=False).agg(Date=('Date','first'),Shots=('Outcome','size'),Goals=('Outcome','sum'),
+                                                       XG=('xG','sum'),ScoredGoals=('scoredGoal','sum'))
+    games = games.reset_index()
+    games['Days'] = (pd.to_datetime(games['Date']) - pd.Timestamp('2000-01-01')).dt.days
+
+    return games.sort_values([role,'Days','GameID'],kind='stable').reset_index(drop=True)
+
+def getPriorSums(keys,values):
+    """Sum the values of each player's earlier games.
+
+    Parameters:
+        keys - the arrays grouping the games (the player, and the epoch when decaying), sorted
+               by player then date.
+        values - the totals of every game.
+
+    Returns:
+        priors - the sums over the earlier games of the same group.
+    """
+    frame = pd.DataFrame(values)
+    sums = frame.groupby(keys,sort=False).cumsum().to_numpy()
+
+    #subtracting the game itself keeps only the games before it
+    return sums - values
+
+def getDecayedPriorSums(players,days,values,halfLife):
+    """Sum the values of each player's earlier games, each weighted by how long ago it was played.
+
+    A game d days before contributes 2**(-d/halfLife) of its value. The sum is written as
+    exp(-rate*t) times a running sum of value*exp(rate*t_j), which overflows over a long career,
+    so time is counted from the start of fixed epochs of EXPONENT_LIMIT/rate days. Within an epoch
+    the weights stay below e**EXPONENT_LIMIT. A game carries into a later epoch decayed to its
+    start, and a game more than one epoch back weighs less than e**-EXPONENT_LIMIT and is dropped.
+
+    Parameters:
+        players - the player of every game, sorted by player then date.
+        days - the day every game was played.
+        values - the totals of every game.
+        halfLife - the days after which a game counts half.
+
+    Returns:
+        priors - the decayed sums over the player's strictly earlier games.
+    """
+    rate = np.log(2)/halfLife
+    epochDays = EXPONENT_LIMIT/rate
+    days = np.asarray(days,dtype=np.float64)
+    epoch = np.floor(days/epochDays).astype(np.int64)
+    within = days - epoch*epochDays
+
+    weighted = values*np.exp(rate*within)[:,None]
+    players = players.to_numpy()
+    inEpoch = getPriorSums([players,epoch],weighted)
+
+    #the total of each player's epoch, carried to the start of the player's next epoch
+    groups = pd.DataFrame({'player':players,'epoch':epoch})
+    epochs = pd.concat([groups,pd.DataFrame(weighted)],axis=1).groupby(['player','epoch'],sort=False).sum().reset_index()
+    previous = epochs.groupby('player',sort=False).shift(1)
+    gap = (epochs['epoch'] - previous['epoch']).to_numpy()
+    carried = previous.drop(columns='epoch').to_numpy()*np.exp(-EXPONENT_LIMIT*gap)[:,None]
+    carried = np.nan_to_num(carried)
+    carry = pd.DataFrame(carried,index=pd.MultiIndex.from_frame(epochs[['player','epoch']]))
+    carry = carry.reindex(pd.MultiIndex.from_arrays([players,epoch])).to_numpy()
+
+    return (inEpoch + carry)*np.exp(-rate*within)[:,None]
+
+def createPriorFeatures(df,halfLife=None):
+    """Calculate the shooter's and goalie's totals from games before the game of every shot.
+
+    Every player's games are put in date order once and summed with grouped cumulative sums, so
+    no player is looped over. Only strictly earlier games contribute, shots earlier in the same
+    game do not. The xG of a shot comes from a model trained on earlier seasons (see addXG), so
+    no prior is computed from a model that saw the game it is added to, or a later one.
+
+    Parameters:
+        df - the dataframe of shots with GameID, Date, shooter, goalie, Outcome, xG and scoredGoal.
+        halfLife - the days after which a game counts half (every game counts fully if None).
+
+    Returns:
+        priorFrame - a dataframe of the prior features of every shot, on the index of df.
+    """
+    priorFrame = pd.DataFrame(index=df.index)
+    for role, prefix in ROLES.items():
+        games = getGameTotals(df,role)
+        values = games[TOTALS].to_numpy(dtype=np.float64)
+        if halfLife is None:
+            priors = getPriorSums([games[role].to_numpy()],values)
+        else:
+            priors = getDecayedPriorSums(games[role],games['Days'],values,halfLife)
+
+        priors = pd.DataFrame(priors,columns=[prefix + total for total in TOTALS])
+        priors[role] = games[role].to_numpy()
+        priors['GameID'] = games['GameID'].to_numpy()
+        merged = df[[role,'GameID']].merge(priors,on=[role,'GameID'],how='left')
+
+        #a player's first game has no priors, shots without a player have none either
+        for column in priors.columns.drop([role,'GameID']):
+            values = merged[column].to_numpy()
+            priorFrame[column] = np.where(df[role].notnull().to_numpy(),np.nan_to_num(values),np.nan)
+
+    #goals the goalie saved above expected on earlier shots that were scored
+    priorFrame['goaliePriorGSAx'] = priorFrame['goaliePriorXG'] - priorFrame['goaliePriorScoredGoals']
+
+    return priorFrame.drop(columns=[prefix + 'ScoredGoals' for prefix in ROLES.values()])
+
+def addXG(df,path=VENUE_PATH):
+    """Add the xG of the walk-forward backtest to the venue adjusted shots.
+
+    Each season's shots are scored by a model trained only on the seasons before it, so the xG
+    of a game never comes from a model that saw that game or a later one. Training-season xG of
+    the model itself is out-of-fold, from models fit partly on later games, and is not used.
+
+    Parameters:
+        df - the dataframe of venue adjusted shots.
+        path - the path of the venue adjusted shots, the backtest must have been run on it.
+
+    Returns:
+        df - the shots with xG, NaN for shots no season model scored, and scoredGoal, the
+             outcome of the scored shots and zero for the others.
+    """
+    xG = walkForward.loadXG(len(df),path)
+    df = df.assign(xG=xG)
+    df['scoredGoal'] = np.where(np.isnan(xG),0,df['Outcome'])
+
+    return df
+
+def main(path=VENUE_PATH,outPath=PRIOR_PATH,halfLife=None):
+    """Compute shooter and goalie prior features of the venue adjusted shots.
+
+    The priors are written to their own file, a row per venue adjusted shot, and are used as
+    model features by `train --priors`. xG comes from the walk-forward backtest, which must have
+    been run on the current venue adjusted shots.
+
+    Parameters:
+        path - the path of the venue adjusted shots.
+        outPath - the path the prior features are written to.
+        halfLife - the days after which a game counts half (every game counts fully if None).
+    """
+    with profiling.stage("priorFeatures.readShots") as record:
+        df = pd.read_csv(path)
+        record['rowsOut'] = len(df)
+
+    with profiling.stage("priorFeatures.createPriorFeatures",df) as record:
+        priorFrame = createPriorFeatures(addXG(df,path),halfLife)
+        record['rowsOut'] = len(priorFrame)
+
+    #the game ID of every row lets readers check the priors line up with the shots
+    with profiling.stage("priorFeatures.writePriors",priorFrame):
+        priorFrame.insert(0,'GameID',df['GameID'].to_numpy())
+        priorFrame.to_csv(outPath + ".tmp",index=False)
+        os.replace(outPath + ".tmp",outPath)
+
+    print("Wrote " + str(priorFrame.shape[1] - 1) + " prior features of " + str(len(df)) + " shots to " + outPath)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter, process_time, sleep
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#profiling is opt-in, it is turned on by setting XG_PROFILE to the directory reports are written to.
+#XG_PROFILE_RUN names the run so several scripts add to the same report, XG_PROFILE_SAMPLE names
+#the stage to take a sampling profile of and XG_PROFILE_INTERVAL sets the seconds between samples.
+RUN_ID = os.environ.get('XG_PROFILE_RUN',datetime.now().strftime('%Y%m%d-%H%M%S'))
+
+#relative report directories are resolved against the directory the run started in
+START_DIR = os.getcwd()
+
+#the stages currently running, used to carry peak memory from nested stages to their parents
+_stack = []
+
+def isEnabled():
+    """Check if profiling has been turned on.
+
+    Returns:
+        enabled - is XG_PROFILE set.
+    """
+    return bool(os.environ.get('XG_PROFILE'))
+
+def countRows(obj):
+    """Count the rows of a dataframe or other sized object.
+
+    Parameters:
+        obj - the object to count.
+
+    Returns:
+        rows - the number of rows or None if obj has no length.
+    """
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+def readProcStatus(field):
+    """Read a memory field of /proc/self/status.
+
+    Parameters:
+        field - the name of the field, e.g. VmRSS.
+
+    Returns:
+        mb - the value in MB, None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])/2**10
+    except OSError:
+        pass
+
+    return None
+
+def getMaxRssMB():
+    """Get the peak resident memory of this process from getrusage.
+
+    Returns:
+        rss - the peak resident set size in MB.
+    """
+    import resource
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return maxrss/2**20 if sys.platform == 'darwin' else maxrss/2**10
+
+def getRssMB():
+    """Get the resident memory of this process.
+
+    Returns:
+        rss - the resident set size in MB (the peak where the current value is not available).
+    """
+    rss = readProcStatus('VmRSS')
+
+    return rss if rss is not None else getMaxRssMB()
+
+def getPeakRssMB():
+    """Get the peak resident memory of this process.
+
+    Returns:
+        rss - the peak resident set size in MB.
+    """
+    rss = readProcStatus('VmHWM')
+
+    return rss if rss is not None else getMaxRssMB()
+
+def getPrivateMB():
+    """Get the memory this process allocated for itself, not shared with any other process.
+
+    Only anonymous mappings (the heap and allocations, where a copy of a shared matrix would go)
+    are counted. Pages of memory-mapped files and shared memory are left out even when no other
+    process maps them yet, so this is the memory a worker process adds on its own.
+
+    Returns:
+        private - the private clean and dirty anonymous memory in MB, None where /proc is not available.
+    """
+    try:
+        private = 0
+        anonymous = False
+        with open('/proc/self/smaps') as f:
+            for line in f:
+                fields = line.split()
+                #a mapping starts with its address range, anonymous mappings have no path or a [name]
+                if '-' in fields[0] and ':' not in fields[0]:
+                    anonymous = (len(fields) < 6) or fields[5].startswith('[')
+                elif anonymous and (fields[0] in ['Private_Clean:','Private_Dirty:']):
+                    private = private + int(fields[1])
+        return private/2**10
+    except OSError:
+        return None
+
+class StackSampler:
+    """Sample the call stack of a thread at a fixed interval."""
+
+    def __init__(self,threadId,interval):
+        """Create the sampler.
+
+        Parameters:
+            threadId - the ident of the thread to sample.
+            interval - the seconds between samples.
+        """
+        self.threadId = threadId
+        self.interval = interval
+        self.counts = Counter()
+        self.running = False
+        self.thread = threading.Thread(target=self.run,daemon=True)
+
+    def start(self):
+        """Start sampling in a background thread."""
+        self.running = True
+        self.thread.start()
+
+    def run(self):
+        """Record the stack of the sampled thread until stopped."""
+        while self.running:
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(os.path.basename(code.co_filename) + ":" + code.co_name)
+                frame = frame.f_back
+
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+            sleep(self.interval)
+
+    def stop(self):
+        """Stop sampling.
+
+        Returns:
+            counts - the number of samples taken of each collapsed stack.
+        """
+        self.running = False
+        self.thread.join()
+
+        return self.counts
+
+def topFunctions(counts,n=20):
+    """Find the functions most often at the top of the sampled stacks.
+
+    Parameters:
+        counts - the number of samples of each collapsed stack.
+        n - the number of functions to return.
+
+    Returns:
+        top - a list of [function, share of samples] pairs.
+    """
+    total = sum(counts.values())
+    leaves = Counter()
+    for stack, count in counts.items():
+        leaves[stack.split(";")[-1]] += count
+
+    return [[func, count/total] for func, count in leaves.most_common(n)]
+
+@contextmanager
+def stage(name,rowsIn=None):
+    """Profile a named pipeline stage.
+
+    The stage records wall time, CPU time, peak traced memory and rows in and out. The
+    rows out are set by the caller through the yielded record, e.g. record['rowsOut'] = len(df).
+    When profiling is off the stage does nothing.
+
+    Parameters:
+        name - the name of the stage, qualified by its script (e.g. shotDataCreation.extractShots).
+        rowsIn - the rows going into the stage.
+
+    Returns:
+        record - the dictionary the stage results are stored in.
+    """
+    if not isEnabled():
+        yield {}
+        return
+
+    record = {'stage':name,'pid':os.getpid(),'rowsIn':countRows(rowsIn) if rowsIn is not None else None,'rowsOut':None}
+
+    #keep tracemalloc running for the outermost stage only
+    startedTracing = not tracemalloc.is_tracing()
+    if startedTracing:
+        tracemalloc.start()
+    elif _stack:
+        _stack[-1]['peak'] = max(_stack[-1]['peak'],tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    startMemory = tracemalloc.get_traced_memory()[0]
+    frame = {'peak':startMemory}
+    _stack.append(frame)
+
+    #take a sampling profile of the chosen stage
+    sampler = None
+    if name == os.environ.get('XG_PROFILE_SAMPLE'):
+        sampler = StackSampler(threading.get_ident(),float(os.environ.get('XG_PROFILE_INTERVAL','0.005')))
+        sampler.start()
+
+    startWall = perf_counter()
+    startCpu = process_time()
+    try:
+        yield record
+    finally:
+        record['wallSeconds'] = perf_counter() - startWall
+        record['cpuSeconds'] = process_time() - startCpu
+
+        #peak is the highest of this stage and any nested stages
+        _stack.pop()
+        peak = max(frame['peak'],tracemalloc.get_traced_memory()[1])
+        record['peakMemoryMB'] = (peak - startMemory)/2**20
+        if _stack:
+            _stack[-1]['peak'] = max(_stack[-1]['peak'],peak)
+        if startedTracing:
+            tracemalloc.stop()
+
+        if sampler is not None:
+            counts = sampler.stop()
+            record['samples'] = sum(counts.values())
+            record['topFunctions'] = topFunctions(counts) if counts else []
+            record['stacksFile'] = writeStacks(name,counts)
+
+        record['finished'] = datetime.now().isoformat(timespec='seconds')
+        addToReport(record)
+
+def getReportDir():
+    """Get the directory reports are written to.
+
+    Returns:
+        directory - the absolute path of XG_PROFILE.
+    """
+    return os.path.join(START_DIR,os.environ['XG_PROFILE'])
+
+def getReportPath():
+    """Get the path of the report of the current run.
+
+    Returns:
+        path - the path of the json report.
+    """
+    return os.path.join(getReportDir(),"profile-" + RUN_ID + ".json")
+
+def writeStacks(name,counts):
+    """Write sampled stacks in the collapsed format read by flame graph tools.
+
+    Parameters:
+        name - the name of the sampled stage.
+        counts - the number of samples of each collapsed stack.
+
+    Returns:
+        path - the path of the written file.
+    """
+    path = os.path.join(getReportDir(),"profile-" + RUN_ID + "-" + name + ".folded")
+    os.makedirs(os.path.dirname(path),exist_ok=True)
+    with open(path,'w') as f:
+        for stack, count in counts.most_common():
+            f.write(stack + " " + str(count) + "\n")
+
+    return path
+
+def addToReport(record):
+    """Add a stage record to the consolidated report of the run.
+
+    Several scripts (or processes) of the same run add to one report, so the report is
+    read and rewritten under a file lock and replaced atomically.
+
+    Parameters:
+        record - the stage record to add.
+    """
+    path = getReportPath()
+    os.makedirs(os.path.dirname(path),exist_ok=True)
+
+    with open(path + ".lock",'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock,fcntl.LOCK_EX)
+
+        if os.path.exists(path):
+            with open(path) as f:
+                report = json.load(f)
+        else:
+            report = {'run':RUN_ID,'created':datetime.now().isoformat(timespec='seconds'),'stages':[]}
+
+        report['stages'].append(record)
+
+        tmpPath = path + "." + str(os.getpid()) + ".tmp"
+        with open(tmpPath,'w') as f:
+            json.dump(report,f,indent=2)
+        os.replace(tmpPath,path)
+
+def summarize(path):
+    """Print a table of the stages in a report.
+
+    Parameters:
+        path - the path of the json report.
+    """
+    with open(path) as f:
+        report = json.load(f)
+
+    print("Run " + report['run'])
+    print("{:<50} {:>9} {:>9} {:>10} {:>10} {:>10}".format('Stage','Wall (s)','CPU (s)','Peak (MB)','Rows in','Rows out'))
+    for record in report['stages']:
+        print("{:<50} {:>9.2f} {:>9.2f} {:>10.1f} {:>10} {:>10}".format(record['stage'],record['wallSeconds'],
+              record['cpuSeconds'],record['peakMemoryMB'],str(record['rowsIn']),str(record['rowsOut'])))
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1])
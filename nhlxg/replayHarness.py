@@ -0,0 +1,276 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from datetime import datetime
+from time import monotonic, perf_counter, sleep
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from . import shotDataCreation
+from . import venueAdjustedShotDataCreation
+from . import xGModelCreation
+from .reports import writeJson
+from .priorFeatures import ROLES
+
+#the shots the venue adjustments are fitted on and the player info used by extraction
+SHOT_PATH = "Raw Data/shotData/NHLShotData2010-2021.csv"
+INFO_PATH = "Raw Data/info/NHLInfo.csv"
+
+#the stages timed for every game, in pipeline order
+STAGES = ['extraction','venueAdjustment','scoring']
+
+#the latency percentiles reported
+PERCENTILES = [50,90,95,99,100]
+
+#the player info, venue adjustments and booster of a worker process, set when the worker starts
+_scorer = {}
+
+def loadGames(path):
+    """Split a season of pbp data into games in the order they were played.
+
+    Parameters:
+        path - the path of the pbp file.
+
+    Returns:
+        games - a list of (game ID, pbp dataframe of the game).
+    """
+    trainingFrame = shotDataCreation.createTrainingFrame(path)
+
+    return [(gameId, game.reset_index(drop=True)) for gameId, game in trainingFrame.groupby('Game_Id',sort=False)]
+
+def loadScorer(shotPath=SHOT_PATH,modelPath=xGModelCreation.MODEL_PATH):
+    """Fit the venue adjustments and load the model once for every game.
+
+    Parameters:
+        shotPath - the path of the shot data the venue adjustments are fitted on.
+        modelPath - the path of the booster saved by xGModelCreation.
+
+    Returns:
+        venue - the fitted venue adjustments.
+        booster - the lightgbm booster.
+    """
+    import lightgbm as lgb
+
+    venue = venueAdjustedShotDataCreation.fitVenue(pd.read_csv(shotPath))
+    booster = lgb.Booster(model_file=modelPath)
+
+    #replayed games are scored from their own shots, prior features of earlier games are not rebuilt
+    priors = [name for name in booster.feature_name() if name.startswith(tuple(ROLES.values()))]
+    if priors:
+        raise ValueError(modelPath + " was trained with prior features (" + ", ".join(priors) + "), replay a model trained without `--priors`")
+
+    return venue, booster
+
+def scoreGame(game,playerFrame,venue,booster):
+    """Take the pbp data of a finished game to scored shots.
+
+    Parameters:
+        game - the pbp dataframe of the game.
+        playerFrame - the dataframe of player info.
+        venue - the fitted venue adjustments.
+        booster - the lightgbm booster.
+
+    Returns:
+        shots - the dataframe of scored shots.
+        timings - the seconds spent in each stage.
+    """
+    timings = {}
+
+    start = perf_counter()
+    shots = shotDataCreation.extractShots(game.copy(),playerFrame)
+    timings['extraction'] = perf_counter() - start
+
+    start = perf_counter()
+    if len(shots) > 0:
+        shots = venueAdjustedShotDataCreation.applyVenue(shots,venue)
+    timings['venueAdjustment'] = perf_counter() - start
+
+    start = perf_counter()
+    if len(shots) > 0:
+        features, shots = xGModelCreation.prepareFrame(shots)
+        shots = shots.assign(xG = booster.predict(features[booster.feature_name()].astype(float)))
+    timings['scoring'] = perf_counter() - start
+
+    return shots, timings
+
+def getPercentiles(values):
+    """Summarize a list of seconds by its percentiles.
+
+    Parameters:
+        values - the seconds.
+
+    Returns:
+        percentiles - a dictionary of percentile name to seconds.
+    """
+    return {'p' + str(p): float(np.percentile(values,p)) for p in PERCENTILES}
+
+def startWorker(playerFrame,venue,modelString):
+    """Load the scorer of a worker process once for every game it replays.
+
+    Parameters:
+        playerFrame - the dataframe of player info.
+        venue - the fitted venue adjustments.
+        modelString - the booster saved as a string.
+    """
+    import lightgbm as lgb
+
+    #extraction prints every game
+    sys.stdout = open(os.devnull,'w')
+    _scorer.update(playerFrame=playerFrame,venue=venue,booster=lgb.Booster(model_str=modelString))
+
+def getWorkerMemory(_=None):
+    """Get the process ID and resident memory of a worker process."""
+    return os.getpid(), profiling.getRssMB()
+
+def replayGame(i,gameId,game,start,rate):
+    """Replay one game in a worker process, waiting until it arrives when games arrive at a rate.
+
+    Parameters:
+        i - the position of the game in the replay.
+        gameId - the game ID.
+        game - the pbp dataframe of the game.
+        start - the monotonic time the replay started.
+        rate - the games arriving per second (None to replay as fast as possible).
+
+    Returns:
+        result - the stage timings, service time, latency and worker memory of the game.
+    """
+    arrival = None
+    if rate is not None:
+        arrival = start + i/rate
+        sleep(max(0,arrival - monotonic()))
+
+    begin = monotonic()
+    shots, timings = scoreGame(game,_scorer['playerFrame'],_scorer['venue'],_scorer['booster'])
+    end = monotonic()
+
+    arrival = begin if arrival is None else arrival
+    pid, rssMB = getWorkerMemory()
+
+    return dict(timings,gameId=int(gameId),shots=len(shots),serviceSeconds=end - begin,latencySeconds=end - arrival,pid=pid,rssMB=rssMB)
+
+def runReplay(games,playerFrame,venue,booster,rate=None,concurrency=1,warmup=5):
+    """Replay games through extraction, venue adjustment and scoring.
+
+    The games are processed by worker processes, so games processed at once run in parallel
+    instead of taking turns holding the GIL. With a rate, game i arrives i/rate seconds after the
+    start and its latency includes any time spent waiting for a free worker. Without one every
+    game is processed as soon as a worker is free and the latency is the processing time. Memory
+    is the resident memory of the workers added up.
+
+    Parameters:
+        games - the list of (game ID, pbp dataframe) to replay.
+        playerFrame - the dataframe of player info.
+        venue - the fitted venue adjustments.
+        booster - the lightgbm booster.
+        rate - the games arriving per second (None to replay as fast as possible).
+        concurrency - the number of games processed at once.
+        warmup - the games completed before memory growth is measured.
+
+    Returns:
+        report - the latency percentiles, throughput and memory of the replay.
+    """
+    results = []
+    initargs = (playerFrame,venue,booster.model_to_string())
+    with ProcessPoolExecutor(max_workers=concurrency,initializer=startWorker,initargs=initargs) as executor:
+        #start every worker before the clock does, so loading the scorer is not counted as latency
+        workers = dict(executor.map(getWorkerMemory,range(concurrency)))
+        memory = [(0,sum(workers.values()))]
+        start = monotonic()
+
+        futures = [executor.submit(replayGame,i,gameId,game,start,rate) for i, (gameId, game) in enumerate(games)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            workers[result.pop('pid')] = result.pop('rssMB')
+            memory.append((len(results),sum(workers.values())))
+
+    seconds = monotonic() - start
+
+    #growth after the warmup games, when caches and lazy imports have settled
+    counts = np.array([m[0] for m in memory])
+    rss = np.array([m[1] for m in memory])
+    settled = counts >= min(warmup,len(results))
+    slope = np.polyfit(counts[settled],rss[settled],1)[0] if settled.sum() > 1 else 0.0
+
+    report = {
+        'games':len(results),
+        'shots':int(sum(r['shots'] for r in results)),
+        'rate':rate,
+        'concurrency':concurrency,
+        'seconds':seconds,
+        'gamesPerSecond':len(results)/seconds,
+        'shotsPerSecond':sum(r['shots'] for r in results)/seconds,
+        'latencySeconds':getPercentiles([r['latencySeconds'] for r in results]),
+        'serviceSeconds':getPercentiles([r['serviceSeconds'] for r in results]),
+        'stageSeconds':{stage: getPercentiles([r[stage] for r in results]) for stage in STAGES},
+        'slowestGame':max(results,key=lambda r: r['latencySeconds'])['gameId'],
+        'memory':{
+            'startMB':float(rss[0]),
+            'afterWarmupMB':float(rss[settled][0]),
+            'endMB':float(rss[-1]),
+            'peakMB':float(rss.max()),
+            'growthMB':float(rss[-1] - rss[settled][0]),
+            'growthMBPer100Games':float(slope*100),
+        },
+    }
+
+    return report
+
+def printReport(report):
+    """Print the latency, throughput and memory of a replay.
+
+    Parameters:
+        report - the report returned by runReplay.
+    """
+    print("Replayed " + str(report['games']) + " games (" + str(report['shots']) + " shots) in " +
+          "{:.1f}s: {:.2f} games/s, {:.0f} shots/s".format(report['seconds'],report['gamesPerSecond'],report['shotsPerSecond']))
+    print("{:<16}".format("") + "".join("{:>9}".format(p) for p in report['latencySeconds']))
+    rows = [('latency',report['latencySeconds']),('service',report['serviceSeconds'])]
+    rows = rows + [(stage,report['stageSeconds'][stage]) for stage in STAGES]
+    for name, percentiles in rows:
+        print("{:<16}".format(name) + "".join("{:>9.3f}".format(s) for s in percentiles.values()))
+
+    memory = report['memory']
+    print("Memory: {:.0f}MB after warmup, {:.0f}MB at the end, {:.0f}MB peak ({:+.1f}MB per 100 games)".format(
+          memory['afterWarmupMB'],memory['endMB'],memory['peakMB'],memory['growthMBPer100Games']))
+
+def main(argv=None):
+    """Run the replay harness from the command line."""
+    parser = argparse.ArgumentParser(description="Replay a season of pbp data game by game through extraction, venue adjustment and scoring.")
+    parser.add_argument('--pbp',default=shotDataCreation.PBP_FILES[-1],help="the pbp file replayed")
+    parser.add_argument('--games',type=int,help="replay only the first games of the season")
+    parser.add_argument('--rate',type=float,help="games arriving per second (as fast as possible by default)")
+    parser.add_argument('--concurrency',type=int,default=1,help="games processed at once")
+    parser.add_argument('--warmup',type=int,default=5,help="games completed before memory growth is measured")
+    parser.add_argument('--output',default="Benchmarks/replay.json")
+    args = parser.parse_args(argv)
+
+    #extraction prints every game and the adjuster prints while fitting
+    with open(os.devnull,'w') as devnull, redirect_stdout(devnull):
+        start = perf_counter()
+        games = loadGames(args.pbp)[:args.games]
+        playerFrame = pd.read_csv(INFO_PATH)
+        venue, booster = loadScorer()
+        setupSeconds = perf_counter() - start
+
+        report = runReplay(games,playerFrame,venue,booster,args.rate,args.concurrency,args.warmup)
+
+    report['pbp'] = args.pbp
+    report['setupSeconds'] = setupSeconds
+    report['created'] = datetime.now().isoformat(timespec='seconds')
+
+    print("Setup (loading pbp, fitting venue adjustments, loading the model): {:.1f}s".format(setupSeconds))
+    printReport(report)
+    writeJson(report,args.output)
+    print("Report written to " + args.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
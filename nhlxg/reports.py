@@ -0,0 +1,16 @@
+import json
+import os
+
+def writeJson(data,path):
+    """Write a dictionary to a json file, creating its directory if needed.
+
+    Parameters:
+        data - the dictionary to write.
+        path - the path of the file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory,exist_ok=True)
+
+    with open(path,'w') as f:
+        json.dump(data,f,indent=2)
@@ -0,0 +1,186 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .onIce import getShotMask
+
+#the xG data the cube is built from and where the cube is kept
+XG_PATH = "xG Data/xGData2010-2021.csv"
+CUBE_PATH = "xG Data/rollupCube.npz"
+
+#the grouping columns of the cube and the compact types they are stored as
+DIMENSIONS = {'Season':np.int16,'GameID':np.int32,'Team':None,'oppTeam':None,'Strength':np.int8,'isPlayoffs':np.int8}
+TEAM_COLUMNS = ['Team','oppTeam']
+
+#the totals kept for every cell
+MEASURES = {'xG':np.float32,'goals':np.int16,'shots':np.int16}
+
+#the columns read from the xG data
+CUBE_COLUMNS = list(DIMENSIONS) + ['xG','Outcome']
+
+def buildCube(df,teams=None):
+    """Total xG, goals and shots of the shot data for every cell of the cube.
+
+    Parameters:
+        df - the dataframe of shots with xG and Outcome.
+        teams - the team dictionary to encode with, new teams are added to the end.
+
+    Returns:
+        cube - a dataframe with a row per cell, teams are categoricals sharing one dictionary.
+    """
+    cube = (df.assign(goals=df['Outcome'],shots=1)
+              .groupby(list(DIMENSIONS),sort=False,observed=True)
+              .agg(xG=('xG','sum'),goals=('goals','sum'),shots=('shots','sum'))
+              .reset_index())
+
+    #keep the codes of known teams so stored cells stay valid
+    known = list(teams) if teams is not None else []
+    new = sorted(set(cube['Team'].astype(str)).union(cube['oppTeam'].astype(str)).difference(known))
+
+    return castCube(cube,known + new)
+
+def castCube(cube,teams):
+    """Cast the cube columns to their compact types.
+
+    Parameters:
+        cube - the cube dataframe.
+        teams - the team dictionary.
+
+    Returns:
+        cube - the cast cube.
+    """
+    columns = {}
+    for name, dtype in DIMENSIONS.items():
+        if name in TEAM_COLUMNS:
+            columns[name] = pd.Categorical(cube[name].astype(str),categories=teams)
+        else:
+            columns[name] = cube[name].to_numpy().astype(dtype)
+    for name, dtype in MEASURES.items():
+        columns[name] = cube[name].to_numpy().astype(dtype)
+
+    return pd.DataFrame(columns)
+
+def updateCube(cube,df):
+    """Add the games of new shot data to the cube, replacing any games it already has.
+
+    Parameters:
+        cube - the cube dataframe (None to start a new cube).
+        df - the dataframe of shots of the new or rescored games.
+
+    Returns:
+        cube - the updated cube sorted by season and game.
+    """
+    if cube is None:
+        cube = buildCube(df)
+    else:
+        teams = cube['Team'].cat.categories
+        cells = buildCube(df,teams)
+        teams = cells['Team'].cat.categories
+
+        #games are identified by season and game ID
+        keys = pd.MultiIndex.from_arrays([cube['Season'],cube['GameID']])
+        newKeys = pd.MultiIndex.from_arrays([cells['Season'],cells['GameID']])
+        kept = castCube(cube[~keys.isin(newKeys)],teams)
+
+        cube = pd.concat([kept,cells],ignore_index=True)
+
+    return cube.sort_values(['Season','GameID'],kind='stable').reset_index(drop=True)
+
+def saveCube(cube,path=CUBE_PATH):
+    """Write the cube atomically as dictionary encoded columns.
+
+    Parameters:
+        cube - the cube dataframe.
+        path - the path of the npz file.
+    """
+    arrays = {name: cube[name].to_numpy() for name in list(DIMENSIONS) + list(MEASURES) if name not in TEAM_COLUMNS}
+    for name in TEAM_COLUMNS:
+        arrays[name] = cube[name].cat.codes.to_numpy().astype(np.int8)
+    arrays['teams'] = np.array(cube['Team'].cat.categories,dtype=str)
+
+    #numpy adds the extension when it is missing
+    tmpPath = path + "." + str(os.getpid()) + ".tmp.npz"
+    np.savez_compressed(tmpPath,**arrays)
+    os.replace(tmpPath,path)
+
+def loadCube(path=CUBE_PATH):
+    """Read a cube written by saveCube.
+
+    Parameters:
+        path - the path of the npz file.
+
+    Returns:
+        cube - the cube dataframe, None if it does not exist yet.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as f:
+        teams = list(f['teams'])
+        columns = {}
+        for name in list(DIMENSIONS) + list(MEASURES):
+            if name in TEAM_COLUMNS:
+                columns[name] = pd.Categorical.from_codes(f[name],categories=teams)
+            else:
+                columns[name] = f[name]
+
+    return pd.DataFrame(columns)
+
+def queryCube(cube,by=('Season','Team'),season=None,team=None,strength=None,playoffs=None):
+    """Total xG, goals and shots of the cube cells matching a filter.
+
+    Parameters:
+        cube - the cube dataframe.
+        by - the dimensions to group by.
+        season - a season or list of seasons (all seasons if None).
+        team - a team or list of teams (all teams if None).
+        strength - 'EV', 'PP', 'SH' or None for all strengths (see onIce.getShotMask).
+        playoffs - 0 for the regular season, 1 for the playoffs or None for both.
+
+    Returns:
+        totals - a dataframe of xG, goals and shots per group.
+    """
+    mask = getShotMask(cube,season,strength,playoffs)
+    if team is not None:
+        mask &= cube['Team'].isin(np.atleast_1d(team)).to_numpy()
+
+    cells = cube[mask]
+
+    #xG is stored in single precision, sum it in double
+    totals = cells.astype({'xG':np.float64,'goals':np.int64,'shots':np.int64})
+    totals = totals.groupby(list(by),observed=True)[list(MEASURES)].sum().reset_index()
+
+    #show teams by name in alphabetical order rather than dictionary order
+    for name in TEAM_COLUMNS:
+        if name in by:
+            totals[name] = totals[name].astype(str)
+
+    return totals.set_index(list(by)).sort_index()
+
+def main(path=XG_PATH,cubePath=CUBE_PATH,refresh=False):
+    """Add the games of the xG data the cube does not have yet.
+
+    Parameters:
+        path - the path of the xG data.
+        cubePath - the path of the cube.
+        refresh - rebuild the cube from every game.
+    """
+    cube = None if refresh else loadCube(cubePath)
+
+    with profiling.stage("rollupCube.readXG") as record:
+        df = pd.read_csv(path,usecols=CUBE_COLUMNS)
+        record['rowsOut'] = len(df)
+
+    #only games missing from the cube are added
+    if cube is not None:
+        keys = pd.MultiIndex.from_arrays([cube['Season'],cube['GameID']])
+        df = df[~pd.MultiIndex.from_arrays([df['Season'],df['GameID']]).isin(keys)]
+
+    with profiling.stage("rollupCube.updateCube",df) as record:
+        cube = updateCube(cube,df)
+        record['rowsOut'] = len(cube)
+
+    saveCube(cube,cubePath)
+    print("Rollup cube has " + str(len(cube)) + " cells from " + str(cube.groupby(['Season','GameID']).ngroups) + " games")
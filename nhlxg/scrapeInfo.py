@@ -0,0 +1,293 @@
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+import pandas as pd
+
+#the NHL API and the path of a player's landing page
+BASE_URL = 'https://api-web.nhle.com'
+PLAYER_PATH = '/v1/player/{}/landing'
+
+#where player info is written and where fetched players are cached
+SHOT_PATH = "Raw Data/shotData/NHLShotData2010-2021.csv"
+INFO_PATH = "Raw Data/info/NHLInfo.csv"
+CACHE_PATH = "Raw Data/info/playerCache.csv"
+#players are keyed by id, the column shotDataCreation.extractShots matches shooters on
+INFO_COLUMNS = ['id','shootsCatches','position']
+
+#responses worth retrying, anything else that is not a 200 is a failure
+RETRY_STATUSES = [429,500,502,503,504]
+
+class TokenBucket:
+    """A thread-safe token bucket limiting how many requests are started per second."""
+
+    def __init__(self,rate,capacity=None):
+        """Create a full bucket.
+
+        Parameters:
+            rate - the tokens added per second.
+            capacity - the most tokens the bucket holds (defaults to rate, at least one).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate,1)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.capacity,self.tokens + (now - self.updated)*self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens = self.tokens - 1
+                    return
+
+                wait = (1 - self.tokens)/self.rate
+
+            sleep(wait)
+
+def createSession(poolSize):
+    """Create a requests session with a connection pool shared by all workers.
+
+    Parameters:
+        poolSize - the number of connections kept open.
+
+    Returns:
+        session - the requests session.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    #retries are handled by fetchPlayer so they go through the rate limit
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=poolSize,pool_maxsize=poolSize,max_retries=0)
+    session.mount('http://',adapter)
+    session.mount('https://',adapter)
+
+    return session
+
+def getRetryDelay(response,attempt,backoff):
+    """Get how long to wait before retrying a request.
+
+    Parameters:
+        response - the failed response or None if the request raised.
+        attempt - the number of the attempt that failed, starting at zero.
+        backoff - the delay of the first retry in seconds.
+
+    Returns:
+        delay - the seconds to wait.
+    """
+    #respect the server asking to slow down
+    if (response is not None) and (response.headers.get('Retry-After','').isdigit()):
+        return float(response.headers['Retry-After'])
+
+    #exponential backoff with jitter so workers do not retry together
+    return backoff*(2**attempt)*(0.5 + random.random())
+
+def fetchPlayer(session,bucket,playerId,baseUrl=BASE_URL,timeout=10,retries=5,backoff=0.5):
+    """Retrieve the handedness and position of a player.
+
+    Parameters:
+        session - the requests session.
+        bucket - the token bucket limiting the request rate.
+        playerId - the player ID string.
+        baseUrl - the URL of the API.
+        timeout - the seconds to wait for a response.
+        retries - the number of times a failed request is retried.
+        backoff - the delay of the first retry in seconds.
+
+    Returns:
+        row - [player ID, shoots/catches, position] or None if the player could not be retrieved.
+    """
+    import requests
+
+    url = baseUrl + PLAYER_PATH.format(playerId)
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        response = None
+        try:
+            response = session.get(url,timeout=timeout)
+        except (requests.ConnectionError,requests.Timeout):
+            pass
+
+        if (response is not None) and (response.status_code == 200):
+            #extract information on handedness and position, a body cut off in transit is retried
+            try:
+                jsonFile = json.loads(response.text)
+                return [playerId, jsonFile.get('shootsCatches', None), jsonFile.get('position', None)]
+            except (ValueError,AttributeError):
+                response = None
+
+        #do not retry requests that will not succeed
+        if (response is not None) and (response.status_code not in RETRY_STATUSES):
+            break
+
+        if attempt < retries:
+            sleep(getRetryDelay(response,attempt,backoff))
+
+    return None
+
+def fetchPlayers(playerIds,workers=8,rate=10,baseUrl=BASE_URL,timeout=10,retries=5,backoff=0.5):
+    """Retrieve many players concurrently.
+
+    Parameters:
+        playerIds - the player ID strings.
+        workers - the most requests in flight at once.
+        rate - the most requests started per second.
+        baseUrl - the URL of the API.
+        timeout - the seconds to wait for a response.
+        retries - the number of times a failed request is retried.
+        backoff - the delay of the first retry in seconds.
+
+    Returns:
+        player_info - a list of [player ID, shoots/catches, position] rows.
+        failed - the player IDs that could not be retrieved.
+    """
+    session = createSession(workers)
+    bucket = TokenBucket(rate)
+
+    def fetch(playerId):
+        return fetchPlayer(session,bucket,playerId,baseUrl,timeout,retries,backoff)
+
+    player_info = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for playerId, row in zip(playerIds,executor.map(fetch,playerIds)):
+            if row is not None:
+                player_info.append(row)
+                print(f"Successfully retrieved data for player {playerId}")
+            else:
+                #handle the case where the API request failed
+                failed.append(playerId)
+                print(f"Failed to retrieve data for player {playerId}")
+
+    session.close()
+
+    return player_info, failed
+
+def getPlayerIds(path=SHOT_PATH):
+    """Get the unique shooter and goalie IDs as strings.
+
+    Parameters:
+        path - the path of the shot data.
+
+    Returns:
+        playerIds - the player ID strings.
+    """
+    #only the ID columns are read
+    shotData = pd.read_csv(path,usecols=['shooter','goalie'])
+    ids = pd.concat([shotData['shooter'],shotData['goalie']]).dropna().unique()
+
+    #make the IDs integer strings
+    return sorted(str(int(float(ID))) for ID in ids)
+
+def writeCsvAtomic(df,path):
+    """Write a dataframe to a csv so readers never see a partly written file.
+
+    Parameters:
+        df - the dataframe to write.
+        path - the path of the csv.
+    """
+    tmpPath = path + "." + str(os.getpid()) + ".tmp"
+    df.to_csv(tmpPath,index=False)
+    os.replace(tmpPath,path)
+
+def loadCache(cachePath=CACHE_PATH,infoPath=INFO_PATH):
+    """Read the player cache.
+
+    The first time the cache is used it is seeded from the existing player info, dated by when
+    that file was last written, so the players already retrieved are not requested again.
+
+    Parameters:
+        cachePath - the path of the cache.
+        infoPath - the path of the player info.
+
+    Returns:
+        cache - a dataframe of player info with the time each player was fetched.
+    """
+    if os.path.exists(cachePath):
+        cache = pd.read_csv(cachePath,dtype={'player_ID':str,'id':str}).rename(columns={'player_ID':'id'})
+        cache['fetchedAt'] = pd.to_datetime(cache['fetchedAt'],utc=True)
+        return cache
+
+    if os.path.exists(infoPath):
+        cache = pd.read_csv(infoPath,dtype={'player_ID':str,'id':str}).rename(columns={'player_ID':'id'})
+        cache = cache[INFO_COLUMNS]
+        cache['fetchedAt'] = pd.Timestamp(os.path.getmtime(infoPath),unit='s',tz='UTC')
+        return cache
+
+    cache = pd.DataFrame(columns=INFO_COLUMNS + ['fetchedAt'])
+    cache['fetchedAt'] = pd.to_datetime(cache['fetchedAt'],utc=True)
+
+    return cache
+
+def getStaleIds(playerIds,cache,ttlDays):
+    """Find the players that are not cached or were fetched longer ago than the TTL.
+
+    Parameters:
+        playerIds - the player ID strings needed.
+        cache - the player cache.
+        ttlDays - the days a fetched player stays current.
+
+    Returns:
+        staleIds - the player ID strings to request.
+    """
+    cutoff = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=ttlDays)
+    current = set(cache.loc[cache['fetchedAt'] > cutoff,'id'])
+
+    return [playerId for playerId in playerIds if playerId not in current]
+
+def mergeCache(cache,player_info,fetchedAt):
+    """Add newly fetched players to the cache, replacing their old rows.
+
+    Parameters:
+        cache - the player cache.
+        player_info - a list of [player ID, shoots/catches, position] rows.
+        fetchedAt - the time the players were fetched.
+
+    Returns:
+        cache - the merged cache.
+    """
+    fetched = pd.DataFrame(player_info,columns=INFO_COLUMNS)
+    fetched['fetchedAt'] = fetchedAt
+    cache = pd.concat([cache[~cache['id'].isin(fetched['id'])],fetched],ignore_index=True)
+
+    return cache.sort_values('id').reset_index(drop=True)
+
+def main(workers=8,rate=10,baseUrl=BASE_URL,timeout=10,retries=5,ttlDays=30):
+    """Retrieve the handedness and position of new or stale shooters and goalies from the NHL API.
+
+    Parameters:
+        workers - the most requests in flight at once.
+        rate - the most requests started per second.
+        baseUrl - the URL of the API.
+        timeout - the seconds to wait for a response.
+        retries - the number of times a failed request is retried.
+        ttlDays - the days a fetched player stays current (0 refreshes every player).
+    """
+    playerIds = getPlayerIds()
+    cache = loadCache()
+    staleIds = getStaleIds(playerIds,cache,ttlDays)
+    print(f"{len(playerIds)} players, {len(staleIds)} new or older than {ttlDays} days")
+
+    fetchedAt = pd.Timestamp.now(tz='UTC')
+    player_info, failed = fetchPlayers(staleIds,workers,rate,baseUrl,timeout,retries)
+    print(f"Retrieved {len(player_info)} players, {len(failed)} failed")
+
+    #failed players keep their cached row and are requested again next run
+    cache = mergeCache(cache,player_info,fetchedAt)
+    writeCsvAtomic(cache,CACHE_PATH)
+
+    #create and save the dataframe as a csv
+    writeCsvAtomic(cache[INFO_COLUMNS],INFO_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .xGModelCreation import PARAMS, prepareFrame
+
+#where matrices shared by worker processes are written, /dev/shm keeps them in memory on linux
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+#the venue adjusted shots and the last season of the cross-validated xG
+VENUE_PATH = "Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv"
+TRAIN_SEASON = 2020
+
+#the folds and boosting rounds of the cross-validated xG (as in xGModelCreation.cvPredict)
+FOLDS = 10
+ROUNDS = 100
+
+#the label columns start on a cache line
+ALIGNMENT = 64
+
+def writeMatrix(path,chunks,features):
+    """Write a float32 feature matrix and its label columns to one file.
+
+    The rows are written as they come so the whole matrix is never held in memory. The label
+    columns follow the matrix.
+
+    Parameters:
+        path - the path of the file.
+        chunks - an iterable of (feature rows, dictionary of label name to values).
+        features - the names of the feature columns.
+
+    Returns:
+        handle - a dictionary describing the file, passed to workers to attach to it.
+    """
+    rows = 0
+    labels = {}
+    tmpPath = path + "." + str(os.getpid()) + ".tmp"
+    with open(tmpPath,'wb') as f:
+        for X, chunkLabels in chunks:
+            f.write(np.ascontiguousarray(X,dtype=np.float32).tobytes())
+            rows = rows + len(X)
+            for name, values in chunkLabels.items():
+                labels.setdefault(name,[]).append(np.asarray(values))
+
+        columns = {}
+        for name, parts in labels.items():
+            values = np.concatenate(parts)
+            f.write(b'\0'*(-f.tell() % ALIGNMENT))
+            columns[name] = {'dtype':values.dtype.str,'offset':f.tell()}
+            f.write(values.tobytes())
+    os.replace(tmpPath,path)
+
+    return {'path':path,'rows':rows,'features':list(features),'columns':columns}
+
+def attachMatrix(handle,mode='r'):
+    """Map a matrix written by writeMatrix without copying it.
+
+    Parameters:
+        handle - the dictionary returned by writeMatrix.
+        mode - 'r' to read or 'r+' to also write in place.
+
+    Returns:
+        matrix - a dictionary with the feature matrix X and each label column.
+    """
+    shape = (handle['rows'],len(handle['features']))
+    matrix = {'X':np.memmap(handle['path'],dtype=np.float32,mode=mode,shape=shape)}
+    for name, column in handle['columns'].items():
+        matrix[name] = np.memmap(handle['path'],dtype=np.dtype(column['dtype']),mode=mode,offset=column['offset'],shape=(handle['rows'],))
+
+    return matrix
+
+def shareFrame(df,labels=('Outcome',),directory=SHARED_DIR):
+    """Place the model features and outcome of a prepared frame where worker processes can attach to them.
+
+    Parameters:
+        df - the dataframe of model features and labels.
+        labels - the label columns, every other column is a feature.
+        directory - the directory of the shared file.
+
+    Returns:
+        handle - the handle of the shared matrix, released with releaseMatrix.
+    """
+    features = [c for c in df.columns if c not in labels]
+    path = os.path.join(directory,"nhlxg-" + str(os.getpid()) + "-" + uuid.uuid4().hex[:8] + ".mat")
+    chunk = (df[features].to_numpy(dtype=np.float32),{name: df[name].to_numpy() for name in labels})
+
+    return writeMatrix(path,[chunk],features)
+
+def releaseMatrix(handle):
+    """Delete a shared matrix once no worker uses it.
+
+    Parameters:
+        handle - the handle of the shared matrix.
+    """
+    try:
+        os.remove(handle['path'])
+    except FileNotFoundError:
+        pass
+
+def fitFold(X,y,trainIdx,testIdx,params):
+    """Fit a model on the training rows of a fold and predict its testing rows without copying X.
+
+    lightgbm reads a contiguous float32 matrix in place, so the whole matrix is binned once into
+    a dataset and the fold trains on a subset of its binned rows, as outOfCoreTraining.trainModels
+    does. Indexing X with the rows would copy them. The testing rows are predicted from the
+    contiguous block of rows that holds them.
+
+    Parameters:
+        X - the float32 feature matrix.
+        y - the outcome of every row.
+        trainIdx - the rows trained on.
+        testIdx - the rows predicted, in ascending order.
+        params - the LGBM parameters.
+
+    Returns:
+        preds - the probability of a goal for each testing row.
+        privateMB - the private memory of the process once the fold's model is trained.
+    """
+    import lightgbm as lgb
+
+    dataset = lgb.Dataset(X,label=np.asarray(y).astype('int32'),params=params,free_raw_data=True).construct()
+    booster = lgb.train(params,dataset.subset(trainIdx),num_boost_round=ROUNDS)
+    privateMB = profiling.getPrivateMB()
+
+    block = X[testIdx[0]:testIdx[-1] + 1]
+    preds = booster.predict(block)[testIdx - testIdx[0]]
+
+    return preds, privateMB
+
+def getProcessSeconds():
+    """Get the seconds since this process started.
+
+    Returns:
+        seconds - the age of the process, None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            started = int(f.read().rsplit(')',1)[1].split()[19])/os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime') as f:
+            return float(f.read().split()[0]) - started
+    except OSError:
+        return None
+
+def sharedFoldWorker(handle,trainIdx,testIdx,params):
+    """Run a fold in a worker process attached to the shared matrix."""
+    matrix = attachMatrix(handle)
+    readySeconds = getProcessSeconds()
+    preds, privateMB = fitFold(matrix['X'],matrix['Outcome'],trainIdx,testIdx,params)
+
+    return preds, {'readySeconds':readySeconds,'privateMB':privateMB,'peakRssMB':profiling.getPeakRssMB()}
+
+def pickledFoldWorker(df,trainIdx,testIdx,params):
+    """Run a fold in a worker process sent its own pickled copy of the frame."""
+    readySeconds = getProcessSeconds()
+    X = df.loc[:,df.columns != 'Outcome'].to_numpy(dtype=np.float32)
+    preds, privateMB = fitFold(X,df['Outcome'].to_numpy(),trainIdx,testIdx,params)
+
+    return preds, {'readySeconds':readySeconds,'privateMB':privateMB,'peakRssMB':profiling.getPeakRssMB()}
+
+def cvPredictParallel(df,params=PARAMS,workers=4,shared=True):
+    """Predict shot outcomes with cross validation, fitting the folds in worker processes.
+
+    Each fold runs in a fresh process. With shared the features are written once to a shared
+    matrix and every worker attaches to it, otherwise every worker is sent a pickled copy of the
+    frame, as process pools do with their arguments.
+
+    Parameters:
+        df - the dataframe of model features and outcome.
+        params - the LGBM parameters.
+        workers - the folds fitted at once.
+        shared - attach the workers to a shared matrix instead of pickling the frame.
+
+    Returns:
+        preds - the probability of a goal for each shot.
+        report - the seconds taken and the memory of each worker.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    start = perf_counter()
+    y = df['Outcome'].astype('int32')
+    splits = StratifiedKFold(n_splits=FOLDS).split(np.zeros(len(y)),y)
+
+    handle = shareFrame(df) if shared else None
+    preds = np.empty(len(df))
+    memory = []
+    try:
+        #a fresh process per fold so each worker's memory is its own fold's
+        with ProcessPoolExecutor(max_workers=workers,max_tasks_per_child=1) as executor:
+            futures = []
+            for trainIdx, testIdx in splits:
+                data = handle if shared else df
+                worker = sharedFoldWorker if shared else pickledFoldWorker
+                futures.append((testIdx,executor.submit(worker,data,trainIdx,testIdx,params)))
+            for testIdx, future in futures:
+                preds[testIdx], workerMemory = future.result()
+                memory.append(workerMemory)
+    finally:
+        if handle is not None:
+            releaseMatrix(handle)
+
+    report = {'shared':shared,'workers':workers,'seconds':perf_counter() - start,'workerMemory':memory}
+    for name in ['readySeconds','privateMB','peakRssMB']:
+        report[name] = float(np.mean([m[name] for m in memory]))
+
+    return preds, report
+
+def main(argv=None):
+    """Run the parallel cross validation from the command line."""
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    parser = argparse.ArgumentParser(description="Cross-validate the model with folds in worker processes sharing one feature matrix.")
+    parser.add_argument('--workers',type=int,default=4,help="folds fitted at once")
+    parser.add_argument('--compare',action='store_true',help="also run with pickled frames and compare worker memory")
+    args = parser.parse_args(argv)
+
+    shotFrame = pd.read_csv(VENUE_PATH)
+    trainingFrame, writingFrame = prepareFrame(shotFrame[shotFrame['Season'] <= TRAIN_SEASON])
+    del shotFrame
+    print("Prepared " + str(len(trainingFrame)) + " shots, " + "{:.0f}MB as float32 features".format(
+          trainingFrame.shape[0]*(trainingFrame.shape[1] - 1)*4/2**20))
+
+    with profiling.stage("sharedFeatures.cvPredictParallel",trainingFrame) as record:
+        preds, report = cvPredictParallel(trainingFrame,workers=args.workers)
+        record['rowsOut'] = len(preds)
+    print("Log Loss: " + str(log_loss(writingFrame['Outcome'],preds)))
+    print("AUC: " + str(roc_auc_score(writingFrame['Outcome'],preds)))
+
+    reports = {'shared':report}
+    if args.compare:
+        pickledPreds, reports['pickled'] = cvPredictParallel(trainingFrame,workers=args.workers,shared=False)
+        print("Largest difference from the pickled predictions: " + str(float(np.abs(preds - pickledPreds).max())))
+
+    print("{:<10}{:>10}{:>14}{:>14}{:>10}".format("Workers","Ready s","Private MB","Peak RSS MB","Total s"))
+    for name, r in reports.items():
+        print("{:<10}{:>10.2f}{:>14.0f}{:>14.0f}{:>10.1f}".format(name,r['readySeconds'],r['privateMB'],r['peakRssMB'],r['seconds']))
+    print("Ready is per worker once its data is available and private once its model is trained, averaged over the folds")
+    print("Peak RSS counts the pages of the shared matrix a worker read, which are not copied")
+    print(json.dumps({name: {k: v for k, v in r.items() if k != 'workerMemory'} for name, r in reports.items()}))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,40 @@
+import os
 import pandas as pd
 import numpy as np
 from math import degrees, atan
+from . import profiling
+from .kernels import calculateDistArray, calculateAngleArray, encodeStrengthArray
+from .windowFeatures import createWindowFeatures
+
+#the files to be used for creation
+PBP_FILES = ["Raw Data/pbp/nhl_pbp_20102011.csv",
+        "Raw Data/pbp/nhl_pbp_20112012.csv",
+        "Raw Data/pbp/nhl_pbp_20122013.csv",
+        "Raw Data/pbp/nhl_pbp_20132014.csv",
+        "Raw Data/pbp/nhl_pbp_20142015.csv",
+        "Raw Data/pbp/nhl_pbp_20152016.csv",
+        "Raw Data/pbp/nhl_pbp_20162017.csv",
+        "Raw Data/pbp/nhl_pbp_20172018.csv",
+        "Raw Data/pbp/nhl_pbp_20182019.csv",
+        "Raw Data/pbp/nhl_pbp_20192020.csv",
+        "Raw Data/pbp/nhl_pbp_20202021.csv",
+        "Raw Data/pbp/nhl_pbp_20212022.csv"]
+
+#created training files
+SHOT_FILES = ["NHLShotData2010.csv","NHLShotData2011.csv","NHLShotData2012.csv","NHLShotData2013.csv","NHLShotData2014.csv",
+        "NHLShotData2015.csv","NHLShotData2016.csv","NHLShotData2017.csv","NHLShotData2018.csv",
+        "NHLShotData2019.csv","NHLShotData2020.csv","NHLShotData2021.csv"]
+
+def getSeasonString(file):
+    """Get the starting year of a season from a pbp file name.
+
+    Parameters:
+        file - the path of a pbp file named like nhl_pbp_20102011.csv.
+
+    Returns:
+        seasonString - the year the season started in.
+    """
+    return os.path.basename(file)[8:12]
 
 def createTrainingFrame(lst):
     """Create a dataframe from a list of csv file names.
@@ -13,13 +47,22 @@ def createTrainingFrame(lst):
     """
 
     #read in the csv
-    season = pd.read_csv(lst)
+    return prepareTrainingFrame(pd.read_csv(lst),getSeasonString(lst))
+
+def prepareTrainingFrame(season,seasonString):
+    """Prepare the pbp data of a season, or of some of its games, read from its csv.
 
+    Parameters:
+        season - the dataframe of pbp data as read from the csv.
+        seasonString - the season of the pbp data (see getSeasonString).
+
+    Returns:
+        trainingFrame - a dataframe with all information from the games.
+    """
     #note playoff games
     season['isPlayoffs'] = season.apply(lambda x: 1 if x['Game_Id'] >= 30000  else 0, axis = 1)
 
     #create a unique Game_Id by adding the year the game took place to the current Game_Id string
-    seasonString = i[21:25]
     season['season'] = seasonString
     season['Game_Id'] = seasonString + season['Game_Id'].astype(str)
     season = season.iloc[:,1:] #remove the index column
@@ -273,8 +316,17 @@ def getRelativeZone(currentTeam,lastTeam,lastZone):
     
     return lastZone
     
-def main(files):
-    """Create all shot data from pbp data."""
+def extractShots(trainingFrame,playerFrame,window=None):
+    """Create the shot data for a season of pbp data.
+
+    Parameters:
+        trainingFrame - the dataframe returned by createTrainingFrame.
+        playerFrame - the dataframe of player info (handedness).
+        window - the (events, seconds) of the lookback window features (none added if None).
+
+    Returns:
+        finalDF - a dataframe with one row per shot attempt.
+    """
     #the columns to be stored
     cols = ['GameID','Date','Season','isPlayoffs','isEmptyNet','isPenaltyShot','isStrongSide','Event','x','y','Team','oppTeam','Strength','isHome','GameTime','PeriodTime','Distance','Angle','ShotType',
             'GoalDiff','LastEvent','LastEventDistance','LastEventZone','LastEventAngle','LastEventSpeed','TimeSinceLastEvent',
@@ -282,21 +334,16 @@ def main(files):
             'P1For','P2For','P3For','P4For','P5For','P6For','P1Against','P2Against','P3Against','P4Against','P5Against',
             'P6Against','AwayPlayers','HomePlayers','Outcome']
 
-    #create the dataframe from the input csv'
-    trainingFiles = files
-    
-    #create the full training frame
-    trainingFrame = createTrainingFrame(trainingFiles)
     trainingFrame['Date'] = pd.to_datetime(trainingFrame['Date'],format='%Y-%m-%d')
     trainingFrame = trainingFrame.replace('PHX','ARI')
-    playerFrame = pd.read_csv("Raw Data/info/NHLInfo.csv")
 
     #standardize x and y
     trainingFrame["xS"] = trainingFrame.apply(standarizeX,axis=1)
     trainingFrame["yS"] = trainingFrame.apply(standarizeY,axis=1)
     
-    #list that holds dictionaries to be turned into dataframe
+    #list that holds dictionaries to be turned into dataframe, and the events they came from
     rowList = []
+    rowIndex = []
 
     #use iterframe to speed up iteration
     iterTrainingFrame = trainingFrame
@@ -310,6 +357,11 @@ def main(files):
                                                              ((x['Ev_Team'] == x['Away_Team']) and (pd.isnull(x['Home_Goalie'])))
                                                           else 0, axis = 1)
 
+    #compute the relative strength, distance and angle of every shot at once
+    iterShotFrame['relStrength'] = encodeStrengthArray(iterShotFrame['Strength'],iterShotFrame['Ev_Team'],iterShotFrame['Home_Team'])
+    iterShotFrame['shotDistance'] = calculateDistArray(iterShotFrame['xS'],iterShotFrame['yS'],89,0)
+    iterShotFrame['shotAngle'] = calculateAngleArray(iterShotFrame['xS'],iterShotFrame['yS'],89,0)
+
     #iterate through all games
     for row in iterShotFrame.itertuples():
         #store the row containing info about the last event
@@ -337,7 +389,7 @@ def main(files):
         time = row.Seconds_Elapsed
         period = row.Period
         date = row.Date
-        strength = encodeStrength(row.Strength,team,row.Home_Team)
+        strength = row.relStrength
 
         #calculate the current time played
         gameTime = time + ((period-1)*1200)
@@ -377,9 +429,9 @@ def main(files):
         #basic shot data
         x = row.xS
         y = row.yS
-        distance = calculateDist(x,y,89,0)
+        distance = row.shotDistance
         distanceDiffLastEvent = calculateDist(row.xC,row.yC,lastEventX,lastEventY)
-        angle = calculateAngle(x,y,89,0)
+        angle = row.shotAngle
         angleDiffLastEvent = calculateAngle(lastEventX,lastEventY,row.xC,row.yC)
 
         #account for divide by zero errors
@@ -448,17 +500,17 @@ def main(files):
         homeScore = row.Home_Score
         awayScore = row.Away_Score
 
-        #assign score for and against
+        #assign score for and against, the goalie is the one in the net being shot at
         if team == row.Home_Team:
             scoreFor = homeScore
             scoreAgainst = awayScore
             home = 1
-            goalie = row.Home_Goalie_Id
+            goalie = row.Away_Goalie_Id
         else:
             scoreFor = awayScore
             scoreAgainst = homeScore
             home = 0
-            goalie = row.Away_Goalie_Id
+            goalie = row.Home_Goalie_Id
 
         #determine shooter and each individual player on the ice
         shooter = row.p1_ID
@@ -557,41 +609,59 @@ def main(files):
 
         d = dict(zip(cols,data))
         rowList.append(d)
+        rowIndex.append(index)
         
         print(gameID)
 
     finalDF = pd.DataFrame.from_dict(rowList)
-    finalDF.to_csv("Raw Data/shotData/NHLShotData"+str(files[21:25])+".csv",index=False)
 
+    #the window features are computed for the whole season at once and joined to the shots
+    if window is not None:
+        windowFrame = createWindowFeatures(iterTrainingFrame,window[0],window[1])
+        finalDF = pd.concat([finalDF,windowFrame.loc[rowIndex].reset_index(drop=True)],axis=1)
 
-#the files to be used for creation
-files = ["Raw Data/pbp/nhl_pbp_20102011.csv",
-        "Raw Data/pbp/nhl_pbp_20112012.csv",
-        "Raw Data/pbp/nhl_pbp_20122013.csv",
-        "Raw Data/pbp/nhl_pbp_20132014.csv",
-        "Raw Data/pbp/nhl_pbp_20142015.csv",
-        "Raw Data/pbp/nhl_pbp_20152016.csv",
-        "Raw Data/pbp/nhl_pbp_20162017.csv",
-        "Raw Data/pbp/nhl_pbp_20172018.csv",
-        "Raw Data/pbp/nhl_pbp_20182019.csv",
-        "Raw Data/pbp/nhl_pbp_20192020.csv",
-        "Raw Data/pbp/nhl_pbp_20202021.csv",
-        "Raw Data/pbp/nhl_pbp_20212022.csv"]
+    return finalDF
 
+def main(files,window=None):
+    """Create all shot data from pbp data.
 
-#create file for each year 
-for i in files:  
-    main(i)
+    Parameters:
+        files - the path of the pbp file of a season.
+        window - the (events, seconds) of the lookback window features (none added if None).
+    """
+    #create the full training frame from the input csv
+    with profiling.stage("shotDataCreation.readPbp") as record:
+        trainingFrame = createTrainingFrame(files)
+        playerFrame = pd.read_csv("Raw Data/info/NHLInfo.csv")
+        record['rowsOut'] = len(trainingFrame)
+
+    with profiling.stage("shotDataCreation.extractShots",trainingFrame) as record:
+        finalDF = extractShots(trainingFrame,playerFrame,window)
+        record['rowsOut'] = len(finalDF)
+
+    with profiling.stage("shotDataCreation.writeShots",finalDF):
+        finalDF.to_csv("Raw Data/shotData/NHLShotData"+getSeasonString(files)+".csv",index=False)
+
+def mergeSeasons(train):
+    """Join the season shot files into a single file.
+
+    Parameters:
+        train - the names of the season shot files in Raw Data/shotData.
+    """
+    #create a joined file 
+    with profiling.stage("shotDataCreation.mergeSeasons") as record:
+        trainingFrame = pd.DataFrame()
+        for i in train:
+            data = pd.read_csv("Raw Data/shotData/"+i, index_col=False)
+            trainingFrame = pd.concat([data,trainingFrame],axis=0)
+
+        trainingFrame.to_csv("Raw Data/shotData/NHLShotData2010-2021.csv",index=False)
+        record['rowsOut'] = len(trainingFrame)
 
-#created training files
-train = ["NHLShotData2010.csv","NHLShotData2011.csv","NHLShotData2012.csv","NHLShotData2013.csv","NHLShotData2014.csv",
-        "NHLShotData2015.csv","NHLShotData2016.csv","NHLShotData2017.csv","NHLShotData2018.csv",
-        "NHLShotData2019.csv","NHLShotData2020.csv","NHLShotData2021.csv"]
 
-#create a joined file 
-trainingFrame = pd.DataFrame()
-for i in train:
-    data = pd.read_csv("Raw Data/shotData/"+i, index_col=False)
-    trainingFrame = pd.concat([data,trainingFrame],axis=0)
+if __name__ == "__main__":
+    #create file for each year 
+    for i in PBP_FILES:  
+        main(i)
 
-trainingFrame.to_csv("Raw Data/shotData/NHLShotData2010-2021.csv",index=False)
+    mergeSeasons(SHOT_FILES)
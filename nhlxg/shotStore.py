@@ -0,0 +1,279 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+
+#the xG data the store is built from and the directory of the store
+XG_PATH = "xG Data/xGData2010-2021.csv"
+STORE_DIR = "xG Data/shotStore"
+
+#the file in the store directory naming the version readers open
+POINTER_FILE = "CURRENT"
+
+#the columns with a secondary index, shots are stored in GameID order so games need none
+INDEX_COLUMNS = ['shooter','goalie','Date']
+
+#dates are stored as days since this day
+EPOCH = pd.Timestamp('1970-01-01')
+
+def encodeColumn(values):
+    """Encode a column as a numeric array that numpy can memory-map.
+
+    Parameters:
+        values - the pandas series of the column.
+
+    Returns:
+        array - the numeric array.
+        encoding - 'date', 'dictionary' or 'numeric'.
+        vocab - the strings of a dictionary encoded column, None otherwise.
+    """
+    if values.name == 'Date':
+        days = (pd.to_datetime(values) - EPOCH).dt.days
+        return days.to_numpy().astype(np.int32), 'date', None
+
+    if values.dtype == bool:
+        return values.to_numpy().astype(np.int8), 'numeric', None
+
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(), 'numeric', None
+
+    #strings are replaced by codes into a sorted vocabulary, missing values are -1
+    codes, vocab = pd.factorize(values,sort=True)
+
+    return codes.astype(np.int16 if len(vocab) < 2**15 else np.int32), 'dictionary', [str(v) for v in vocab]
+
+def writeStore(df,directory=STORE_DIR):
+    """Write shots as a column per .npy file with sorted secondary indexes.
+
+    Every write is a new version in its own subdirectory. The version is published by atomically
+    replacing the pointer file, and readers map every file of the version named by the pointer
+    when they open the store, so they see the old or the new store and never a mix. The version
+    replaced is kept for readers opening it at the time of the swap, older versions are removed.
+
+    Parameters:
+        df - the dataframe of shots.
+        directory - the directory of the store.
+    """
+    df = df.sort_values('GameID',kind='stable').reset_index(drop=True)
+
+    os.makedirs(directory,exist_ok=True)
+    previous = getVersion(directory)
+    version = "v" + datetime.now().strftime('%Y%m%d-%H%M%S-%f') + "-" + str(os.getpid())
+    tmpDir = os.path.join(directory,version)
+    os.makedirs(tmpDir)
+
+    meta = {'rows':len(df),'columns':{},'indexes':INDEX_COLUMNS}
+    for name in df.columns:
+        array, encoding, vocab = encodeColumn(df[name])
+        np.save(os.path.join(tmpDir,name + ".npy"),array)
+        meta['columns'][name] = {'encoding':encoding,'vocab':vocab}
+
+    #each index is the row order sorting the column and the column values in that order
+    for name in INDEX_COLUMNS:
+        array = np.load(os.path.join(tmpDir,name + ".npy"))
+        order = np.argsort(array,kind='stable').astype(np.int32)
+        np.save(os.path.join(tmpDir,name + ".order.npy"),order)
+        np.save(os.path.join(tmpDir,name + ".sorted.npy"),array[order])
+
+    with open(os.path.join(tmpDir,"meta.json"),'w') as f:
+        json.dump(meta,f,indent=2)
+
+    #publish the new version, replacing a file is atomic where replacing a directory is not
+    pointerPath = os.path.join(directory,POINTER_FILE)
+    with open(pointerPath + "." + str(os.getpid()) + ".tmp",'w') as f:
+        f.write(version)
+    os.replace(pointerPath + "." + str(os.getpid()) + ".tmp",pointerPath)
+
+    #remove versions older than the one replaced and the files of a store written before versions
+    for name in os.listdir(directory):
+        path = os.path.join(directory,name)
+        if os.path.isdir(path) and (name not in [version,previous]):
+            shutil.rmtree(path,ignore_errors=True)
+        elif name.endswith('.npy') or (name == "meta.json"):
+            os.remove(path)
+
+def getVersion(directory):
+    """Get the version of a store readers currently open.
+
+    Parameters:
+        directory - the directory of the store.
+
+    Returns:
+        version - the name of the version's subdirectory, None if no version was published.
+    """
+    try:
+        with open(os.path.join(directory,POINTER_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+class ShotStore:
+    """Read-only access to a shot store through memory-mapped columns.
+
+    Every file of the current version is mapped when the store is opened, so the store keeps
+    reading that version after a new one is written. Mapping reads no data, and processes reading
+    the same store share the pages of the operating system's file cache instead of holding their
+    own copies.
+    """
+
+    def __init__(self,directory=STORE_DIR):
+        """Open a store.
+
+        Parameters:
+            directory - the directory of the store.
+        """
+        self.directory = directory
+        self.version = getVersion(directory)
+        versionDir = directory if self.version is None else os.path.join(directory,self.version)
+
+        with open(os.path.join(versionDir,"meta.json")) as f:
+            self.meta = json.load(f)
+        self.columns = list(self.meta['columns'])
+        self.arrays = {name[:-len(".npy")]: np.load(os.path.join(versionDir,name),mmap_mode='r')
+                       for name in os.listdir(versionDir) if name.endswith(".npy")}
+
+    def array(self,name):
+        """Get the memory-mapped array of a file of the store.
+
+        Parameters:
+            name - the file name without the .npy extension.
+
+        Returns:
+            array - the read-only memory-mapped array.
+        """
+        return self.arrays[name]
+
+    def rows(self,positions,columns=None):
+        """Read and decode rows of the store.
+
+        Parameters:
+            positions - the row positions, a slice or an integer array.
+            columns - the columns to read (all columns if None).
+
+        Returns:
+            shots - a dataframe of the rows.
+        """
+        data = {}
+        for name in columns or self.columns:
+            values = np.asarray(self.array(name)[positions])
+            info = self.meta['columns'][name]
+            if info['encoding'] == 'date':
+                values = EPOCH + pd.to_timedelta(values,unit='D')
+            elif info['encoding'] == 'dictionary':
+                values = pd.Categorical.from_codes(values,categories=info['vocab'])
+            data[name] = values
+
+        return pd.DataFrame(data)
+
+    def lookup(self,name,low,high=None):
+        """Find the rows of an indexed column between two values.
+
+        Parameters:
+            name - the indexed column.
+            low - the smallest value.
+            high - the largest value (low if None).
+
+        Returns:
+            positions - the sorted row positions.
+        """
+        high = low if high is None else high
+        keys = self.array(name + ".sorted")
+        start = np.searchsorted(keys,low,side='left')
+        end = np.searchsorted(keys,high,side='right')
+
+        return np.sort(self.array(name + ".order")[start:end])
+
+    def toDays(self,date):
+        """Convert a date to the day number the store uses."""
+        return (pd.Timestamp(date) - EPOCH).days
+
+    def sinceDate(self,positions,since):
+        """Keep the rows on or after a date.
+
+        Parameters:
+            positions - the row positions.
+            since - the first date kept (keep every row if None).
+
+        Returns:
+            positions - the row positions on or after the date.
+        """
+        if since is None:
+            return positions
+
+        return positions[self.array('Date')[positions] >= self.toDays(since)]
+
+    def game(self,gameId,columns=None):
+        """Get the shots of a game.
+
+        Parameters:
+            gameId - the game ID.
+            columns - the columns to read (all columns if None).
+
+        Returns:
+            shots - a dataframe of the shots.
+        """
+        gameIds = self.array('GameID')
+        start = np.searchsorted(gameIds,gameId,side='left')
+        end = np.searchsorted(gameIds,gameId,side='right')
+
+        return self.rows(slice(start,end),columns)
+
+    def shooter(self,playerId,since=None,columns=None):
+        """Get the shots of a shooter.
+
+        Parameters:
+            playerId - the ID of the shooter.
+            since - the first date included (all dates if None).
+            columns - the columns to read (all columns if None).
+
+        Returns:
+            shots - a dataframe of the shots.
+        """
+        return self.rows(self.sinceDate(self.lookup('shooter',playerId),since),columns)
+
+    def goalie(self,playerId,since=None,columns=None):
+        """Get the shots faced by a goalie.
+
+        Parameters:
+            playerId - the ID of the goalie.
+            since - the first date included (all dates if None).
+            columns - the columns to read (all columns if None).
+
+        Returns:
+            shots - a dataframe of the shots.
+        """
+        return self.rows(self.sinceDate(self.lookup('goalie',playerId),since),columns)
+
+    def dateRange(self,start,end,columns=None):
+        """Get the shots between two dates.
+
+        Parameters:
+            start - the first date included.
+            end - the last date included.
+            columns - the columns to read (all columns if None).
+
+        Returns:
+            shots - a dataframe of the shots.
+        """
+        return self.rows(self.lookup('Date',self.toDays(start),self.toDays(end)),columns)
+
+def main(path=XG_PATH,directory=STORE_DIR):
+    """Build the shot store from the xG data.
+
+    Parameters:
+        path - the path of the xG data.
+        directory - the directory of the store.
+    """
+    with profiling.stage("shotStore.readXG") as record:
+        df = pd.read_csv(path)
+        record['rowsOut'] = len(df)
+
+    with profiling.stage("shotStore.writeStore",df):
+        writeStore(df,directory)
+
+    print("Wrote " + str(len(df)) + " shots to " + directory)
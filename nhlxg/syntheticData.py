@@ -0,0 +1,363 @@
+import os
+import numpy as np
+import pandas as pd
+
+#teams used for synthetic games (PHX is kept so the ARI replacement is exercised)
+TEAMS = ['ANA','BOS','BUF','CAR','CBJ','CGY','CHI','COL','DAL','DET','EDM','FLA','L.A','MIN','MTL','N.J',
+         'NSH','NYI','NYR','OTT','PHI','PHX','PIT','S.J','STL','T.B','TOR','VAN','WPG','WSH']
+
+#non shot events and how often they occur relative to each other
+EVENTS = ['FAC','HIT','GIVE','TAKE','BLOCK','ATTEMPT','PENL','STOP','CHL','DELPEN']
+EVENT_PROBS = [0.16,0.18,0.08,0.06,0.10,0.33,0.03,0.04,0.01,0.01]
+
+SHOT_TYPES = ['WRIST SHOT','SNAP SHOT','SLAP SHOT','BACKHAND','TIP-IN','WRAP-AROUND','DEFLECTED']
+SHOT_TYPE_PROBS = [0.45,0.15,0.14,0.12,0.08,0.03,0.03]
+
+#the pbp columns consumed by createTrainingFrame and extractShots
+PBP_COLUMNS = ['Game_Id','Date','Period','Event','Description','Seconds_Elapsed','Strength','Ev_Zone','Type',
+               'Ev_Team','Away_Team','Home_Team','p1_ID',
+               'awayPlayer1_id','awayPlayer2_id','awayPlayer3_id','awayPlayer4_id','awayPlayer5_id','awayPlayer6_id',
+               'homePlayer1_id','homePlayer2_id','homePlayer3_id','homePlayer4_id','homePlayer5_id','homePlayer6_id',
+               'Away_Players','Home_Players','Away_Score','Home_Score','Away_Goalie','Away_Goalie_Id',
+               'Home_Goalie','Home_Goalie_Id','xC','yC']
+
+def getRoster(team):
+    """Get the synthetic skater and goalie IDs of a team.
+
+    Parameters:
+        team - the team abbreviation.
+
+    Returns:
+        skaters - the IDs of the team's skaters.
+        goalie - the ID of the team's goalie.
+    """
+    base = 8470000 + TEAMS.index(team)*100
+    skaters = list(range(base,base+18))
+    goalie = base + 90
+
+    return skaters, goalie
+
+def getZone(x,attackSign):
+    """Get the zone of an event relative to the event team.
+
+    Parameters:
+        x - the x coordinate of the event.
+        attackSign - 1 if the event team attacks the right side of the rink, -1 otherwise.
+
+    Returns:
+        zone - the zone of the event (Off, Def or Neu).
+    """
+    if x*attackSign > 25:
+        zone = 'Off'
+    elif x*attackSign < -25:
+        zone = 'Def'
+    else:
+        zone = 'Neu'
+
+    return zone
+
+def generateGame(rng,gameId,date,home,away,playoffs,eventsPerPeriod):
+    """Generate the pbp rows of a single game.
+
+    Parameters:
+        rng - the numpy random generator.
+        gameId - the Game_Id of the game.
+        date - the date string of the game.
+        home - the home team.
+        away - the away team.
+        playoffs - is the game a playoff game.
+        eventsPerPeriod - the average number of events in a period.
+
+    Returns:
+        rows - a list of lists holding the pbp rows in PBP_COLUMNS order.
+    """
+    homeSkaters, homeGoalie = getRoster(home)
+    awaySkaters, awayGoalie = getRoster(away)
+
+    #regular season games can go to overtime and a shootout, playoff overtime is a full period
+    periods = [1,2,3]
+    if rng.random() < 0.25:
+        periods.append(4)
+        if (not playoffs) and (rng.random() < 0.5):
+            periods.append(5)
+
+    #some games pull the goalie of the trailing team late in the third
+    pullGoalie = rng.random() < 0.3
+
+    rows = []
+    homeScore = 0
+    awayScore = 0
+    for period in periods:
+        length = 300 if ((period == 4) and (not playoffs)) else 1200
+        rows.append(emptyEvent(gameId,date,period,'PSTR',0,home,away,homeScore,awayScore,homeGoalie,awayGoalie))
+
+        #shootouts are a handful of alternating attempts at the same time
+        if period == 5:
+            for j in range(6):
+                isHome = (j % 2) == 0
+                event = 'GOAL' if rng.random() < 0.3 else 'SHOT'
+                rows.append(shotEvent(rng,gameId,date,period,event,0,'5x5',isHome,home,away,homeSkaters,awaySkaters,
+                                      homeGoalie,awayGoalie,homeScore,awayScore,False,False,'Shootout'))
+            continue
+
+        n = max(int(rng.poisson(eventsPerPeriod)),1)
+        times = np.sort(rng.integers(1,length,n))
+        events = rng.choice(EVENTS,n,p=EVENT_PROBS)
+        teams = rng.random(n) < 0.5
+
+        #penalties put a team down a skater for two minutes
+        homePenaltyEnd = -1
+        awayPenaltyEnd = -1
+        for time, event, isHome in zip(times,events,teams):
+            time = int(time)
+            homeSkaterCount = 4 if time < homePenaltyEnd else 5
+            awaySkaterCount = 4 if time < awayPenaltyEnd else 5
+
+            #regular season overtime is 3v3 and a penalty gives the other team a fourth skater
+            if (period == 4) and (not playoffs):
+                homeSkaterCount = 4 if time < awayPenaltyEnd else 3
+                awaySkaterCount = 4 if time < homePenaltyEnd else 3
+
+            #pull the goalie of the trailing team (or the home team when tied) in the last minute of the third
+            homeNet = True
+            awayNet = True
+            if pullGoalie and (period == 3) and (time > length - 60):
+                if homeScore <= awayScore:
+                    homeNet = False
+                    homeSkaterCount = homeSkaterCount + 1
+                else:
+                    awayNet = False
+                    awaySkaterCount = awaySkaterCount + 1
+            strength = str(homeSkaterCount) + "x" + str(awaySkaterCount)
+
+            if event == 'ATTEMPT':
+                #penalty shots are rare attempts taken at even strength
+                penaltyShot = rng.random() < 0.003
+                row = shotEvent(rng,gameId,date,period,None,time,strength,isHome,home,away,homeSkaters,awaySkaters,
+                                homeGoalie if homeNet else None,awayGoalie if awayNet else None,homeScore,awayScore,
+                                penaltyShot,(period % 2) == 0,'')
+                if row[3] == 'GOAL':
+                    if isHome:
+                        homeScore = homeScore + 1
+                    else:
+                        awayScore = awayScore + 1
+                rows.append(row)
+            elif event in ['STOP','DELPEN']:
+                row = emptyEvent(gameId,date,period,event,time,home,away,homeScore,awayScore,
+                                 homeGoalie if homeNet else None,awayGoalie if awayNet else None)
+                row[6] = strength
+                if event == 'DELPEN':
+                    row[9] = home if isHome else away
+                rows.append(row)
+            else:
+                attackSign = 1 if (isHome == ((period % 2) == 1)) else -1
+                x = float(rng.integers(-99,100))
+                y = float(rng.integers(-42,43))
+                team = home if isHome else away
+                skaters = homeSkaters if isHome else awaySkaters
+                row = emptyEvent(gameId,date,period,event,time,home,away,homeScore,awayScore,
+                                 homeGoalie if homeNet else None,awayGoalie if awayNet else None)
+                row[4] = team + " " + event
+                row[6] = strength
+                row[7] = getZone(x,attackSign)
+                row[8] = 'Tripping' if event == 'PENL' else np.nan
+                row[9] = team
+                row[12] = float(rng.choice(skaters))
+                row[33] = x
+                row[34] = y
+                fillSkaters(rng,row,homeSkaters,awaySkaters)
+                rows.append(row)
+
+                if event == 'PENL':
+                    if isHome:
+                        homePenaltyEnd = time + 120
+                    else:
+                        awayPenaltyEnd = time + 120
+
+        rows.append(emptyEvent(gameId,date,period,'PEND',length,home,away,homeScore,awayScore,homeGoalie,awayGoalie))
+
+    rows.append(emptyEvent(gameId,date,periods[-1],'GEND',1200,home,away,homeScore,awayScore,homeGoalie,awayGoalie))
+
+    return rows
+
+def emptyEvent(gameId,date,period,event,time,home,away,homeScore,awayScore,homeGoalie,awayGoalie):
+    """Create a pbp row without a team, player or location.
+
+    Parameters:
+        gameId - the Game_Id of the game.
+        date - the date string of the game.
+        period - the period of the event.
+        event - the event type.
+        time - the seconds elapsed in the period.
+        home - the home team.
+        away - the away team.
+        homeScore - the home score.
+        awayScore - the away score.
+        homeGoalie - the ID of the home goalie or None when the net is empty.
+        awayGoalie - the ID of the away goalie or None when the net is empty.
+
+    Returns:
+        row - a list in PBP_COLUMNS order.
+    """
+    row = [gameId,date,period,event,event,time,'5x5',np.nan,np.nan,np.nan,away,home,np.nan]
+    row = row + [np.nan]*12
+    row = row + [5,5,awayScore,homeScore,
+                 np.nan if awayGoalie is None else "G" + str(awayGoalie),
+                 np.nan if awayGoalie is None else float(awayGoalie),
+                 np.nan if homeGoalie is None else "G" + str(homeGoalie),
+                 np.nan if homeGoalie is None else float(homeGoalie),
+                 np.nan,np.nan]
+
+    return row
+
+def fillSkaters(rng,row,homeSkaters,awaySkaters):
+    """Fill the on-ice player columns of a pbp row.
+
+    Parameters:
+        rng - the numpy random generator.
+        row - the pbp row to update.
+        homeSkaters - the IDs of the home skaters.
+        awaySkaters - the IDs of the away skaters.
+    """
+    strength = row[6]
+    homeCount = int(strength[0])
+    awayCount = int(strength[2])
+    away = rng.choice(awaySkaters,6,replace=False)
+    home = rng.choice(homeSkaters,6,replace=False)
+    for j in range(6):
+        row[13+j] = float(away[j]) if j < awayCount else np.nan
+        row[19+j] = float(home[j]) if j < homeCount else np.nan
+    row[25] = awayCount
+    row[26] = homeCount
+
+def shotEvent(rng,gameId,date,period,event,time,strength,isHome,home,away,homeSkaters,awaySkaters,
+              homeGoalie,awayGoalie,homeScore,awayScore,penaltyShot,flipped,description):
+    """Create a pbp row for a shot attempt.
+
+    Parameters:
+        rng - the numpy random generator.
+        gameId - the Game_Id of the game.
+        date - the date string of the game.
+        period - the period of the event.
+        event - the event type or None to draw it from the shot location.
+        time - the seconds elapsed in the period.
+        strength - the strength string (home x away).
+        isHome - was the shot taken by the home team.
+        home - the home team.
+        away - the away team.
+        homeSkaters - the IDs of the home skaters.
+        awaySkaters - the IDs of the away skaters.
+        homeGoalie - the ID of the home goalie or None when the net is empty.
+        awayGoalie - the ID of the away goalie or None when the net is empty.
+        homeScore - the home score.
+        awayScore - the away score.
+        penaltyShot - is the attempt a penalty shot.
+        flipped - does the home team attack the left side of the rink.
+        description - the prefix of the event description.
+
+    Returns:
+        row - a list in PBP_COLUMNS order.
+    """
+    #shots are taken in the offensive zone of the shooting team
+    attackSign = 1 if (isHome != flipped) else -1
+    x = float(rng.integers(30,99))
+    y = float(rng.integers(-38,39))
+    dist = (((89-x)**2) + (y**2))**(1/2)
+
+    #goal probability falls with distance and rises on an empty net
+    emptyNet = (awayGoalie is None) if isHome else (homeGoalie is None)
+    p = 1/(1 + np.exp(1.0 + 0.07*dist))
+    if emptyNet:
+        p = 0.6
+    if event is None:
+        if rng.random() < p:
+            event = 'GOAL'
+        elif rng.random() < 0.6:
+            event = 'SHOT'
+        else:
+            event = 'MISS'
+
+    team = home if isHome else away
+    skaters = homeSkaters if isHome else awaySkaters
+    row = emptyEvent(gameId,date,period,event,time,home,away,homeScore,awayScore,homeGoalie,awayGoalie)
+    row[4] = ("Penalty Shot, " if penaltyShot else description + " ") + team + " " + event
+    row[6] = strength
+    row[7] = 'Off'
+    row[8] = rng.choice(SHOT_TYPES,p=SHOT_TYPE_PROBS)
+    row[9] = team
+    row[12] = float(rng.choice(skaters))
+    row[33] = x*attackSign
+    row[34] = y*attackSign
+    fillSkaters(rng,row,homeSkaters,awaySkaters)
+
+    return row
+
+def generatePbp(nGames,season=2020,seed=0,eventsPerPeriod=100,playoffShare=0.1):
+    """Generate a seeded synthetic season of pbp data.
+
+    Parameters:
+        nGames - the number of games in the season.
+        season - the year the season started in.
+        seed - the seed of the random generator.
+        eventsPerPeriod - the average number of events in a period.
+        playoffShare - the share of games which are playoff games.
+
+    Returns:
+        pbp - a dataframe with the pbp columns used by the shot data creation.
+    """
+    rng = np.random.default_rng(seed)
+    nPlayoffs = int(nGames*playoffShare)
+    startDate = pd.Timestamp(year=season,month=10,day=5)
+
+    rows = []
+    for i in range(nGames):
+        #playoff Game_Ids start at 30000
+        playoffs = i >= (nGames - nPlayoffs)
+        gameId = (30000 + i) if playoffs else (20001 + i)
+        date = (startDate + pd.Timedelta(days=i//8)).strftime('%Y-%m-%d')
+        home, away = rng.choice(TEAMS,2,replace=False)
+        rows.extend(generateGame(rng,gameId,date,home,away,playoffs,eventsPerPeriod))
+
+    pbp = pd.DataFrame(rows,columns=PBP_COLUMNS)
+
+    return pbp
+
+def generatePlayers(seed=0):
+    """Generate the player info of every synthetic player.
+
+    Parameters:
+        seed - the seed of the random generator.
+
+    Returns:
+        playerFrame - a dataframe with the columns read from NHLInfo.csv.
+    """
+    rng = np.random.default_rng(seed)
+    ids = []
+    positions = []
+    for team in TEAMS:
+        skaters, goalie = getRoster(team)
+        ids = ids + skaters + [goalie]
+        positions = positions + ['C','L','R','D']*4 + ['D','D'] + ['G']
+
+    hands = rng.choice(['L','R'],len(ids),p=[0.6,0.4])
+    playerFrame = pd.DataFrame({'id':ids,'shootsCatches':hands,'position':positions})
+
+    return playerFrame
+
+def writePbp(pbp,directory,season):
+    """Write a synthetic season with the same file name as the scraped pbp files.
+
+    Parameters:
+        pbp - the synthetic pbp dataframe.
+        directory - the directory to write to.
+        season - the year the season started in.
+
+    Returns:
+        path - the path of the written file.
+    """
+    path = os.path.join(directory,"nhl_pbp_" + str(season) + str(season+1) + ".csv")
+
+    #the scraped files have a leading index column which createTrainingFrame removes
+    pbp.to_csv(path)
+
+    return path
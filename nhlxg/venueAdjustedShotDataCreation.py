@@ -0,0 +1,269 @@
+import numpy as np
+import pandas as pd
+from . import profiling
+from .kernels import calculateDistArray
+
+#repeated strings are read as categoricals, they are written back unchanged
+CATEGORY_COLUMNS = ['Team','oppTeam','Event']
+
+def readShots(path):
+    """Read shots with the repeated strings as categoricals.
+
+    Parameters:
+        path - the path of the shots.
+
+    Returns:
+        df - the dataframe of shots.
+    """
+    return pd.read_csv(path,dtype={c: 'category' for c in CATEGORY_COLUMNS})
+
+def getVenueMeans(df,column):
+    """Average a column over the shots for and against each team at its home stadium.
+
+    Parameters:
+        df - the dataframe of shots.
+        column - the column to average.
+
+    Returns:
+        teams - a dictionary of the average of the column at each team's stadium.
+    """
+    #get all teams
+    teams = dict.fromkeys(df.Team.unique(),0)
+
+    #get average of both shots for and against at each stadium
+    for i in df.Team.unique():
+        avg = df[((df['Team'] == i) & (df['isHome'] == 1)) |
+                 ((df['oppTeam'] == i) & (df['isHome'] == 0))][column].mean()
+        teams[i] = avg
+
+    return teams
+
+def subtractVenueMeans(df,column,teams):
+    """Subtract the average of the stadium each shot was taken in from a column.
+
+    Parameters:
+        df - the dataframe of shots.
+        column - the column to adjust.
+        teams - the averages at each team's stadium from getVenueMeans.
+
+    Returns:
+        adjusted - the adjusted column.
+    """
+    home = df['Team'].where(df['isHome'] == 1,df['oppTeam'])
+
+    return df[column] - home.map(teams)
+
+def adjustDist(df):
+    """Adjust shot distance using Ken Krzywicki's approach.
+
+    Parameters:
+        df - the dataframe of all shots.
+
+    Returns:
+        df - the updated dataframe.
+    """
+    #subtract average distance in stadium from distance
+    df['adj'] = subtractVenueMeans(df,'Distance',getVenueMeans(df,'Distance'))
+
+    return df
+
+def adjustY(df):
+    """Adjust Y coordinate using Ken Krzywicki's approach.
+
+    Parameters:
+        df - the dataframe of all shots.
+
+    Returns:
+        df - the updated dataframe.
+    """
+    #subtract average y in stadium from y
+    df['Yadj'] = subtractVenueMeans(df,'y',getVenueMeans(df,'y'))
+
+    return df
+
+def adjustX(df):
+    """Adjust X coordinate using Ken Krzywicki's approach.
+
+    Parameters:
+        df - the dataframe of all shots.
+
+    Returns:
+        df - the updated dataframe.
+    """
+    #subtract average x in stadium from x
+    df['Xadj'] = subtractVenueMeans(df,'x',getVenueMeans(df,'x'))
+
+    return df
+
+#the columns passed to the coordinate adjuster
+ADJUSTER_COLUMNS = ['x','y','Arena','AwayTeam','AwayShot']
+
+#encodings to be used in variables
+VARIABLE_ENCODING = {"ShotType":{"WRIST SHOT":1, "SNAP SHOT":2,"SLAP SHOT":3,"BACKHAND":4,"TIP-IN":5,"WRAP-AROUND":6,"DEFLECTED":7},
+                     "LastEvent":{"HIT":1,"GIVE":2,"SHOT":3,"TAKE":4,"FAC":5,"MISS":6,"CHL":7,"BLOCK": 8,"GOAL":9,"PENL":10,
+                     "PSTR":11,"STOP":12,"EISTR":13,"GEND":14,"PEND":15,"DELPEN":16},
+                     "LastEventZone":{"None":0,"Off":1,"Def":2,"Neu":3}}
+
+def addArenaColumns(df):
+    """Add the arena, away team and away shot features used by the coordinate adjuster.
+
+    Parameters:
+        df - the dataframe of shots, updated in place.
+
+    Returns:
+        df - the updated dataframe.
+    """
+    #create arena, awayTeam, and awayshot features from whole columns
+    isHome = (df['isHome'] == 1).to_numpy()
+    team = df['Team'].astype(str).to_numpy()
+    oppTeam = df['oppTeam'].astype(str).to_numpy()
+
+    df['Arena'] = np.where(isHome,team,oppTeam)
+    df['AwayTeam'] = np.where(isHome,oppTeam,team)
+    df['AwayShot'] = ~isHome
+
+    return df
+
+def adjustShots(df):
+    """Adjust Distances with the use of Shucker's and Curro's method.
+
+    Parameters:
+        df - the dataframe of all shots.
+
+    Returns:
+        shots - the adjusted shot coordinates.
+    """
+
+    from NHLArenaAdjuster import CoordinateAdjuster
+
+    df = addArenaColumns(df)
+
+    #adjust the coordinates
+    ca = CoordinateAdjuster()
+    shots = ca.fit_transform(df[ADJUSTER_COLUMNS])
+
+    return shots
+
+def encodeShots(trainingFrame):
+    """Sort the shots by date, drop those not adjusted and encode the categorical variables.
+
+    The rows are copied once: the filters are combined into one mask and the kept rows are taken
+    in date order, the same order as sorting every shot by date. The encoded columns are
+    replaced one at a time.
+
+    Parameters:
+        trainingFrame - the dataframe of shots output by shotDataCreation.
+
+    Returns:
+        trainingFrame - the encoded dataframe.
+    """
+    trainingFrame['Date'] = pd.to_datetime(trainingFrame['Date'],format='%Y-%m-%d')
+    order = np.argsort(trainingFrame['Date'].to_numpy(),kind='quicksort')
+
+    #do not include shots on empty nets, penalty shots or shots without locations
+    keep = ((trainingFrame['isEmptyNet'] == 0) & (trainingFrame['isPenaltyShot'] == 0) &
+            trainingFrame['x'].notnull() & trainingFrame['y'].notnull()).to_numpy()
+    trainingFrame = trainingFrame.take(order[keep[order]])
+
+    #encode variables
+    for column, encoding in VARIABLE_ENCODING.items():
+        trainingFrame[column] = trainingFrame[column].replace(encoding)
+
+    return trainingFrame
+
+def adjustVenue(trainingFrame,stage=profiling.stage):
+    """Encode the shot data and venue adjust the coordinates and distance.
+
+    Parameters:
+        trainingFrame - the dataframe of all shots output by shotDataCreation.
+        stage - the context manager each step runs in (profiling.stage, or memoryBudget.track
+                through memoryBudget.runBudgeted).
+
+    Returns:
+        trainingFrame - the encoded and adjusted dataframe.
+    """
+    with stage("venueAdjustedShotDataCreation.encodeShots",trainingFrame) as record:
+        trainingFrame = encodeShots(trainingFrame)
+        record['rowsOut'] = len(trainingFrame)
+
+    #adjust with Shucker's and Curro's method
+    with stage("venueAdjustedShotDataCreation.adjustShots",trainingFrame):
+        adjusted = adjustShots(trainingFrame)
+        trainingFrame['AdjX'] = adjusted['xCord'].to_numpy()
+        trainingFrame['AdjY'] = adjusted['yCord'].to_numpy()
+        del adjusted
+        trainingFrame['AdjDist'] = calculateDistArray(trainingFrame['AdjX'],trainingFrame['AdjY'],89,0)
+
+    #adjust with Krzywicki's method
+    with stage("venueAdjustedShotDataCreation.krzywickiAdjust",trainingFrame):
+        trainingFrame = adjustDist(trainingFrame)
+        trainingFrame = adjustX(trainingFrame)
+        trainingFrame = adjustY(trainingFrame)
+
+    return trainingFrame
+
+def fitVenue(trainingFrame):
+    """Fit the venue adjustments once so new shots can be adjusted without refitting.
+
+    Parameters:
+        trainingFrame - the dataframe of all shots output by shotDataCreation.
+
+    Returns:
+        venue - the fitted coordinate adjuster and the stadium averages of Krzywicki's method.
+    """
+    from NHLArenaAdjuster import CoordinateAdjuster
+
+    trainingFrame = addArenaColumns(encodeShots(trainingFrame))
+
+    ca = CoordinateAdjuster()
+    ca.fit(trainingFrame[ADJUSTER_COLUMNS])
+
+    means = {'adj':getVenueMeans(trainingFrame,'Distance'),
+             'Xadj':getVenueMeans(trainingFrame,'x'),
+             'Yadj':getVenueMeans(trainingFrame,'y')}
+
+    return {'adjuster':ca,'means':means}
+
+def applyVenue(trainingFrame,venue):
+    """Encode and venue adjust shots with adjustments fitted by fitVenue.
+
+    Parameters:
+        trainingFrame - the dataframe of shots output by shotDataCreation.
+        venue - the fitted adjustments.
+
+    Returns:
+        trainingFrame - the encoded and adjusted dataframe.
+    """
+    trainingFrame = addArenaColumns(encodeShots(trainingFrame))
+    if len(trainingFrame) == 0:
+        return trainingFrame
+
+    adjusted = venue['adjuster'].transform(trainingFrame[ADJUSTER_COLUMNS])
+    trainingFrame['AdjX'] = adjusted['xCord'].values
+    trainingFrame['AdjY'] = adjusted['yCord'].values
+    trainingFrame['AdjDist'] = calculateDistArray(trainingFrame['AdjX'],trainingFrame['AdjY'],89,0)
+
+    for name, column in [('adj','Distance'),('Xadj','x'),('Yadj','y')]:
+        trainingFrame[name] = subtractVenueMeans(trainingFrame,column,venue['means'][name])
+
+    return trainingFrame
+
+def main(stage=profiling.stage):
+    """Read in shot data and venue adjust the coordinates and distance.
+
+    Parameters:
+        stage - the context manager each step runs in (profiling.stage by default).
+    """
+    #Read in the data
+    with stage("venueAdjustedShotDataCreation.readShots") as record:
+        trainingFrame = readShots("Raw Data/shotData/NHLShotData2010-2021.csv")
+        record['rowsOut'] = len(trainingFrame)
+
+    trainingFrame = adjustVenue(trainingFrame,stage)
+
+    with stage("venueAdjustedShotDataCreation.writeVenueAdjusted",trainingFrame):
+        trainingFrame.to_csv("Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv",index=False)
+
+if __name__ == "__main__":
+    main()
+
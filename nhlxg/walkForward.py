@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .xGModelCreation import PARAMS, getRows
+from .outOfCoreTraining import VENUE_PATH, readChunks
+from .metricsStore import STRENGTHS, calculateLLAUC
+from .reports import writeJson
+from .sharedFeatures import writeMatrix, attachMatrix
+
+#the prepared features shared by every season model, the xG of the season models and the report of the backtest
+CACHE_DIR = "xG Data/features/walkForward"
+XG_PATH = "xG Data/features/walkForward/xG.npy"
+REPORT_PATH = "xG Data/walkForward.json"
+
+#the columns kept next to the feature matrix
+LABEL_COLUMNS = {'Outcome':np.int8,'Season':np.int16,'Strength':np.int8}
+
+def buildFeatureCache(path=VENUE_PATH,directory=CACHE_DIR,chunkSize=100000):
+    """Prepare the model features of every season once and write them to disk.
+
+    The features are appended chunk by chunk to a float32 shared matrix that every season model
+    attaches to, so the shots are parsed and encoded once and no process holds its own copy.
+
+    Parameters:
+        path - the path of the venue adjusted shots.
+        directory - the directory of the cache.
+        chunkSize - the shots read at a time.
+
+    Returns:
+        meta - the rows, features and source of the cache.
+    """
+    os.makedirs(directory,exist_ok=True)
+
+    features = []
+
+    def getChunks():
+        for frame, writingFrame in readChunks(path,chunkSize,lastSeason=None):
+            if not features:
+                features.extend(c for c in frame.columns if c != 'Outcome')
+            labels = {name: writingFrame[name].to_numpy().astype(dtype) for name, dtype in LABEL_COLUMNS.items()}
+
+            #the position of every row in the venue adjusted shots, chunks keep numbering the rows
+            labels['Row'] = writingFrame.index.to_numpy().astype(np.int64)
+            yield frame[features].to_numpy(dtype=np.float32), labels
+
+    handle = writeMatrix(os.path.join(directory,"features.mat"),getChunks(),features)
+
+    stat = os.stat(path)
+    meta = dict(handle,source=path,size=stat.st_size,mtime=stat.st_mtime_ns)
+    with open(os.path.join(directory,"meta.json"),'w') as f:
+        json.dump(meta,f,indent=2)
+
+    return meta
+
+def isCacheCurrent(path=VENUE_PATH,directory=CACHE_DIR):
+    """Check if the cache was built from the current venue adjusted shots.
+
+    Parameters:
+        path - the path of the venue adjusted shots.
+        directory - the directory of the cache.
+
+    Returns:
+        current - True if the cache can be used.
+    """
+    metaPath = os.path.join(directory,"meta.json")
+    if not os.path.exists(metaPath):
+        return False
+
+    with open(metaPath) as f:
+        meta = json.load(f)
+    stat = os.stat(path)
+
+    #caches written before the shared matrix have no label columns, and older ones no row positions
+    return ('columns' in meta) and ('Row' in meta['columns']) and (meta['source'] == path) and (meta['size'] == stat.st_size) and (meta['mtime'] == stat.st_mtime_ns)
+
+def openCache(directory=CACHE_DIR):
+    """Attach to the feature cache read-only.
+
+    Parameters:
+        directory - the directory of the cache.
+
+    Returns:
+        cache - a dictionary with the feature matrix X, the label columns and the meta data.
+    """
+    with open(os.path.join(directory,"meta.json")) as f:
+        meta = json.load(f)
+
+    return dict(attachMatrix(meta),meta=meta)
+
+def trainSeason(directory,season,params):
+    """Train on every season before a season and score that season, run in a worker process.
+
+    Parameters:
+        directory - the directory of the cache.
+        season - the season scored.
+        params - the lightgbm parameters.
+
+    Returns:
+        result - the rows, time and training seasons of the season model.
+    """
+    import lightgbm as lgb
+
+    start = perf_counter()
+    cache = openCache(directory)
+    seasons = np.asarray(cache['Season'])
+    isTrain = seasons < season
+    isTest = seasons == season
+
+    #the shots are in season order, so the rows of this model are views of the shared matrix
+    #that lightgbm reads in place (indexing scattered rows would copy them)
+    trainIdx = getRows(isTrain)
+    testIdx = getRows(isTest)
+    dataset = lgb.Dataset(cache['X'][trainIdx],label=cache['Outcome'][trainIdx],feature_name=cache['meta']['features'],params=params)
+    booster = lgb.train(params,dataset,num_boost_round=100)
+    xG = booster.predict(cache['X'][testIdx])
+
+    #each season writes its own rows of the shared output
+    out = np.load(os.path.join(directory,"xG.npy"),mmap_mode='r+')
+    out[testIdx] = xG
+    out.flush()
+
+    return {'season':int(season),'trainSeasons':sorted(int(s) for s in np.unique(seasons[isTrain])),
+            'trainRows':int(isTrain.sum()),'testRows':int(isTest.sum()),'seconds':perf_counter() - start}
+
+def loadXG(rows,path=VENUE_PATH,directory=CACHE_DIR):
+    """Get the xG the season models of the last backtest gave the venue adjusted shots.
+
+    Every shot is scored by a model trained only on the seasons before its own.
+
+    Parameters:
+        rows - the number of venue adjusted shots.
+        path - the path of the venue adjusted shots.
+        directory - the directory of the cache.
+
+    Returns:
+        xG - the xG of every venue adjusted shot, NaN for shots no season model scored (the
+             first seasons and the shots the model does not use).
+    """
+    xGPath = os.path.join(directory,"xG.npy")
+    if (not isCacheCurrent(path,directory)) or (not os.path.exists(xGPath)) or \
+       (os.stat(xGPath).st_mtime_ns < os.stat(os.path.join(directory,"meta.json")).st_mtime_ns):
+        raise FileNotFoundError("no backtest of the current venue adjusted shots, run `python -m nhlxg backtest` first")
+
+    cache = openCache(directory)
+    xG = np.full(rows,np.nan)
+    xG[np.asarray(cache['Row'])] = np.load(xGPath)
+
+    return xG
+
+def getSeasonMetrics(df):
+    """Calculate the log loss and auc of each strength, leaving out strengths with a single outcome.
+
+    Parameters:
+        df - the dataframe of a season's shots with xG.
+
+    Returns:
+        metrics - a dictionary of strength name to [log loss, auc].
+    """
+    metrics = {}
+    for name, strength in STRENGTHS.items():
+        try:
+            metrics[name] = list(calculateLLAUC(df,strength))
+        except ValueError:
+            metrics[name] = [None,None]
+
+    return metrics
+
+def runWalkForward(directory=CACHE_DIR,workers=4,minTrainSeasons=1,params=PARAMS):
+    """Score every season with a model trained on the seasons before it, training the models concurrently.
+
+    Parameters:
+        directory - the directory of the cache.
+        workers - the season models trained at once.
+        minTrainSeasons - the fewest earlier seasons a season model is trained on.
+        params - the lightgbm parameters.
+
+    Returns:
+        report - the training rows, time and strength metrics of every season.
+    """
+    cache = openCache(directory)
+    seasons = np.unique(cache['Season'])
+    targets = [int(s) for s in seasons[minTrainSeasons:]]
+
+    #the workers share the machine, so each model gets its share of the threads
+    params = dict(params,num_threads=max(1,(os.cpu_count() or 1)//workers))
+
+    out = np.lib.format.open_memmap(os.path.join(directory,"xG.npy"),mode='w+',dtype=np.float64,shape=(cache['meta']['rows'],))
+    out[:] = np.nan
+    out.flush()
+    del out
+
+    start = perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(trainSeason,directory,season,params) for season in targets]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['season']] = result
+            print("Season " + str(result['season']) + " scored in {:.1f}s".format(result['seconds']))
+    seconds = perf_counter() - start
+
+    df = pd.DataFrame({name: np.asarray(cache[name]) for name in LABEL_COLUMNS})
+    df['xG'] = np.load(os.path.join(directory,"xG.npy"))
+
+    report = {'workers':workers,'seconds':seconds,'created':datetime.now().isoformat(timespec='seconds'),'seasons':{}}
+    for season in targets:
+        report['seasons'][str(season)] = dict(results[season],metrics=getSeasonMetrics(df[df['Season'] == season]))
+
+    return report
+
+def printReport(report):
+    """Print the log loss and auc of every season of a walk-forward backtest.
+
+    Parameters:
+        report - the report returned by runWalkForward.
+    """
+    print("{:<8}{:>10}{:>9}".format("Season","Train","Secs") + "".join("{:>16}".format(name + " LL/AUC") for name in STRENGTHS))
+    for season, result in report['seasons'].items():
+        cells = ["{:>16}".format("-" if ll is None else "{:.4f}/{:.3f}".format(ll,auc)) for ll, auc in result['metrics'].values()]
+        print("{:<8}{:>10}{:>9.1f}".format(season,result['trainRows'],result['seconds']) + "".join(cells))
+    print("Trained " + str(len(report['seasons'])) + " season models with " + str(report['workers']) +
+          " workers in {:.1f}s".format(report['seconds']))
+
+def main(argv=None):
+    """Run the walk-forward backtest from the command line."""
+    parser = argparse.ArgumentParser(description="Score every season with a model trained on the seasons before it.")
+    parser.add_argument('--workers',type=int,default=4,help="season models trained at once")
+    parser.add_argument('--min-train-seasons',type=int,default=1,help="fewest earlier seasons a model is trained on")
+    parser.add_argument('--chunk-size',type=int,default=100000,help="shots read at a time when building the feature cache")
+    parser.add_argument('--rebuild',action='store_true',help="rebuild the feature cache")
+    parser.add_argument('--output',default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.rebuild or not isCacheCurrent():
+        with profiling.stage("walkForward.buildFeatureCache") as record:
+            record['rowsOut'] = buildFeatureCache(chunkSize=args.chunk_size)['rows']
+
+    with profiling.stage("walkForward.runWalkForward"):
+        report = runWalkForward(workers=args.workers,minTrainSeasons=args.min_train_seasons)
+
+    printReport(report)
+    writeJson(report,args.output)
+    print("Report written to " + args.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from .kernels import FLIPPED_ZONES
+
+#the default lookback of the window features, in events and in seconds
+WINDOW_EVENTS = 10
+WINDOW_SECONDS = 10
+
+#the events counted as shot attempts
+ATTEMPT_EVENTS = ['SHOT','MISS','BLOCK','GOAL']
+
+#the counts of each team's events in a window, named relative to the team of the current event
+TEAM_EVENTS = {'Attempts':ATTEMPT_EVENTS,'Takeaways':['TAKE'],'Giveaways':['GIVE']}
+
+def getGroups(gameIds,periods):
+    """Number the periods of each game in the order they appear.
+
+    Parameters:
+        gameIds - the game ID of every event.
+        periods - the period of every event.
+
+    Returns:
+        groupCode - the increasing code of the game and period of every event.
+        groupStart - the position of the first event of the game and period of every event.
+    """
+    gameIds = np.asarray(gameIds)
+    periods = np.asarray(periods)
+
+    isNew = np.ones(len(gameIds),dtype=bool)
+    isNew[1:] = (gameIds[1:] != gameIds[:-1]) | (periods[1:] != periods[:-1])
+    groupCode = np.cumsum(isNew) - 1
+    groupStart = np.flatnonzero(isNew)[groupCode]
+
+    return groupCode, groupStart
+
+def getWindowStarts(groupCode,groupStart,seconds,events,windowSeconds):
+    """Find the first event of the event and time windows ending at every event.
+
+    Parameters:
+        groupCode - the increasing code of the game and period of every event.
+        groupStart - the position of the first event of the game and period of every event.
+        seconds - the seconds elapsed in the period of every event.
+        events - the events looked back over.
+        windowSeconds - the seconds looked back over.
+
+    Returns:
+        eventStart - the first of the last events before every event in its game and period.
+        timeStart - the first event of its game and period at most windowSeconds earlier.
+    """
+    position = np.arange(len(groupCode))
+    eventStart = np.maximum(groupStart,position - events)
+
+    #a period is at most 1200 seconds so every game and period gets its own range of keys,
+    #and the running maximum keeps the keys sorted if the clock of a period ever steps back
+    seconds = np.nan_to_num(np.asarray(seconds,dtype=np.float64))
+    key = np.maximum.accumulate(groupCode*10000 + seconds)
+    timeStart = np.searchsorted(key,key - windowSeconds,side='left')
+
+    return eventStart, timeStart
+
+def windowSum(values,starts):
+    """Sum the values of the events from each start up to but not including each event.
+
+    Parameters:
+        values - the value of every event.
+        starts - the first event of the window of every event.
+
+    Returns:
+        sums - the sum over the window of every event.
+    """
+    totals = np.concatenate([[0],np.cumsum(values)])
+
+    return totals[:-1] - totals[starts]
+
+def getHomeZones(df):
+    """Get the zone of every event from the home team's point of view.
+
+    Parameters:
+        df - the dataframe of pbp events.
+
+    Returns:
+        zones - the zone of every event relative to the home team.
+    """
+    isHome = (df['Ev_Team'] == df['Home_Team']).to_numpy()
+
+    return np.where(isHome,df['Ev_Zone'],df['Ev_Zone'].map(FLIPPED_ZONES))
+
+def createWindowFeatures(df,events=WINDOW_EVENTS,seconds=WINDOW_SECONDS):
+    """Count what happened in the events leading up to every event of a season.
+
+    Every count looks back over the earlier events of the same game and period, once over the
+    last events and once over the last seconds. The season is handled in one pass of running sums,
+    so the cost grows with the number of events and not with the size of the windows.
+
+    Parameters:
+        df - the dataframe of pbp events in the order they happened.
+        events - the events looked back over.
+        seconds - the seconds looked back over.
+
+    Returns:
+        windowFrame - a dataframe with the window features of every event, on the index of df.
+    """
+    groupCode, groupStart = getGroups(df['Game_Id'],df['Period'])
+    eventStart, timeStart = getWindowStarts(groupCode,groupStart,df['Seconds_Elapsed'],events,seconds)
+    windows = {'Last' + str(events) + 'Events':eventStart,'Last' + str(seconds) + 'Seconds':timeStart}
+
+    byHome = (df['Ev_Team'] == df['Home_Team']).to_numpy()
+    byAway = (df['Ev_Team'] == df['Away_Team']).to_numpy()
+
+    #a zone change is an event in another zone than the event before it in the same period
+    zones = pd.Series(getHomeZones(df)).to_numpy()
+    hasZone = pd.notnull(zones)
+    isChange = np.zeros(len(df),dtype=bool)
+    isChange[1:] = hasZone[1:] & hasZone[:-1] & (zones[1:] != zones[:-1]) & (groupCode[1:] == groupCode[:-1])
+
+    features = {}
+    for name, types in TEAM_EVENTS.items():
+        isType = df['Event'].isin(types).to_numpy()
+        for window, starts in windows.items():
+            home = windowSum(isType & byHome,starts)
+            away = windowSum(isType & byAway,starts)
+            features[name + 'For' + window] = np.where(byHome,home,away)
+            features[name + 'Against' + window] = np.where(byHome,away,home)
+
+    for window, starts in windows.items():
+        features['ZoneChanges' + window] = windowSum(isChange,starts)
+
+    return pd.DataFrame(features,index=df.index)
@@ -0,0 +1,667 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+from time import perf_counter
+
+import pandas as pd
+
+from . import profiling
+from . import shotDataCreation
+
+#the shared directory of the queue, every host must see it at the same relative path
+QUEUE_DIR = "Queue"
+
+#the games extracted by one claim
+GAMES_PER_SHARD = 100
+
+#a lease not renewed for this long belongs to a crashed worker and can be reclaimed
+LEASE_SECONDS = 600
+
+#the most the clocks of the hosts may differ by, a lease is only reclaimed this long after it expires
+CLOCK_SKEW_SECONDS = 30
+
+#the seconds a worker waits before looking again for shards to reclaim
+POLL_SECONDS = 5
+
+#the player info read by the extraction
+INFO_PATH = "Raw Data/info/NHLInfo.csv"
+
+def getQueuePaths(directory=QUEUE_DIR):
+    """Get the paths of the files of the queue.
+
+    Parameters:
+        directory - the shared directory of the queue.
+
+    Returns:
+        paths - a dictionary with the manifest and the lease, done, shard and log directories.
+    """
+    return {'manifest':os.path.join(directory,"manifest.json"),
+            'pbp':os.path.join(directory,"pbp"),
+            'leases':os.path.join(directory,"leases"),
+            'done':os.path.join(directory,"done"),
+            'shards':os.path.join(directory,"shards"),
+            'logs':os.path.join(directory,"logs")}
+
+def writeAtomic(path,text):
+    """Write a file so readers see either the old or the new contents.
+
+    Parameters:
+        path - the path of the file.
+        text - the contents.
+    """
+    tmpPath = path + "." + socket.gethostname() + "." + str(os.getpid()) + ".tmp"
+    with open(tmpPath,'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpPath,path)
+
+def readJson(path):
+    """Read a json file, returning None if it does not exist."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def getGameIds(pbp,season):
+    """Make the game IDs of pbp data unique the same way as shotDataCreation.prepareTrainingFrame.
+
+    Parameters:
+        pbp - the dataframe of pbp data.
+        season - the season of the pbp data.
+
+    Returns:
+        gameIds - the unique integer game ID of every row.
+    """
+    return (season + pbp['Game_Id'].astype(str)).astype(int)
+
+def splitSeason(pbpFile,directory,gamesPerShard=GAMES_PER_SHARD):
+    """Split the pbp file of a season into shards of consecutive games, each written to its own file.
+
+    The rows are pickled so a shard reads back with the values and types of the whole season,
+    and a worker reads only the games of its shard. Every host must run the same pandas version.
+
+    Parameters:
+        pbpFile - the pbp file of the season.
+        directory - the shared directory of the queue.
+        gamesPerShard - the games in each shard.
+
+    Returns:
+        shards - a list of the shards of the season.
+    """
+    season = shotDataCreation.getSeasonString(pbpFile)
+    pbp = pd.read_csv(pbpFile)
+    gameIds = getGameIds(pbp,season)
+    games = sorted(gameIds.unique())
+
+    shards = []
+    for k in range(0,len(games),gamesPerShard):
+        block = games[k:k + gamesPerShard]
+        shard = {'id':season + "-" + str(k//gamesPerShard).zfill(3),'season':season,'pbp':pbpFile,
+                 'firstGame':int(block[0]),'lastGame':int(block[-1]),'games':len(block)}
+        shard['pbpShard'] = os.path.join(getQueuePaths(directory)['pbp'],shard['id'] + ".pkl")
+        pbp[gameIds.between(shard['firstGame'],shard['lastGame']).to_numpy()].to_pickle(shard['pbpShard'])
+        shards.append(shard)
+
+    return shards
+
+def buildManifest(directory,pbpFiles=shotDataCreation.PBP_FILES,gamesPerShard=GAMES_PER_SHARD,window=None):
+    """Split the pbp files into shards of consecutive games.
+
+    Parameters:
+        directory - the shared directory of the queue, the games of each shard are written to it.
+        pbpFiles - the pbp files, one per season.
+        gamesPerShard - the games in each shard.
+        window - the (events, seconds) of the lookback window features (none added if None).
+
+    Returns:
+        manifest - a dictionary with the shards in the order they are merged.
+    """
+    shards = []
+    for pbpFile in pbpFiles:
+        shards = shards + splitSeason(pbpFile,directory,gamesPerShard)
+
+    return {'pbpFiles':list(pbpFiles),'gamesPerShard':gamesPerShard,'window':window,'shards':shards,
+            'created':datetime.now().isoformat(timespec='seconds')}
+
+def initQueue(directory=QUEUE_DIR,pbpFiles=shotDataCreation.PBP_FILES,gamesPerShard=GAMES_PER_SHARD,window=None):
+    """Create the queue directory and its manifest, clearing any earlier queue.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        pbpFiles - the pbp files, one per season.
+        gamesPerShard - the games in each shard.
+        window - the (events, seconds) of the lookback window features (none added if None).
+
+    Returns:
+        manifest - the manifest written.
+    """
+    paths = getQueuePaths(directory)
+    for name in ['pbp','leases','done','shards','logs']:
+        shutil.rmtree(paths[name],ignore_errors=True)
+        os.makedirs(paths[name])
+
+    manifest = buildManifest(directory,pbpFiles,gamesPerShard,window)
+    writeAtomic(paths['manifest'],json.dumps(manifest,indent=2))
+
+    return manifest
+
+def createExclusive(path,contents):
+    """Create a json file, failing if it already exists.
+
+    Parameters:
+        path - the path of the file.
+        contents - the dictionary written.
+
+    Returns:
+        created - True if this call created the file.
+    """
+    try:
+        fd = os.open(path,os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+
+    with os.fdopen(fd,'w') as f:
+        json.dump(contents,f)
+
+    return True
+
+def newLease(worker,leaseSeconds):
+    """Describe a new lease of a worker.
+
+    The expiry is kept in the lease, written by the clock of the host holding it, so expiry does
+    not depend on the modification times kept by the shared file system.
+
+    Parameters:
+        worker - the name of the worker claiming the shard.
+        leaseSeconds - the seconds the lease lasts without renewal.
+
+    Returns:
+        lease - a dictionary with the token, worker, claim time and expiry of the lease.
+    """
+    return {'token':worker + "-" + str(time.time_ns()),'worker':worker,'claimed':datetime.now().isoformat(timespec='seconds'),
+            'expires':time.time() + leaseSeconds}
+
+def createLease(path,worker,leaseSeconds=LEASE_SECONDS):
+    """Create a lease file, failing if it already exists.
+
+    Parameters:
+        path - the path of the lease.
+        worker - the name of the worker claiming the shard.
+        leaseSeconds - the seconds the lease lasts without renewal.
+
+    Returns:
+        token - the token of the lease, or None if the shard is already leased.
+    """
+    lease = newLease(worker,leaseSeconds)
+    if not createExclusive(path,lease):
+        return None
+
+    return lease['token']
+
+def getExpiry(path,leaseSeconds):
+    """Get when a lease or reclaim marker expires.
+
+    Parameters:
+        path - the path of the lease or marker.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        expires - the expiry from the file, from its modification time if a crash left it
+                  without contents, or None if it does not exist.
+    """
+    try:
+        return float(readJson(path)['expires'])
+    except (TypeError,KeyError,ValueError):
+        pass
+
+    try:
+        return os.stat(path).st_mtime + leaseSeconds
+    except FileNotFoundError:
+        return None
+
+def isExpired(path,leaseSeconds):
+    """Check if a lease or reclaim marker has not been renewed in time.
+
+    Parameters:
+        path - the path of the lease or marker.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        expired - True if the file exists and expired more than CLOCK_SKEW_SECONDS ago.
+    """
+    expires = getExpiry(path,leaseSeconds)
+
+    return (expires is not None) and (time.time() > expires + CLOCK_SKEW_SECONDS)
+
+def getLeaseToken(path):
+    """Read the token of a lease.
+
+    Parameters:
+        path - the path of the lease.
+
+    Returns:
+        token - the token, or None if there is no lease or it is still being written.
+    """
+    try:
+        return readJson(path)['token']
+    except (TypeError,ValueError):
+        return None
+
+def getMarkerPrefix(path,token):
+    """Get the start of the paths of the reclaim markers of a lease token.
+
+    Parameters:
+        path - the path of the lease.
+        token - the token of the lease, None if a crash left the lease without contents.
+
+    Returns:
+        prefix - the marker paths are the prefix, a generation and ".reclaim".
+    """
+    return path + "." + hashlib.sha256(str(token).encode()).hexdigest()[:16]
+
+def removeMarkers(path,token):
+    """Remove every reclaim marker of a lease token, once the lease no longer has that token.
+
+    Parameters:
+        path - the path of the lease.
+        token - the old token of the lease.
+    """
+    for markerPath in glob.glob(glob.escape(getMarkerPrefix(path,token)) + ".*.reclaim"):
+        try:
+            os.remove(markerPath)
+        except FileNotFoundError:
+            pass
+
+def reclaimLease(path,worker,leaseSeconds):
+    """Take over an expired lease.
+
+    Reclaiming an expired token first creates a marker named after that token, which only one
+    worker can create. The winner takes over only if the lease still has the expired token, and
+    replaces it atomically, so a lease that was reclaimed or renewed in the meantime is never
+    touched and two workers can never both reclaim the same lease. A marker expires like a lease,
+    so when a reclaiming worker crashes, the next one creates a marker of the next generation.
+
+    Parameters:
+        path - the path of the lease.
+        worker - the name of the worker reclaiming the shard.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        token - the token of the new lease, or None if the lease could not be reclaimed.
+    """
+    if not os.path.exists(path):
+        return None
+    expiredToken = getLeaseToken(path)
+    prefix = getMarkerPrefix(path,expiredToken)
+
+    generation = 0
+    while not createExclusive(prefix + "." + str(generation) + ".reclaim",{'worker':worker,'expires':time.time() + leaseSeconds}):
+        #another worker is reclaiming the lease, unless its marker expired
+        if not isExpired(prefix + "." + str(generation) + ".reclaim",leaseSeconds):
+            return None
+        generation = generation + 1
+
+    try:
+        #another worker reclaimed the lease, or its owner renewed it, since it was read
+        if (getLeaseToken(path) != expiredToken) or (not isExpired(path,leaseSeconds)):
+            return None
+
+        lease = newLease(worker,leaseSeconds)
+        writeAtomic(path,json.dumps(lease))
+
+        return lease['token']
+    finally:
+        #a worker reading the same expired token later finds the new token and gives up, and a
+        #renewed lease starts again from the first generation when it next expires
+        removeMarkers(path,expiredToken)
+
+def releaseLease(path,token):
+    """Remove a lease, but only if it still has the token given when it was claimed.
+
+    The lease is first renamed aside, which only one worker can do, and its token is checked
+    there. A lease that another worker took over in the meantime is linked back into place.
+
+    Parameters:
+        path - the path of the lease.
+        token - the token of the lease.
+
+    Returns:
+        released - True if the lease was held and has been removed.
+    """
+    releasePath = getMarkerPrefix(path,token) + ".release"
+    try:
+        os.rename(path,releasePath)
+    except FileNotFoundError:
+        return False
+
+    released = getLeaseToken(releasePath) == token
+    if not released:
+        #a lease created since the rename is newer still and is kept
+        try:
+            os.link(releasePath,path)
+        except FileExistsError:
+            pass
+    os.remove(releasePath)
+    removeMarkers(path,token)
+
+    return released
+
+def ownsLease(path,token):
+    """Check if a lease still has the token given when it was claimed.
+
+    Parameters:
+        path - the path of the lease.
+        token - the token of the lease.
+
+    Returns:
+        owned - True if the lease is still held.
+    """
+    return getLeaseToken(path) == token
+
+def claimShard(directory,worker,leaseSeconds=LEASE_SECONDS):
+    """Claim the first shard that is neither done nor leased by a live worker.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        worker - the name of the worker.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        shard - the claimed shard, or None if no shard could be claimed.
+        token - the token of the lease.
+        remaining - the shards not yet done.
+    """
+    paths = getQueuePaths(directory)
+    manifest = readJson(paths['manifest'])
+
+    remaining = 0
+    for shard in manifest['shards']:
+        if os.path.exists(os.path.join(paths['done'],shard['id'] + ".json")):
+            continue
+        remaining = remaining + 1
+
+        leasePath = os.path.join(paths['leases'],shard['id'] + ".lease")
+        token = createLease(leasePath,worker,leaseSeconds)
+        if (token is None) and isExpired(leasePath,leaseSeconds):
+            token = reclaimLease(leasePath,worker,leaseSeconds)
+
+        #the shard may have been finished while it was being claimed
+        if (token is not None) and os.path.exists(os.path.join(paths['done'],shard['id'] + ".json")):
+            releaseLease(leasePath,token)
+            token = None
+
+        if token is not None:
+            return shard, token, remaining
+
+    return None, None, remaining
+
+def renewLease(path,token,stop,leaseSeconds):
+    """Renew a lease until the shard is finished, run in a thread.
+
+    Each renewal moves the expiry in the lease forward. A lease that has already expired may be
+    being reclaimed, so it is never written again and the worker's output is discarded.
+
+    Parameters:
+        path - the path of the lease.
+        token - the token of the lease.
+        stop - the event set when the shard is finished.
+        leaseSeconds - the seconds a lease lasts without renewal.
+    """
+    while not stop.wait(leaseSeconds/3):
+        try:
+            lease = readJson(path)
+        except ValueError:
+            return
+        if (lease is None) or (lease.get('token') != token) or (time.time() > lease['expires']):
+            return
+
+        lease['expires'] = time.time() + leaseSeconds
+        writeAtomic(path,json.dumps(lease))
+
+def extractShard(shard,playerFrame,window=None):
+    """Extract the shots of the games of a shard.
+
+    Parameters:
+        shard - the shard from the manifest.
+        playerFrame - the dataframe of player info.
+        window - the (events, seconds) of the lookback window features (none added if None).
+
+    Returns:
+        shots - the dataframe of shots.
+    """
+    #only the games of the shard are read, split from the season by initQueue
+    trainingFrame = shotDataCreation.prepareTrainingFrame(pd.read_pickle(shard['pbpShard']),shard['season'])
+
+    return shotDataCreation.extractShots(trainingFrame.reset_index(drop=True),playerFrame,window)
+
+def processShard(directory,shard,token,worker,playerFrame,window=None,leaseSeconds=LEASE_SECONDS):
+    """Extract a claimed shard and commit its output.
+
+    The shots are written to a temporary file and renamed into place, then the shard is marked
+    done. A worker whose lease was reclaimed while it ran discards its output.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        shard - the claimed shard.
+        token - the token of the lease.
+        worker - the name of the worker.
+        playerFrame - the dataframe of player info.
+        window - the (events, seconds) of the lookback window features (none added if None).
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        committed - True if the output was committed.
+    """
+    paths = getQueuePaths(directory)
+    leasePath = os.path.join(paths['leases'],shard['id'] + ".lease")
+    outPath = os.path.join(paths['shards'],shard['id'] + ".csv")
+
+    stop = threading.Event()
+    renewer = threading.Thread(target=renewLease,args=(leasePath,token,stop,leaseSeconds),daemon=True)
+    renewer.start()
+    try:
+        start = perf_counter()
+        shots = extractShard(shard,playerFrame,window)
+        seconds = perf_counter() - start
+    finally:
+        stop.set()
+        renewer.join()
+
+    if not ownsLease(leasePath,token):
+        return False
+
+    tmpPath = outPath + "." + worker + ".tmp"
+    shots.to_csv(tmpPath,index=False)
+    os.replace(tmpPath,outPath)
+
+    done = {'id':shard['id'],'worker':worker,'rows':len(shots),'seconds':seconds,'finished':datetime.now().isoformat(timespec='seconds')}
+    writeAtomic(os.path.join(paths['done'],shard['id'] + ".json"),json.dumps(done))
+    releaseLease(leasePath,token)
+
+    return True
+
+def runWorker(directory=QUEUE_DIR,worker=None,leaseSeconds=LEASE_SECONDS,pollSeconds=POLL_SECONDS):
+    """Claim and extract shards until every shard of the queue is done.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        worker - the name of the worker (the host and process ID by default).
+        leaseSeconds - the seconds a lease lasts without renewal.
+        pollSeconds - the seconds waited when every remaining shard is leased.
+
+    Returns:
+        done - the IDs of the shards this worker committed.
+    """
+    worker = worker or socket.gethostname() + "-" + str(os.getpid())
+    manifest = readJson(getQueuePaths(directory)['manifest'])
+    window = manifest['window']
+    playerFrame = pd.read_csv(INFO_PATH)
+
+    done = []
+    while True:
+        shard, token, remaining = claimShard(directory,worker,leaseSeconds)
+        if remaining == 0:
+            break
+        if shard is None:
+            #every remaining shard is leased, wait in case a lease expires
+            time.sleep(pollSeconds)
+            continue
+
+        with profiling.stage("workQueue.processShard"):
+            if processShard(directory,shard,token,worker,playerFrame,window,leaseSeconds):
+                done.append(shard['id'])
+
+    return done
+
+def runLocalWorker(directory,worker,leaseSeconds):
+    """Run a worker in a local process with its output written to a log.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        worker - the name of the worker.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        done - the IDs of the shards this worker committed.
+    """
+    logPath = os.path.join(getQueuePaths(directory)['logs'],worker + ".log")
+    with open(logPath,'w') as log, redirect_stdout(log), redirect_stderr(log):
+        return runWorker(directory,worker,leaseSeconds)
+
+def runLocal(directory=QUEUE_DIR,workers=4,leaseSeconds=LEASE_SECONDS):
+    """Run workers in local processes standing in for worker hosts.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        workers - the number of worker processes.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        done - a dictionary of worker name to the IDs of the shards it committed.
+    """
+    host = socket.gethostname()
+    names = [host + "-local" + str(i) for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {name: executor.submit(runLocalWorker,directory,name,leaseSeconds) for name in names}
+
+        return {name: future.result() for name, future in futures.items()}
+
+def getStatus(directory=QUEUE_DIR,leaseSeconds=LEASE_SECONDS):
+    """Count the shards of the queue by state.
+
+    Parameters:
+        directory - the shared directory of the queue.
+        leaseSeconds - the seconds a lease lasts without renewal.
+
+    Returns:
+        status - a dictionary of state (done, leased, expired, pending) to shard IDs.
+    """
+    paths = getQueuePaths(directory)
+    status = {'done':[],'leased':[],'expired':[],'pending':[]}
+    for shard in readJson(paths['manifest'])['shards']:
+        leasePath = os.path.join(paths['leases'],shard['id'] + ".lease")
+        if os.path.exists(os.path.join(paths['done'],shard['id'] + ".json")):
+            status['done'].append(shard['id'])
+        elif isExpired(leasePath,leaseSeconds):
+            status['expired'].append(shard['id'])
+        elif os.path.exists(leasePath):
+            status['leased'].append(shard['id'])
+        else:
+            status['pending'].append(shard['id'])
+
+    return status
+
+def mergeShards(directory=QUEUE_DIR):
+    """Join the shard outputs into the season shot files and the combined shot data.
+
+    Parameters:
+        directory - the shared directory of the queue.
+
+    Returns:
+        rows - the shots of each season.
+    """
+    paths = getQueuePaths(directory)
+    manifest = readJson(paths['manifest'])
+    status = getStatus(directory)
+    if len(status['done']) < len(manifest['shards']):
+        raise RuntimeError(str(len(manifest['shards']) - len(status['done'])) + " shards are not done")
+
+    rows = {}
+    seasons = list(dict.fromkeys(shard['season'] for shard in manifest['shards']))
+    for season in seasons:
+        frames = []
+        for shard in manifest['shards']:
+            if (shard['season'] == season) and (readJson(os.path.join(paths['done'],shard['id'] + ".json"))['rows'] > 0):
+                #read back exactly (zones of "None" stay strings) so the season files match a single-process extraction
+                frames.append(pd.read_csv(os.path.join(paths['shards'],shard['id'] + ".csv"),keep_default_na=False,na_values=[''],
+                                          float_precision='round_trip'))
+        seasonFrame = pd.concat(frames,ignore_index=True)
+        seasonFrame.to_csv("Raw Data/shotData/NHLShotData" + season + ".csv",index=False)
+        rows[season] = len(seasonFrame)
+
+    shotDataCreation.mergeSeasons(["NHLShotData" + season + ".csv" for season in seasons])
+
+    return rows
+
+def main(argv=None):
+    """Run the work queue from the command line."""
+    parser = argparse.ArgumentParser(description="Extract shots on several hosts through a queue on a shared directory.")
+    parser.add_argument('--queue',default=QUEUE_DIR,help="the shared directory of the queue")
+    parser.add_argument('--lease-seconds',type=int,default=LEASE_SECONDS,help="seconds before an unrenewed lease is reclaimed")
+    actions = parser.add_subparsers(dest='action',required=True)
+
+    init = actions.add_parser('init',help="write the shard manifest")
+    init.add_argument('--pbp',nargs='+',default=shotDataCreation.PBP_FILES,help="pbp files (all seasons by default)")
+    init.add_argument('--games-per-shard',type=int,default=GAMES_PER_SHARD)
+    init.add_argument('--window',action='store_true',help="add the lookback window features")
+    init.add_argument('--window-events',type=int,default=10)
+    init.add_argument('--window-seconds',type=int,default=10)
+    work = actions.add_parser('work',help="claim and extract shards until all are done")
+    work.add_argument('--worker',help="the name of the worker (host and process ID by default)")
+    local = actions.add_parser('local',help="run worker processes on this host, then merge")
+    local.add_argument('--workers',type=int,default=4)
+    actions.add_parser('status',help="count the shards by state")
+    actions.add_parser('merge',help="join the shard outputs into the shot data")
+    args = parser.parse_args(argv)
+
+    if args.action == 'init':
+        window = (args.window_events,args.window_seconds) if args.window else None
+        manifest = initQueue(args.queue,args.pbp,args.games_per_shard,window)
+        print("Wrote " + str(len(manifest['shards'])) + " shards of " + str(len(manifest['pbpFiles'])) + " pbp files to " + args.queue)
+
+    elif args.action == 'work':
+        done = runWorker(args.queue,args.worker,args.lease_seconds)
+        print("Committed " + str(len(done)) + " shards")
+
+    elif args.action == 'local':
+        start = perf_counter()
+        done = runLocal(args.queue,args.workers,args.lease_seconds)
+        for name, shards in done.items():
+            print(name + ": " + str(len(shards)) + " shards")
+        print("Extracted in {:.1f}s".format(perf_counter() - start))
+
+    if args.action in ['status','local','merge']:
+        status = getStatus(args.queue,args.lease_seconds)
+        print(", ".join(str(len(ids)) + " " + state for state, ids in status.items()))
+
+    if args.action in ['local','merge']:
+        rows = mergeShards(args.queue)
+        print("Merged " + str(sum(rows.values())) + " shots of " + str(len(rows)) + " seasons")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+from . import profiling, rollupCube
+from .kernels import encodeStrengthIntArray, encodeSpecialStrengthsArray
+from .metricsStore import METRIC_COLUMNS, updateMetrics
+from .venueAdjustedShotDataCreation import readShots
+
+def tuning(df):
+    """Tune the LGBM model with optuna.
+
+    Parameters:
+        df - the dataframe of shots.
+
+    Returns:
+        bestParams - the best hyperparameters found by the tuner.
+    """
+    import optuna.integration.lightgbm as lgb
+    from lightgbm import early_stopping, log_evaluation
+    from sklearn.model_selection import StratifiedKFold
+
+    #separate X and y
+    newXDF = df.loc[:,df.columns != 'Outcome']
+    newYDF = df['Outcome'].astype('int32')
+    
+    #set dataset for lightGBM in optuna
+    dtrain = lgb.Dataset(newXDF, label=newYDF)
+
+    #set basic parameters
+    params = {
+        "objective": "binary",
+        "metric": "binary_logloss",
+        "verbosity": -1,
+        "boosting_type": "gbdt",
+        "deterministic":True
+    }
+
+    #create the tuner
+    tuner = lgb.LightGBMTunerCV(
+        params,
+        dtrain,
+        folds=StratifiedKFold(n_splits=10),
+        callbacks=[early_stopping(150), log_evaluation(150)],
+        optuna_seed = 0,
+        show_progress_bar = False
+    )
+
+    #run the tuner
+    tuner.run()
+
+    #print the best score and the best parameters found
+    print("Best score:", tuner.best_score)
+    bestParams = tuner.best_params
+    print("Best params:", bestParams)
+    print("  Params: ")
+    for key, value in bestParams.items():
+        print("    {}: {}".format(key, value))
+    
+    return bestParams
+
+def cvPredict(classifier,df):
+    """Predict shot outcomes with cross validation.
+
+    Parameters:
+        classifier - the model to be used in prediction.
+        df - the dataframe of shots.
+
+    Returns:
+        ypred - the predictions for each shot.
+    """
+    #separate X and y
+    x = df.loc[:,df.columns != 'Outcome']
+    y = df['Outcome'].astype('int32')
+
+    return cvPredictArrays(classifier,x,y)
+
+def cvPredictArrays(classifier,x,y):
+    """Predict shot outcomes with cross validation from features already separated from the outcome.
+
+    Parameters:
+        classifier - the model to be used in prediction.
+        x - the model features of the shots.
+        y - the outcome of the shots.
+
+    Returns:
+        ypred - the predictions for each shot.
+    """
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+    #use stratified cross validation to predict values
+    kf = StratifiedKFold(n_splits=10)
+    ypred = cross_val_predict(classifier,x,y,cv=kf,method='predict_proba')
+
+    return ypred
+
+def encodeStrength(strength):
+    """Encode team strength as an integer.
+
+    Parameters:
+        strength - the string representing the strength of the team shooting.
+
+    Returns:
+        st - the integer representing the team strength (players for minus players against).
+    """
+    #split strength string and subtract values
+    numbers = strength.split("v")
+    st = int(numbers[0]) - int(numbers[1])
+    return st
+
+def encodeSpecialStrengths(strength):
+    """Encode less common team strengths.
+
+    Parameters:
+        strength - the string representing the strength of the team shooting.
+
+    Returns:
+        code - the integer representing the special strength.
+    """
+    #default code is zero
+    code = 0
+
+    #set code based off strength
+    if strength == '3v3':
+        code = 1
+    elif strength == '4v4':
+        code = 2
+    elif strength == '6v5':
+        code = 3
+    elif strength == '4v3':
+        code = 4
+    elif strength == '3v4':
+        code = 5
+    elif strength == '6v4':
+        code = 6
+    
+    return code
+
+#columns which are not used as model features
+DROP_COLUMNS = ['GameID','Team','oppTeam','shooter','goalie','isEmptyNet','isPenaltyShot',
+    'P1For','P2For','P3For','P4For','P5For','P6For','P1Against','P2Against','P3Against','P4Against','P5Against',
+    'P6Against','AwayPlayers','HomePlayers','AwayShot','AwayTeam','Arena','Date','Event',
+    'rebound','fastbreak','Season','isPlayoffs','isHome']
+
+#the parameters chosen by the tuner 2010-2020
+PARAMS = {'objective': 'binary', 'metric': 'binary_logloss', 'verbosity': -1, 'boosting_type': 'gbdt', 'deterministic': True, 'feature_pre_filter': False, 'lambda_l1': 9.329199279226517, 'lambda_l2': 3.539645667371331e-08, 'num_leaves': 99, 'feature_fraction': 0.5479999999999999, 'bagging_fraction': 1.0, 'bagging_freq': 0, 'min_child_samples': 5}
+
+#PARAMS = {'objective': 'binary', 'metric': 'binary_logloss', 'verbosity': -1, 'boosting_type': 'gbdt', 'deterministic': True, 'feature_pre_filter': False, 'lambda_l1': 9.329199279226517, 'lambda_l2': 3.539645667371331e-08, 'num_leaves': 56, 'feature_fraction': 0.4, 'bagging_fraction': 1.0, 'bagging_freq': 0, 'min_child_samples': 100}
+
+#where the model scoring new shots is saved
+MODEL_PATH = "xG Data/xGModel.txt"
+
+#the last season cross-validated and the season scored by the final model
+TRAIN_SEASON = 2020
+TEST_SEASON = 2021
+
+def filterShots(df,keep=None):
+    """Drop the shots the model does not score and encode the strengths, copying the rows once.
+
+    Parameters:
+        df - the dataframe of venue adjusted shots.
+        keep - a boolean series of other shots to keep (every shot if None).
+
+    Returns:
+        df - the filtered and encoded dataframe.
+    """
+    #drop shots without locations, shots on empty nets, and penalty shots in one mask
+    mask = df['x'].notnull() & df['y'].notnull() & (df['isEmptyNet'] == 0) & (df['isPenaltyShot'] == 0)
+    if keep is not None:
+        mask = mask & keep
+    df = df[mask.to_numpy()]
+
+    #encode special strengths and strengths as integers
+    df['specialStrength'] = encodeSpecialStrengthsArray(df['Strength'])
+    df['Strength'] = encodeStrengthIntArray(df['Strength'])
+
+    return df
+
+def getFeatures(df):
+    """Get the model features of filtered shots, in the order of the training frame.
+
+    Parameters:
+        df - the dataframe of shots returned by filterShots.
+
+    Returns:
+        features - the names of the model features.
+    """
+    return [c for c in df.columns if (c not in DROP_COLUMNS) and (c != 'Outcome')]
+
+def getRows(mask):
+    """Select rows as a slice when they are contiguous, so indexing them makes no copy.
+
+    Parameters:
+        mask - the rows wanted.
+
+    Returns:
+        rows - a slice, or the positions of the rows.
+    """
+    positions = np.flatnonzero(mask)
+    if (len(positions) > 0) and (positions[-1] - positions[0] + 1 == len(positions)):
+        return slice(positions[0],positions[-1] + 1)
+
+    return positions
+
+def prepareFrame(df):
+    """Filter and encode venue adjusted shots for the model.
+
+    Parameters:
+        df - the dataframe of venue adjusted shots.
+
+    Returns:
+        trainingFrame - the model features and outcome.
+        writingFrame - all columns of the shots kept.
+    """
+    #store all columns in a writing frame
+    writingFrame = filterShots(df)
+
+    #drop unneeded columns and reset indices
+    trainingFrame = writingFrame.drop(DROP_COLUMNS,axis=1)
+    trainingFrame = trainingFrame.reset_index(drop=True)
+
+    return trainingFrame, writingFrame
+
+def fitPredict(params,trainingFrame,testingFrame,modelPath=None):
+    """Fit a model on one set of shots and predict the outcome of another.
+
+    Parameters:
+        params - the LGBM parameters.
+        trainingFrame - the model features and outcome to train on.
+        testingFrame - the model features of the shots to predict.
+        modelPath - where the fitted booster is saved (not saved if None).
+
+    Returns:
+        preds - the predictions for each test shot.
+    """
+    #separate X and y for training
+    trainX = trainingFrame.loc[:,trainingFrame.columns != 'Outcome']
+    trainY = trainingFrame['Outcome'].astype('int32')
+
+    #get test X
+    testX = testingFrame.loc[:,testingFrame.columns != 'Outcome']
+
+    return fitPredictArrays(params,trainX,trainY,testX,modelPath)
+
+def fitPredictArrays(params,trainX,trainY,testX,modelPath=None):
+    """Fit a model on features already separated from the outcome and predict other shots.
+
+    Parameters:
+        params - the LGBM parameters.
+        trainX - the model features to train on.
+        trainY - the outcome of the training shots.
+        testX - the model features of the shots to predict.
+        modelPath - where the fitted booster is saved (not saved if None).
+
+    Returns:
+        preds - the predictions for each test shot.
+    """
+    from lightgbm import LGBMClassifier
+
+    #set parameters and fit model
+    classifier = LGBMClassifier(**params)
+    classifier.fit(trainX,trainY)
+    if modelPath is not None:
+        classifier.booster_.save_model(modelPath)
+
+    #predict outcomes
+    preds = classifier.predict_proba(testX)
+
+    return preds
+
+def readPriors(path,shotFrame=None):
+    """Read the prior features written for the venue adjusted shots.
+
+    Parameters:
+        path - the path of the prior features.
+        shotFrame - the venue adjusted shots the priors are checked against (not checked if None).
+
+    Returns:
+        priorFrame - the prior features, a row per venue adjusted shot in the same order.
+    """
+    priorFrame = pd.read_csv(path)
+    if (shotFrame is not None) and ((len(priorFrame) != len(shotFrame)) or
+                                    (priorFrame['GameID'].to_numpy() != shotFrame['GameID'].to_numpy()).any()):
+        raise ValueError(path + " was not computed from the current venue adjusted shots, run `python -m nhlxg priors` again")
+
+    return priorFrame.drop(columns='GameID')
+
+def main(priorPath=None,stage=profiling.stage):
+    """Main method which handles reading in shot data, defining a model, and outputing the results.
+
+    The shots are filtered with one copy and their features converted once to a float64 matrix,
+    which is what lightgbm converts frames to. The training and testing seasons are slices of it,
+    and xG is added to the shots in place.
+
+    Parameters:
+        priorPath - the path of prior features of the shots used as model features (not used if None).
+        stage - the context manager each step runs in (profiling.stage, or memoryBudget.track
+                through memoryBudget.runBudgeted).
+    """
+    from lightgbm import LGBMClassifier
+    from sklearn.metrics import log_loss, roc_auc_score
+
+    #read in data
+    with stage("xGModelCreation.readVenueAdjusted") as record:
+        shotFrame = readShots("Raw Data/shotData/NHLShotData2010-2021VenueAdjusted.csv")
+        record['rowsOut'] = len(shotFrame)
+
+    #the priors are a row per venue adjusted shot, in the same order
+    if priorPath is not None:
+        shotFrame = pd.concat([shotFrame,readPriors(priorPath,shotFrame)],axis=1)
+
+    #get the training years of 2010-2020 and the testing season of 2021
+    with stage("xGModelCreation.prepareShots",shotFrame) as record:
+        shotFrame = filterShots(shotFrame,shotFrame['Season'] <= TEST_SEASON)
+        features = getFeatures(shotFrame)
+        X = shotFrame[features].to_numpy(dtype=np.float64)
+        y = shotFrame['Outcome'].to_numpy().astype('int32')
+        isTest = (shotFrame['Season'] == TEST_SEASON).to_numpy()
+        trainRows = getRows(~isTest)
+        testRows = getRows(isTest)
+        record['rowsOut'] = len(shotFrame)
+
+    #tune hyperparameters
+    #params = tuning(trainingFrame)
+    params = PARAMS
+
+    #use cross-validation to get xG values for all shots
+    with stage("xGModelCreation.cvPredict",shotFrame) as record:
+        proba = cvPredictArrays(LGBMClassifier(**params),X[trainRows],y[trainRows])
+        record['rowsOut'] = len(proba)
+
+    #benchmark performance
+    print("Writing Results:")
+    print("Log Loss: " + str(log_loss(y[trainRows],proba)))
+    print("AUC: " + str(roc_auc_score(y[trainRows],proba[:,1])))
+
+    #predict outcomes, frames over the matrix rows name the features of the saved model
+    with stage("xGModelCreation.fitPredict",shotFrame) as record:
+        preds = fitPredictArrays(params,pd.DataFrame(X[trainRows],columns=features,copy=False),y[trainRows],
+                                 pd.DataFrame(X[testRows],columns=features,copy=False),MODEL_PATH)
+        del X
+        record['rowsOut'] = len(preds)
+
+    #add xG values to the shots and output results
+    with stage("xGModelCreation.writeXG",shotFrame) as record:
+        xG = np.empty(len(shotFrame))
+        xG[trainRows] = proba[:,1]
+        xG[testRows] = preds[:,1]
+        shotFrame['xG'] = xG
+
+        #the training seasons are written before the testing season
+        if (np.diff(isTest.astype(np.int8)) < 0).any():
+            shotFrame = shotFrame.take(np.concatenate([np.flatnonzero(~isTest),np.flatnonzero(isTest)]))
+        shotFrame.to_csv("xG Data/xGData2010-2021.csv",index=False)
+        record['rowsOut'] = len(shotFrame)
+
+    #store the metrics of the new xG data so reports do not read it again
+    with stage("xGModelCreation.updateMetrics",shotFrame):
+        updateMetrics(shotFrame[METRIC_COLUMNS])
+
+    #every game was rescored so the rollup cube is rebuilt
+    with stage("xGModelCreation.rollupCube",shotFrame) as record:
+        cube = rollupCube.updateCube(None,shotFrame[list(rollupCube.DIMENSIONS) + ['Outcome','xG']])
+        rollupCube.saveCube(cube)
+        record['rowsOut'] = len(cube)
+
+if __name__ == "__main__":
+    main()
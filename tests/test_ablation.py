@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nhlxg import ablation
+from nhlxg.xGModelCreation import PARAMS, cvPredict
+
+def getTrainingFrame(rows=2000,seed=0):
+    """Random shots with a few informative features, a missing value column and a constant."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'x':rng.normal(size=rows),'y':rng.integers(0,40,rows).astype(float),
+                       'Angle':np.where(rng.random(rows) < 0.2,np.nan,rng.uniform(-90,90,rows)),'isHome':np.ones(rows)})
+    df['Outcome'] = (rng.random(rows) < 1/(1 + np.exp(2 - df['x'] + df['y']/20))).astype(int)
+
+    return df
+
+@pytest.mark.parametrize('features',[['x','y','Angle'],['x','Angle'],['y','Angle','isHome']])
+def test_variant_from_binned_folds_matches_cross_validation(tmp_path,features):
+    """A variant trained on the joined binned columns predicts as cvPredict does on only its features."""
+    df = getTrainingFrame()
+    params = dict(PARAMS,num_threads=1)
+    paths, columns = ablation.writeFeatures(df,str(tmp_path))
+    for fold in range(ablation.FOLDS):
+        ablation.binFold(paths,columns,fold,params)
+
+    result = ablation.runVariant(paths,columns,{'name':'test','features':features},params)
+
+    check = ablation.checkBaseline(df,features,result,params)
+    assert check['matches']
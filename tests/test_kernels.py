@@ -0,0 +1,129 @@
+import math
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from nhlxg import kernels, kernelCheck
+from nhlxg.shotDataCreation import calculateDist, calculateAngle, encodeStrength, getRelativeZone
+from nhlxg.xGModelCreation import encodeStrength as encodeStrengthInt, encodeSpecialStrengths
+
+#rink coordinates with the edges, the net, equal x values and missing values all likely
+COORDS = st.one_of(st.sampled_from([0.0,-0.0,1.0,-1.0,42.5,-42.5,89.0,-89.0,100.0,-100.0,math.nan]),
+                   st.integers(-99,99).map(float),
+                   st.floats(-100,100,allow_nan=False))
+
+#the numba kernels compile on their first call, which is slower than a hypothesis deadline
+NO_DEADLINE = settings(deadline=None)
+
+#columns of locations from empty to a few dozen rows, a single row included
+LOCATIONS = st.lists(st.tuples(COORDS,COORDS,COORDS,COORDS),max_size=30)
+
+TEAMS = st.sampled_from(['BOS','TOR',math.nan])
+ZONES = st.sampled_from(['Off','Def','Neu','None',math.nan])
+HOME_STRENGTHS = st.sampled_from(['5x5','5x4','4x5','4x4','3x3','6x5','5x6','4x3','3x4','6x4'])
+STRENGTHS = st.sampled_from(['5v5','5v4','4v5','4v4','3v3','6v5','5v6','4v3','3v4','6v4'])
+
+@contextmanager
+def jitKernels(jit):
+    """Run the kernels compiled with numba or with the numpy fallbacks."""
+    previous = kernels._jit
+    kernels._jit = None if jit else {}
+    try:
+        yield
+    finally:
+        kernels._jit = previous
+
+def assertSame(array,scalar):
+    """Check kernel output against the scalar values, missing values included."""
+    array = list(np.asarray(array,dtype=object))
+    assert len(array) == len(scalar)
+    for u, v in zip(array,scalar):
+        if isinstance(v,float):
+            assert (math.isnan(u) and math.isnan(v)) or (u == pytest.approx(v,rel=1e-12,abs=1e-12))
+        else:
+            assert (u == v) or (pd.isna(u) and pd.isna(v))
+
+def getColumns(locations):
+    """Split rows of locations into float columns."""
+    return [np.array(c,dtype=float) for c in zip(*locations)] if locations else [np.zeros(0)]*4
+
+def test_kernels_match_scalar_functions():
+    """Every array kernel gives the same values as its scalar function."""
+    assert kernelCheck.checkKernels(n=2000,seed=1) == []
+
+def test_kernels_match_scalar_functions_without_numba(monkeypatch):
+    """The numpy fallbacks give the same values as the scalar functions."""
+    monkeypatch.setattr(kernels,'getJitKernels',lambda: {})
+
+    assert kernelCheck.checkKernels(n=2000,seed=2) == []
+
+@pytest.mark.parametrize('jit',[True,False])
+@NO_DEADLINE
+@given(locations=LOCATIONS)
+def test_geometry_matches_scalar_functions(jit,locations):
+    """Distances and angles match the scalar functions, for empty, single and NaN rows."""
+    x1, y1, x2, y2 = getColumns(locations)
+
+    with jitKernels(jit):
+        dist = kernels.calculateDistArray(x1,y1,x2,y2)
+        angle = kernels.calculateAngleArray(x1,y1,x2,y2)
+
+    assert dist.dtype == angle.dtype == np.float64
+    assertSame(dist,[calculateDist(*v) for v in locations])
+    assertSame(angle,[float(calculateAngle(*v)) for v in locations])
+
+@pytest.mark.parametrize('jit',[True,False])
+@NO_DEADLINE
+@given(x=COORDS,y=COORDS,d=st.floats(0.5,100))
+def test_boundary_angles_and_distances(jit,x,y,d):
+    """Equal x gives no angle, equal y no angle, a diagonal 45 degrees and a 3-4-5 triangle 5."""
+    with jitKernels(jit):
+        angles = kernels.calculateAngleArray([x,x,x,x],[y,y,y,y],[x,x + d,x + d,x - d],[y + d,y,y + d,y + d])
+        dist = kernels.calculateDistArray([x],[y],[x + 3*d],[y + 4*d])
+
+    if math.isnan(x) or math.isnan(y):
+        #equal x is zero even when y is missing, anything else with a missing value is missing
+        assert (angles[0] == 0) == (not math.isnan(x))
+        assert np.isnan(angles[1:]).all() and np.isnan(dist).all()
+    else:
+        assert list(angles[:2]) == [0,0]
+        assert angles[2:] == pytest.approx([45,-45])
+        assert dist[0] == pytest.approx(5*d)
+
+@NO_DEADLINE
+@given(x=COORDS,y=COORDS,locations=st.lists(st.tuples(COORDS,COORDS),max_size=5))
+def test_scalar_locations_broadcast(x,y,locations):
+    """A scalar location, such as the net, is broadcast against columns of any length."""
+    xs = pd.Series([l[0] for l in locations],dtype=float,index=range(10,10 + len(locations)))
+    ys = pd.Series([l[1] for l in locations],dtype=float,index=xs.index)
+
+    dist = kernels.calculateDistArray(x,y,xs,ys)
+    angle = kernels.calculateAngleArray(x,y,xs,ys)
+
+    assert list(dist.index) == list(angle.index) == list(xs.index)
+    assertSame(dist,[calculateDist(x,y,u,v) for u, v in zip(xs,ys)])
+    assertSame(angle,[float(calculateAngle(x,y,u,v)) for u, v in zip(xs,ys)])
+
+@NO_DEADLINE
+@given(rows=st.lists(st.tuples(HOME_STRENGTHS,TEAMS,TEAMS,TEAMS,ZONES,STRENGTHS),max_size=30))
+def test_encodings_match_scalar_functions(rows):
+    """The strength and zone encodings match the scalar functions, for empty, single and NaN rows."""
+    st_, team, homeTeam, lastTeam, lastZone, rel = [np.array(c,dtype=object) for c in zip(*rows)] if rows else [np.array([],dtype=object)]*6
+
+    assertSame(kernels.encodeStrengthArray(st_,team,homeTeam),[encodeStrength(*v) for v in zip(st_,team,homeTeam)])
+    assertSame(kernels.getRelativeZoneArray(team,lastTeam,lastZone),[getRelativeZone(*v) for v in zip(team,lastTeam,lastZone)])
+    assertSame(kernels.encodeStrengthIntArray(rel),[encodeStrengthInt(v) for v in rel])
+    assertSame(kernels.encodeSpecialStrengthsArray(rel),[encodeSpecialStrengths(v) for v in rel])
+
+def test_encodings_of_empty_columns():
+    """Empty columns, as in a chunk with no shots kept, encode to empty integer columns."""
+    empty = pd.Series([],dtype=object)
+
+    strength = kernels.encodeStrengthIntArray(empty)
+    special = kernels.encodeSpecialStrengthsArray(empty)
+
+    assert len(strength) == 0 and np.issubdtype(strength.dtype,np.integer)
+    assert len(special) == 0 and np.issubdtype(special.dtype,np.integer)
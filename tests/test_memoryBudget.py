@@ -0,0 +1,38 @@
+from time import sleep
+
+import numpy as np
+import pytest
+
+from nhlxg import memoryBudget, profiling
+
+#the MB allocated by each step of the growing stage
+CHUNK_MB = 10
+
+def growStage(chunks,count,stage):
+    """A stage with one step that keeps allocating memory."""
+    with stage("test.grow"):
+        for _ in range(count):
+            chunks.append(np.ones(CHUNK_MB*2**20//8))
+            sleep(memoryBudget.POLL_SECONDS)
+
+def test_step_over_the_ceiling_is_stopped():
+    """A step growing past the ceiling raises MemoryBudgetError partway through, not at its end."""
+    chunks = []
+    ceilingMB = profiling.getRssMB() + 5*CHUNK_MB
+
+    with pytest.raises(memoryBudget.MemoryBudgetError,match="test.grow"):
+        memoryBudget.runBudgeted(growStage,ceilingMB,chunks=chunks,count=40)
+
+    #the step would have allocated 400MB, it is stopped a few chunks past the ceiling
+    assert 5 <= len(chunks) < 15
+
+def test_step_under_the_ceiling_runs():
+    """A step that stays under the ceiling runs to the end and records its peak."""
+    chunks = []
+    ceilingMB = profiling.getRssMB() + 20*CHUNK_MB
+
+    state = memoryBudget.runBudgeted(growStage,ceilingMB,chunks=chunks,count=5)
+
+    assert len(chunks) == 5
+    assert [step['step'] for step in state['steps']] == ['test.grow']
+    assert state['peakRssMB'] <= ceilingMB
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nhlxg import onIce
+
+def getShots():
+    """Two games of goalie 90 against goalies 91 and 92, with shots both ways and one empty net."""
+    rows = [{'shooter':10,'goalie':91,'xG':0.9,'Outcome':1,'P1For':10,'P1Against':21},
+            {'shooter':21,'goalie':90,'xG':0.1,'Outcome':0,'P1For':21,'P1Against':10},
+            {'shooter':21,'goalie':90,'xG':0.3,'Outcome':1,'P1For':21,'P1Against':10},
+            {'shooter':10,'goalie':92,'xG':0.2,'Outcome':0,'P1For':10,'P1Against':22},
+            {'shooter':22,'goalie':90,'xG':0.4,'Outcome':0,'P1For':22,'P1Against':10},
+            {'shooter':22,'goalie':np.nan,'xG':0.8,'Outcome':1,'P1For':22,'P1Against':10}]
+    df = pd.DataFrame(rows)
+    for i in range(2,7):
+        df['P' + str(i) + 'For'] = np.nan
+        df['P' + str(i) + 'Against'] = np.nan
+
+    return df
+
+def test_goalie_gsax_comes_from_shots_faced():
+    """A goalie's GSAx is the xG minus goals of the shots on their own net, not their team's shots."""
+    df = getShots()
+
+    players = onIce.aggregatePlayers(onIce.buildOnIceMatrix(df),df)
+
+    assert players.loc[90,'goalieFA'] == 3
+    assert players.loc[90,'goalieXGA'] == pytest.approx(0.8)
+    assert players.loc[90,'GSAx'] == pytest.approx(0.8 - 1)
+    assert players.loc[91,'GSAx'] == pytest.approx(0.9 - 1)
+    assert players.loc[92,'GSAx'] == pytest.approx(0.2)
+
+    #the empty net goal is charged to no goalie
+    assert players['goalieGA'].sum() == 2
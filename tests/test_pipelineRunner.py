@@ -0,0 +1,54 @@
+import os
+import shutil
+
+from nhlxg import pipelineRunner
+
+def buildCurrentPipeline(tmp_path,monkeypatch):
+    """Create every file of a one-season pipeline and record every stage as built from a copy of the package."""
+    package = tmp_path / "nhlxg"
+    shutil.copytree(pipelineRunner.PACKAGE_DIR,package,ignore=shutil.ignore_patterns('__pycache__'))
+    monkeypatch.setattr(pipelineRunner,'PACKAGE_DIR',str(package))
+    monkeypatch.chdir(tmp_path)
+
+    stages = pipelineRunner.buildStages(["Raw Data/pbp/nhl_pbp_20202021.csv"])
+    for stage in stages:
+        for path in stage['inputs'] + stage['outputs'] + stage['stores']:
+            os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+            with open(path,'w') as f:
+                f.write(path)
+
+    state = {'files':{},'stages':{}}
+    for stage in stages:
+        state['stages'][stage['name']] = {'fingerprint':pipelineRunner.getFingerprint(stage,state),
+                                          'outputs':{o: pipelineRunner.getDataHash(state,o) for o in stage['outputs']}}
+    pipelineRunner.saveState(state,"state.json")
+
+    return stages, package
+
+def getRerun(stages):
+    """Get the stages a dry run of the pipeline would run."""
+    results = pipelineRunner.runStages(stages,workers=1,dryRun=True,statePath="state.json")
+
+    return {name for name, result in results.items() if result == 'ran'}
+
+def test_built_pipeline_is_current(tmp_path,monkeypatch):
+    """A pipeline whose stages were all built from the current code and files runs nothing."""
+    stages, package = buildCurrentPipeline(tmp_path,monkeypatch)
+
+    assert getRerun(stages) == set()
+
+def test_editing_benchmarkModel_only_reruns_the_reports(tmp_path,monkeypatch):
+    """The benchmark and plot read benchmarkModel, the model and its inputs do not."""
+    stages, package = buildCurrentPipeline(tmp_path,monkeypatch)
+    with open(package / "benchmarkModel.py",'a') as f:
+        f.write("\n#an edit\n")
+
+    assert getRerun(stages) == {'benchmark','plot'}
+
+def test_editing_xGModelCreation_reruns_the_model_and_its_readers(tmp_path,monkeypatch):
+    """The model code is part of every stage that trains, scores or reports on the model."""
+    stages, package = buildCurrentPipeline(tmp_path,monkeypatch)
+    with open(package / "xGModelCreation.py",'a') as f:
+        f.write("\n#an edit\n")
+
+    assert getRerun(stages) == {'train','benchmark','plot','backtest','priors'}
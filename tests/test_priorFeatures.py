@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from nhlxg import priorFeatures, shotDataCreation, syntheticData
+
+def test_goalie_is_the_opposing_goalie(tmp_path):
+    """Every shot is charged to the goalie of the team shot at, and empty net shots to no one."""
+    path = syntheticData.writePbp(syntheticData.generatePbp(4,eventsPerPeriod=30),str(tmp_path),2020)
+    shots = shotDataCreation.extractShots(shotDataCreation.createTrainingFrame(path),syntheticData.generatePlayers())
+
+    #extraction renames PHX to ARI
+    opponents = shots['oppTeam'].replace('ARI','PHX')
+    goalies = opponents.map(lambda team: syntheticData.getRoster(team)[1])
+    isEmptyNet = shots['isEmptyNet'] == 1
+
+    assert len(shots) > 0
+    assert (shots.loc[~isEmptyNet,'goalie'] == goalies[~isEmptyNet]).all()
+    assert shots.loc[isEmptyNet,'goalie'].isnull().all()
+
+def getShots():
+    """Three games of goalie 90 (team A) against goalies 91 and 92, with shots both ways."""
+    rows = []
+    for gameId, date, opponent, xG in [(1,'2020-10-05',91,0.1),(2,'2020-10-07',92,0.2),(3,'2020-10-09',91,0.4)]:
+        #team A shoots at the opponent, the opponent shoots at goalie 90
+        rows.append({'GameID':gameId,'Date':date,'shooter':10,'goalie':opponent,'Outcome':1,'xG':0.9})
+        rows.append({'GameID':gameId,'Date':date,'shooter':20,'goalie':90,'Outcome':0,'xG':xG})
+        rows.append({'GameID':gameId,'Date':date,'shooter':20,'goalie':90,'Outcome':1,'xG':xG})
+    df = pd.DataFrame(rows)
+    df['scoredGoal'] = df['Outcome']
+
+    return df
+
+def test_goalie_priors_come_from_shots_faced_in_earlier_games():
+    """A goalie's priors only add up the shots they faced in games before the shot's game."""
+    df = getShots()
+
+    priors = priorFeatures.createPriorFeatures(df)
+
+    faced = priors[df['goalie'] == 90]
+    #game 1 has no earlier games, game 2 adds game 1's two shots, game 3 adds games 1 and 2
+    assert list(faced['goaliePriorShots']) == [0,0,2,2,4,4]
+    assert list(faced['goaliePriorGoals']) == [0,0,1,1,2,2]
+    assert faced['goaliePriorXG'].to_numpy() == pytest.approx([0,0,0.2,0.2,0.6,0.6])
+    assert faced['goaliePriorGSAx'].to_numpy() == pytest.approx([0,0,-0.8,-0.8,-1.4,-1.4])
+
+    #the shots goalie 90's team took count for the goalies they were taken on
+    assert list(priors.loc[df['goalie'] == 91,'goaliePriorShots']) == [0,1]
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nhlxg import rollupCube
+
+def getShots(games,seed=0):
+    """Random scored shots of some games, with teams, strengths and playoff games."""
+    rng = np.random.default_rng(seed)
+    teams = ['BOS','TOR','MTL','NYR']
+    rows = []
+    for gameId in games:
+        home, away = teams[gameId % 4], teams[(gameId + 1) % 4]
+        for _ in range(rng.integers(5,20)):
+            team = home if rng.random() < 0.5 else away
+            xG = rng.uniform(0,0.5)
+            rows.append({'Season':2020 + gameId//100,'GameID':gameId,'Team':team,'oppTeam':away if team == home else home,
+                         'Strength':int(rng.choice([-1,0,1])),'isPlayoffs':int(gameId % 100 > 80),'xG':xG,'Outcome':int(rng.random() < xG)})
+
+    return pd.DataFrame(rows)
+
+def asCells(cube):
+    """The cells of a cube with team names instead of dictionary codes, in a fixed order."""
+    cube = cube.astype({'Team':str,'oppTeam':str})
+
+    return cube.sort_values(list(rollupCube.DIMENSIONS)).reset_index(drop=True)
+
+def test_incremental_update_matches_refresh(tmp_path,capsys):
+    """Adding new games to a cube gives the cube rebuilt from every game, new teams included."""
+    xgPath = str(tmp_path / "xG.csv")
+    cubePath = str(tmp_path / "cube.npz")
+    refreshPath = str(tmp_path / "refresh.npz")
+    first = getShots([1,2,3,85])
+    first.to_csv(xgPath,index=False)
+    rollupCube.main(xgPath,cubePath)
+
+    #the next games are appended, one of them by a team the cube has not seen
+    later = getShots([101,102,186],seed=1)
+    later.loc[later['GameID'] == 102,'Team'] = 'SEA'
+    pd.concat([first,later]).to_csv(xgPath,index=False)
+    rollupCube.main(xgPath,cubePath)
+    rollupCube.main(xgPath,refreshPath,refresh=True)
+
+    cube = rollupCube.loadCube(cubePath)
+    refreshed = rollupCube.loadCube(refreshPath)
+    pd.testing.assert_frame_equal(asCells(cube),asCells(refreshed))
+    pd.testing.assert_frame_equal(rollupCube.queryCube(cube,by=('Season','Team','isPlayoffs')),
+                                  rollupCube.queryCube(refreshed,by=('Season','Team','isPlayoffs')))
+    assert 'Rollup cube has' in capsys.readouterr().out
+
+def test_rescored_games_replace_their_cells():
+    """Updating with games the cube already has replaces their cells instead of adding to them."""
+    shots = getShots([1,2,3])
+    rescored = shots[shots['GameID'] == 2].assign(xG=0.25)
+
+    cube = rollupCube.updateCube(rollupCube.updateCube(None,shots),rescored)
+
+    expected = pd.concat([shots[shots['GameID'] != 2],rescored])
+    pd.testing.assert_frame_equal(asCells(cube),asCells(rollupCube.buildCube(expected)))
+
+def test_query_matches_grouping_the_shots():
+    """A rollup query gives the totals of grouping the shots themselves."""
+    shots = getShots(range(1,40))
+    cube = rollupCube.updateCube(None,shots)
+
+    totals = rollupCube.queryCube(cube,by=('Team',),season=2020,playoffs=0)
+
+    regular = shots[shots['isPlayoffs'] == 0]
+    expected = regular.groupby('Team').agg(xG=('xG','sum'),goals=('Outcome','sum'),shots=('xG','size'))
+    assert list(totals.index) == list(expected.index)
+    assert totals['xG'].to_numpy() == pytest.approx(expected['xG'].to_numpy(),rel=1e-6)
+    assert list(totals['goals']) == list(expected['goals'])
+    assert list(totals['shots']) == list(expected['shots'])
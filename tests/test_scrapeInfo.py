@@ -0,0 +1,171 @@
+import os
+from time import monotonic
+
+import pandas as pd
+import pytest
+
+from nhlxg import fakeApi, scrapeInfo
+
+@pytest.fixture
+def startApi():
+    """Start fake APIs without latency or random failures and stop them after the test."""
+    servers = []
+
+    def start(**kwargs):
+        config = dict(minLatency=0,maxLatency=0,rate429=0,rate500=0)
+        config.update(kwargs)
+        server, url = fakeApi.startServer(**config)
+        servers.append(server)
+        return server, url
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+
+def fetch(url,playerId,**kwargs):
+    """Fetch one player from an API."""
+    session = scrapeInfo.createSession(1)
+    try:
+        return scrapeInfo.fetchPlayer(session,scrapeInfo.TokenBucket(100),playerId,url,**kwargs)
+    finally:
+        session.close()
+
+def getGaps(server):
+    """Get the seconds between the requests an API received."""
+    times = [t for t, _ in server.log]
+
+    return [b - a for a, b in zip(times,times[1:])]
+
+def test_retries_429_and_5xx_with_backoff(startApi):
+    """Failed requests are retried after exponentially growing delays."""
+    server, url = startApi(script={8478402:[500,502,503,200]})
+
+    row = fetch(url,'8478402',backoff=0.1)
+
+    assert row == ['8478402','R','R']
+    assert server.requests == 4
+    #with jitter the nth retry waits between 0.5 and 1.5 times backoff*2**n
+    gaps = getGaps(server)
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1 and gaps[2] >= 0.2
+
+def test_retry_after_is_respected(startApi):
+    """A 429 with Retry-After waits that long instead of the backoff."""
+    server, url = startApi(script={1:[429,200]},retryAfter=1)
+
+    assert fetch(url,'1',backoff=0.01) is not None
+    assert getGaps(server)[0] >= 1
+
+def test_client_errors_are_not_retried(startApi):
+    """A response that will not succeed on retry fails the player at once."""
+    server, url = startApi(script={1:[404]})
+
+    assert fetch(url,'1',backoff=0.01) is None
+    assert server.requests == 1
+
+def test_timeouts_are_retried_then_fail(startApi):
+    """A request with no answer times out and is retried, up to the retry limit."""
+    server, url = startApi(script={1:['timeout',200],2:['timeout','timeout']},hangSeconds=1)
+
+    start = monotonic()
+    assert fetch(url,'1',timeout=0.2,backoff=0.01) is not None
+    assert fetch(url,'2',timeout=0.2,retries=1,backoff=0.01) is None
+    assert monotonic() - start < 1.5
+    assert server.requests == 4
+
+def test_bad_json_is_retried_then_recorded_as_failed(startApi):
+    """A 200 whose body is not json is retried like a failure and never aborts the run."""
+    server, url = startApi(script={1:['badJson',200],2:['badJson','badJson','badJson']})
+
+    player_info, failed = scrapeInfo.fetchPlayers(['1','2'],workers=2,rate=100,baseUrl=url,retries=2,backoff=0.01)
+
+    assert player_info == [['1','L','L']]
+    assert failed == ['2']
+    assert server.requests == 5
+
+def test_token_bucket_limits_the_rate():
+    """A full bucket allows a burst of its capacity, then one token per 1/rate seconds."""
+    bucket = scrapeInfo.TokenBucket(20,capacity=5)
+
+    start = monotonic()
+    for _ in range(15):
+        bucket.acquire()
+
+    #the 10 requests after the burst need 10/20 seconds of tokens
+    assert 0.45 <= monotonic() - start < 1
+
+def test_fetch_players_respects_the_rate(startApi):
+    """Concurrent workers share one bucket, so the API never sees more than the rate."""
+    server, url = startApi()
+
+    scrapeInfo.fetchPlayers([str(i) for i in range(1,16)],workers=8,rate=10,baseUrl=url)
+
+    times = sorted(t for t, _ in server.log)
+    #a bucket of 10 at 10 per second allows at most 10 + 10*T requests in any T seconds, and the
+    #requests reach the server a few tens of milliseconds apart from when their tokens were taken
+    assert len(times) == 15
+    assert times[-1] - times[0] >= 0.45
+    assert all(b - a >= 0.05 for a, b in zip(times,times[10:]))
+
+def test_ttl_cache_fetches_only_new_and_stale_players(startApi,tmp_path,monkeypatch):
+    """Players fetched within the TTL are skipped and stale or new players are fetched again."""
+    server, url = startApi()
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Raw Data/shotData")
+    os.makedirs("Raw Data/info")
+    pd.DataFrame({'shooter':[1.0,2.0,3.0],'goalie':[4.0,4.0,None]}).to_csv(scrapeInfo.SHOT_PATH,index=False)
+
+    now = pd.Timestamp.now(tz='UTC')
+    pd.DataFrame({'id':['1','2','4'],'shootsCatches':['X','X','X'],'position':['X','X','X'],
+                  'fetchedAt':[now - pd.Timedelta(days=1),now - pd.Timedelta(days=40),now - pd.Timedelta(days=29)]}).to_csv(scrapeInfo.CACHE_PATH,index=False)
+
+    scrapeInfo.main(workers=2,rate=100,baseUrl=url,ttlDays=30)
+
+    #player 2 is stale and player 3 is new, players 1 and 4 are fresh
+    assert sorted(playerId for _, playerId in server.log) == [2,3]
+    cache = scrapeInfo.loadCache()
+    assert cache.set_index('id')['shootsCatches'].to_dict() == {'1':'X','2':'L','3':'R','4':'X'}
+    assert (cache.set_index('id')['fetchedAt'] > now).to_dict() == {'1':False,'2':True,'3':True,'4':False}
+    assert list(pd.read_csv(scrapeInfo.INFO_PATH,dtype={'id':str})['id']) == ['1','2','3','4']
+
+def test_cache_is_seeded_from_player_info(tmp_path):
+    """Without a cache, the players in the existing player info count as fetched when it was written."""
+    cachePath = str(tmp_path / "cache.csv")
+    infoPath = str(tmp_path / "info.csv")
+    pd.DataFrame({'id':['8478402','10'],'shootsCatches':['L','R'],'position':['C','G']}).to_csv(infoPath,index=False)
+    written = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=3)
+    os.utime(infoPath,(written.timestamp(),written.timestamp()))
+
+    cache = scrapeInfo.loadCache(cachePath,infoPath)
+
+    assert list(cache['id']) == ['8478402','10']
+    assert (cache['fetchedAt'] - written).abs().max() < pd.Timedelta(seconds=1)
+    assert scrapeInfo.getStaleIds(['10','11','8478402'],cache,ttlDays=30) == ['11']
+    assert scrapeInfo.getStaleIds(['10','11','8478402'],cache,ttlDays=2) == ['10','11','8478402']
+
+def test_merge_replaces_refetched_players():
+    """Refetched players replace their cached rows and players that were not fetched keep theirs."""
+    old = pd.Timestamp('2021-01-01',tz='UTC')
+    new = pd.Timestamp('2021-03-01',tz='UTC')
+    cache = pd.DataFrame({'id':['1','2','3'],'shootsCatches':['L','L','L'],'position':['C','C','C'],'fetchedAt':[old]*3})
+
+    merged = scrapeInfo.mergeCache(cache,[['2','R','D'],['4','L','G']],new)
+
+    assert merged[scrapeInfo.INFO_COLUMNS].values.tolist() == [['1','L','C'],['2','R','D'],['3','L','C'],['4','L','G']]
+    assert list(merged['fetchedAt']) == [old,new,old,new]
+
+def test_player_ids_read_only_the_id_columns(tmp_path,monkeypatch):
+    """The player IDs come from the shooter and goalie columns alone, as integer strings."""
+    path = str(tmp_path / "shots.csv")
+    pd.DataFrame({'shooter':[3.0,1.0,3.0],'goalie':[2.0,None,2.0],'xCord':[1,2,3]}).to_csv(path,index=False)
+    readColumns = []
+    readCsv = pd.read_csv
+
+    def recordColumns(*args,**kwargs):
+        readColumns.append(kwargs.get('usecols'))
+        return readCsv(*args,**kwargs)
+
+    monkeypatch.setattr(scrapeInfo.pd,'read_csv',recordColumns)
+
+    assert scrapeInfo.getPlayerIds(path) == ['1','2','3']
+    assert readColumns == [['shooter','goalie']]
@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from nhlxg import sharedFeatures, walkForward
+
+#the parameters of the small test models
+PARAMS = {'objective':'binary','verbosity':-1,'min_data_in_leaf':5,'num_leaves':4}
+
+class NoCopyArray(np.ndarray):
+    """A matrix that fails if its rows are selected by position or mask, which copies them."""
+
+    def __getitem__(self,key):
+        keys = key if isinstance(key,tuple) else (key,)
+        if any(isinstance(k,(np.ndarray,list)) for k in keys):
+            raise AssertionError("the rows of X were copied")
+        return super().__getitem__(key)
+
+def noCopy(attach):
+    """Wrap an attach function so the feature matrix it returns cannot be copied by indexing."""
+    def attachNoCopy(*args,**kwargs):
+        matrix = attach(*args,**kwargs)
+        matrix['X'] = matrix['X'].view(NoCopyArray)
+        return matrix
+
+    return attachNoCopy
+
+def writeShots(directory,rows=600,seasons=(2018,2019,2020)):
+    """Write a shared matrix of random shots in season order."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows,3)).astype(np.float32)
+    labels = {'Outcome':(X[:,0] + rng.normal(size=rows) > 1).astype(np.int8),
+              'Season':np.repeat(seasons,rows // len(seasons)).astype(np.int16),
+              'Strength':np.zeros(rows,dtype=np.int8),
+              'Row':np.arange(rows,dtype=np.int64)}
+
+    return sharedFeatures.writeMatrix(os.path.join(directory,"features.mat"),[(X,labels)],['a','b','c'])
+
+def test_fold_worker_does_not_copy_X(tmp_path,monkeypatch):
+    """A fold trains and predicts from the shared matrix without indexing its rows."""
+    handle = writeShots(tmp_path)
+    monkeypatch.setattr(sharedFeatures,'attachMatrix',noCopy(sharedFeatures.attachMatrix))
+    trainIdx = np.arange(100,600)
+    testIdx = np.arange(0,100)
+
+    preds, memory = sharedFeatures.sharedFoldWorker(handle,trainIdx,testIdx,PARAMS)
+
+    assert preds.shape == (100,)
+    assert np.all((preds > 0) & (preds < 1))
+    assert memory['privateMB'] > 0
+
+def test_fold_predictions_scattered_test_rows(tmp_path):
+    """Scattered testing rows are predicted from the block holding them, in their own order."""
+    handle = writeShots(tmp_path)
+    matrix = sharedFeatures.attachMatrix(handle)
+    testIdx = np.array([3,50,51,420])
+    trainIdx = np.setdiff1d(np.arange(600),testIdx)
+
+    preds, _ = sharedFeatures.fitFold(matrix['X'],matrix['Outcome'],trainIdx,testIdx,PARAMS)
+    allPreds, _ = sharedFeatures.fitFold(matrix['X'],matrix['Outcome'],trainIdx,np.arange(600),PARAMS)
+
+    assert preds == pytest.approx(allPreds[testIdx])
+
+def test_season_model_does_not_copy_X(tmp_path,monkeypatch):
+    """A season model trains on and scores views of the shared matrix."""
+    handle = writeShots(tmp_path)
+    with open(tmp_path / "meta.json",'w') as f:
+        json.dump(handle,f)
+    out = np.lib.format.open_memmap(tmp_path / "xG.npy",mode='w+',dtype=np.float64,shape=(600,))
+    out[:] = np.nan
+    out.flush()
+    monkeypatch.setattr(walkForward,'attachMatrix',noCopy(walkForward.attachMatrix))
+
+    result = walkForward.trainSeason(str(tmp_path),2020,PARAMS)
+
+    xG = np.load(tmp_path / "xG.npy")
+    assert result['trainSeasons'] == [2018,2019]
+    assert (result['trainRows'], result['testRows']) == (400,200)
+    assert np.isnan(xG[:400]).all() and not np.isnan(xG[400:]).any()
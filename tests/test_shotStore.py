@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from nhlxg import shotStore
+
+def getShots(rows=300,seed=0):
+    """Random shots of a few games, shooters and goalies over a month, with missing goalies."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'GameID':rng.integers(1,20,rows),'shooter':rng.integers(100,130,rows).astype(float),
+                       'goalie':np.where(rng.random(rows) < 0.05,np.nan,rng.integers(90,95,rows)),
+                       'Date':pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0,30,rows),unit='D'),
+                       'Team':rng.choice(['BOS','TOR','MTL'],rows),'xG':rng.uniform(0,0.5,rows)})
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+
+    return df
+
+def assertShots(shots,expected):
+    """Check shots read from the store against the same shots filtered with pandas."""
+    expected = expected.sort_values('GameID',kind='stable')
+    assert list(shots['xG']) == list(expected['xG'])
+    assert list(shots['Team'].astype(str)) == list(expected['Team'])
+    assert list(shots['Date'].dt.strftime('%Y-%m-%d')) == list(expected['Date'])
+
+def test_queries_match_filtering_the_shots(tmp_path):
+    """Game, shooter, goalie and date lookups give the shots pandas filtering does."""
+    df = getShots()
+    shotStore.writeStore(df,str(tmp_path))
+    store = shotStore.ShotStore(str(tmp_path))
+
+    assertShots(store.game(7),df[df['GameID'] == 7])
+    assertShots(store.shooter(110,since='2021-01-15'),df[(df['shooter'] == 110) & (df['Date'] >= '2021-01-15')])
+    assertShots(store.goalie(92),df[df['goalie'] == 92])
+    assertShots(store.dateRange('2021-01-10','2021-01-12'),df[df['Date'].between('2021-01-10','2021-01-12')])
+    assert len(store.game(1000)) == 0
+
+def test_open_store_keeps_its_version(tmp_path):
+    """A store opened before a write keeps reading its version, and stores opened after read the new one."""
+    directory = str(tmp_path)
+    old = getShots(seed=1)
+    new = getShots(seed=2)
+    shotStore.writeStore(old,directory)
+    before = shotStore.ShotStore(directory)
+
+    shotStore.writeStore(new,directory)
+    after = shotStore.ShotStore(directory)
+
+    assert before.version != after.version == shotStore.getVersion(directory)
+    assertShots(before.game(3),old[old['GameID'] == 3])
+    assertShots(after.game(3),new[new['GameID'] == 3])
+
+def test_only_the_replaced_version_is_kept(tmp_path):
+    """Each write keeps the version it replaces for open readers and removes older ones."""
+    directory = str(tmp_path)
+    versions = []
+    for seed in range(3):
+        shotStore.writeStore(getShots(seed=seed),directory)
+        versions.append(shotStore.getVersion(directory))
+
+    assert sorted(os.listdir(directory)) == sorted([shotStore.POINTER_FILE] + versions[1:])
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nhlxg import windowFeatures
+from nhlxg.shotDataCreation import getRelativeZone
+
+def getEvents(seed=0):
+    """Random events of a few games, with single event periods, missing teams and zones and tied clocks."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for gameId, (home, away) in enumerate([('BOS','TOR'),('MTL','NYR'),('TOR','MTL')]):
+        for period, count in enumerate([40,1,25,1]):
+            seconds = np.sort(rng.integers(0,1200,count))
+            for second in seconds:
+                team = rng.choice([home,away,None],p=[0.45,0.45,0.1])
+                rows.append({'Game_Id':20001 + gameId,'Period':period + 1,'Seconds_Elapsed':float(second),
+                             'Event':rng.choice(['SHOT','MISS','BLOCK','GOAL','TAKE','GIVE','FAC','HIT','STOP']),
+                             'Ev_Team':team,'Ev_Zone':rng.choice(['Off','Def','Neu',None]),'Home_Team':home,'Away_Team':away})
+
+    return pd.DataFrame(rows)
+
+def countWindows(df,events,seconds):
+    """Count the window features of every event one event at a time."""
+    zones = [zone if (team == home) or pd.isnull(zone) else windowFeatures.FLIPPED_ZONES[zone]
+             for team, home, zone in zip(df['Ev_Team'],df['Home_Team'],df['Ev_Zone'])]
+    period = list(zip(df['Game_Id'],df['Period']))
+    rows = []
+    for i in range(len(df)):
+        team = df['Home_Team'][i] if df['Ev_Team'][i] == df['Home_Team'][i] else df['Away_Team'][i]
+        earlier = [j for j in range(i) if period[j] == period[i]]
+        windows = {'Last' + str(events) + 'Events':earlier[-events:] if events else [],
+                   'Last' + str(seconds) + 'Seconds':[j for j in earlier if df['Seconds_Elapsed'][i] - df['Seconds_Elapsed'][j] <= seconds]}
+        row = {}
+        for window, js in windows.items():
+            for name, types in windowFeatures.TEAM_EVENTS.items():
+                isType = [j for j in js if df['Event'][j] in types]
+                row[name + 'For' + window] = sum(df['Ev_Team'][j] == team for j in isType)
+                row[name + 'Against' + window] = sum(df['Ev_Team'][j] in [df['Home_Team'][j],df['Away_Team'][j]] and df['Ev_Team'][j] != team for j in isType)
+            row['ZoneChanges' + window] = sum(j > 0 and period[j - 1] == period[j] and pd.notnull(zones[j]) and pd.notnull(zones[j - 1]) and zones[j] != zones[j - 1]
+                                              for j in js)
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize('events,seconds',[(10,10),(1,0),(3,60),(50,1200)])
+def test_window_features_match_counting_each_event(events,seconds):
+    """The running sums give the counts of looking back from every event, one period at a time."""
+    df = getEvents()
+
+    windowFrame = windowFeatures.createWindowFeatures(df,events,seconds)
+
+    expected = countWindows(df,events,seconds)
+    assert sorted(windowFrame.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(windowFrame[expected.columns],expected,check_dtype=False)
+
+def test_single_event_periods_look_back_over_nothing():
+    """The only event of a period counts nothing from the period before it."""
+    df = getEvents()
+    single = df.groupby(['Game_Id','Period'])['Event'].transform('size') == 1
+
+    windowFrame = windowFeatures.createWindowFeatures(df)
+
+    assert single.sum() == 6
+    assert (windowFrame[single.to_numpy()] == 0).all().all()
+
+def test_home_zones_match_relative_zone():
+    """Zones are flipped for away events as shotDataCreation.getRelativeZone flips them for the home team."""
+    df = getEvents()
+
+    zones = windowFeatures.getHomeZones(df)
+
+    for zone, home, team, evZone in zip(zones,df['Home_Team'],df['Ev_Team'],df['Ev_Zone']):
+        expected = getRelativeZone(home,team,evZone)
+        if pd.isnull(expected) or (expected == "None"):
+            assert pd.isnull(zone)
+        else:
+            assert zone == expected
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nhlxg import workQueue
+
+#the seconds the leases of the tests last
+LEASE_SECONDS = 0.3
+
+@pytest.fixture
+def queue(tmp_path,monkeypatch):
+    """A queue of ten shards with no clock skew allowance, so leases expire on time."""
+    monkeypatch.setattr(workQueue,'CLOCK_SKEW_SECONDS',0)
+    paths = workQueue.getQueuePaths(str(tmp_path))
+    for name in ['leases','done']:
+        os.makedirs(paths[name])
+    manifest = {'shards':[{'id':"2020-" + str(k).zfill(3)} for k in range(10)]}
+    workQueue.writeAtomic(paths['manifest'],json.dumps(manifest))
+
+    return str(tmp_path)
+
+def getLeasePath(directory,shardId="2020-000"):
+    """Get the path of the lease of a shard."""
+    return os.path.join(workQueue.getQueuePaths(directory)['leases'],shardId + ".lease")
+
+def test_concurrent_claims_take_each_shard_once(queue):
+    """Workers claiming at the same time never get the same shard."""
+    start = threading.Barrier(8)
+
+    def claimAll(worker):
+        start.wait()
+        claimed = []
+        while True:
+            shard, token, remaining = workQueue.claimShard(queue,worker,leaseSeconds=60)
+            if shard is None:
+                return claimed
+            claimed.append(shard['id'])
+
+    with ThreadPoolExecutor(8) as executor:
+        claims = list(executor.map(claimAll,["w" + str(i) for i in range(8)]))
+
+    claimed = [shardId for worker in claims for shardId in worker]
+    assert sorted(claimed) == ["2020-" + str(k).zfill(3) for k in range(10)]
+
+def test_expired_lease_is_reclaimed_once(queue):
+    """An unrenewed lease is reclaimed by exactly one of the workers racing for it."""
+    path = getLeasePath(queue)
+    oldToken = workQueue.createLease(path,"crashed",LEASE_SECONDS)
+    assert workQueue.reclaimLease(path,"early",LEASE_SECONDS) is None
+
+    time.sleep(LEASE_SECONDS + 0.05)
+    start = threading.Barrier(8)
+
+    def reclaim(worker):
+        start.wait()
+        return workQueue.reclaimLease(path,worker,LEASE_SECONDS)
+
+    with ThreadPoolExecutor(8) as executor:
+        tokens = [t for t in executor.map(reclaim,["w" + str(i) for i in range(8)]) if t is not None]
+
+    assert len(tokens) == 1
+    assert workQueue.ownsLease(path,tokens[0]) and not workQueue.ownsLease(path,oldToken)
+    assert not [f for f in os.listdir(os.path.dirname(path)) if f.endswith(".reclaim")]
+
+def test_expiry_is_read_from_the_lease(queue):
+    """A lease expires at the time written in it, whatever the file system's modification time."""
+    path = getLeasePath(queue)
+    workQueue.createLease(path,"w0",60)
+    os.utime(path,(0,0))
+
+    assert not workQueue.isExpired(path,60)
+    assert workQueue.reclaimLease(path,"w1",60) is None
+
+def test_stale_reclaim_marker_is_expired(queue):
+    """A marker left by a worker that crashed while reclaiming does not block the lease forever."""
+    path = getLeasePath(queue)
+    oldToken = workQueue.createLease(path,"crashed",LEASE_SECONDS)
+    prefix = workQueue.getMarkerPrefix(path,oldToken)
+    workQueue.createExclusive(prefix + ".0.reclaim",{'worker':"crashedReclaimer",'expires':time.time() + LEASE_SECONDS})
+
+    time.sleep(LEASE_SECONDS + 0.05)
+    token = workQueue.reclaimLease(path,"w1",LEASE_SECONDS)
+
+    assert (token is not None) and workQueue.ownsLease(path,token)
+    assert not os.path.exists(prefix + ".0.reclaim")
+
+def test_renewed_lease_is_not_reclaimed(queue):
+    """A lease renewed by its worker outlives its first expiry and lapses once renewal stops."""
+    path = getLeasePath(queue)
+    token = workQueue.createLease(path,"w0",LEASE_SECONDS)
+    stop = threading.Event()
+    renewer = threading.Thread(target=workQueue.renewLease,args=(path,token,stop,LEASE_SECONDS))
+    renewer.start()
+
+    time.sleep(3*LEASE_SECONDS)
+    assert workQueue.reclaimLease(path,"w1",LEASE_SECONDS) is None
+    assert workQueue.ownsLease(path,token)
+
+    stop.set()
+    renewer.join()
+    time.sleep(LEASE_SECONDS + 0.05)
+    assert workQueue.reclaimLease(path,"w1",LEASE_SECONDS) is not None
+
+def test_renewal_stops_once_the_lease_is_lost(queue):
+    """A worker whose lease was reclaimed never writes over the new lease."""
+    path = getLeasePath(queue)
+    token = workQueue.createLease(path,"slow",LEASE_SECONDS)
+    time.sleep(LEASE_SECONDS + 0.05)
+    newToken = workQueue.reclaimLease(path,"w1",60)
+
+    stop = threading.Event()
+    renewer = threading.Thread(target=workQueue.renewLease,args=(path,token,stop,LEASE_SECONDS))
+    renewer.start()
+    renewer.join(2*LEASE_SECONDS)
+
+    assert not renewer.is_alive()
+    assert workQueue.ownsLease(path,newToken)
+
+def test_release_checks_the_token(queue):
+    """Finishing a shard removes only the worker's own lease, never one reclaimed from it."""
+    path = getLeasePath(queue)
+    token = workQueue.createLease(path,"slow",LEASE_SECONDS)
+    time.sleep(LEASE_SECONDS + 0.05)
+    newToken = workQueue.reclaimLease(path,"w1",60)
+
+    assert not workQueue.releaseLease(path,token)
+    assert workQueue.ownsLease(path,newToken)
+    assert workQueue.releaseLease(path,newToken)
+    assert not os.path.exists(path)
+    assert os.listdir(os.path.dirname(path)) == []